@@ -0,0 +1,149 @@
+"""Rerun cost of the Streamlit app per user interaction.
+
+Drives the app headlessly with ``streamlit.testing`` and, for each
+interaction, records how many script reruns it triggers, how long they take
+and how many bytes of ForwardMsg payload they send to the browser:
+
+    rerun          a plain rerun of the page (e.g. the browser reconnecting)
+    edit_amount    typing a new amount
+    analyze        clicking "Analyze Transaction"
+    load_example   picking example 2 and clicking "Load Selected Example"
+
+Widgets inside an ``st.form`` do not rerun anything until the form is
+submitted, and widgets inside an ``st.fragment`` rerun only that fragment;
+both are modelled the way the browser triggers them.
+
+    python -m benchmarks.bench_app                  # the current fraud.py
+    python -m benchmarks.bench_app --app old_fraud.py
+"""
+import argparse
+import os
+import time
+from unittest import mock
+
+import numpy as np
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+
+class PayloadRecorder:
+    """Counts ForwardMsg bytes and remembers which fragment each widget was drawn in."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.messages = 0
+        self.widget_fragments = {}
+        self._enqueue = ForwardMsgQueue.enqueue
+
+    def __enter__(self):
+        recorder = self
+
+        def enqueue(queue, msg):
+            recorder.bytes += msg.ByteSize()
+            recorder.messages += 1
+            if msg.HasField("delta") and msg.delta.HasField("new_element"):
+                element = msg.delta.new_element
+                kind = element.WhichOneof("type")
+                widget_id = getattr(getattr(element, kind), "id", "") if kind else ""
+                if widget_id:
+                    recorder.widget_fragments[widget_id] = msg.delta.fragment_id
+            return recorder._enqueue(queue, msg)
+
+        self._patch = mock.patch.object(ForwardMsgQueue, "enqueue", enqueue)
+        self._patch.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._patch.stop()
+
+    def reset(self):
+        self.bytes = self.messages = 0
+
+
+def _rerun(at, recorder, widget=None):
+    """Run the script the way the browser would after ``widget`` changed; returns (seconds, bytes)."""
+    fragment_id = recorder.widget_fragments.get(widget.id, "") if widget is not None else ""
+    recorder.reset()
+    start = time.perf_counter()
+    if fragment_id:
+        rerun_data = local_script_runner.RerunData
+        with mock.patch.object(local_script_runner, "RerunData",
+                               lambda **kw: rerun_data(fragment_id_queue=[fragment_id], **kw)):
+            at.run()
+    else:
+        at.run()
+    return time.perf_counter() - start, recorder.bytes
+
+
+def _in_form(widget):
+    return bool(getattr(widget.proto, "form_id", "")) and not getattr(widget.proto, "is_form_submitter", False)
+
+
+def _text_input(at, label):
+    return next(w for w in at.text_input if w.label == label)
+
+
+def interact(at, recorder, name):
+    """Perform one interaction; returns a list of (seconds, bytes) per rerun it triggered."""
+    if name == "rerun":
+        return [_rerun(at, recorder)]
+    if name == "edit_amount":
+        widget = _text_input(at, "Amount (Rs)")
+        widget.input("7,850.00")
+        return [] if _in_form(widget) else [_rerun(at, recorder, widget)]
+    if name == "analyze":
+        widget = at.button(key="predict")
+        widget.click()
+        return [_rerun(at, recorder, widget)]
+    if name == "load_example":
+        select = at.selectbox(key="example_select")
+        select.set_value(1)
+        reruns = [] if _in_form(select) else [_rerun(at, recorder, select)]
+        # A fragment-only rerun leaves the rest of the tree empty; redraw it unmeasured to find the button.
+        if reruns and recorder.widget_fragments.get(select.id):
+            at.run()
+        button = at.button(key="autofill")
+        button.click()
+        return reruns + [_rerun(at, recorder, button)]
+    raise ValueError(f"Unknown interaction {name!r}")
+
+
+INTERACTIONS = ["rerun", "edit_amount", "analyze", "load_example"]
+
+
+def measure(app, repeat):
+    results = {}
+    with PayloadRecorder() as recorder:
+        # Warm the model, explainer and data caches once.
+        AppTest.from_file(app, default_timeout=120).run()
+        for name in INTERACTIONS:
+            samples = []
+            for _ in range(repeat):
+                at = AppTest.from_file(app, default_timeout=120)
+                at.run()
+                reruns = interact(at, recorder, name)
+                if at.exception:
+                    raise RuntimeError(f"{name}: {at.exception[0].message}")
+                samples.append((len(reruns), sum(s for s, _ in reruns), sum(b for _, b in reruns)))
+            counts, seconds, payload = (np.array(column) for column in zip(*samples))
+            results[name] = {"reruns": float(np.median(counts)), "ms": float(np.median(seconds) * 1e3),
+                             "bytes": float(np.median(payload))}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Streamlit rerun time and payload per interaction")
+    parser.add_argument("--app", default="fraud.py")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = measure(os.path.abspath(args.app), args.repeat)
+    print(f"{args.app}")
+    print(f"{'interaction':<14} {'reruns':>7} {'ms':>9} {'payload KB':>11}")
+    for name, r in results.items():
+        print(f"{name:<14} {r['reruns']:>7.0f} {r['ms']:>9.1f} {r['bytes'] / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Compare one-row-per-call scoring (as fraud.py does) with scoring.score_batch.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_batch [--rows N]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+import scoring
+from schema import DATASET_PATH
+
+
+def score_row_by_row(model, frame):
+    probs = []
+    for row in frame[scoring.FEATURE_COLUMNS].itertuples(index=False):
+        features = pd.DataFrame({col: [value] for col, value in zip(scoring.FEATURE_COLUMNS, row)})
+        indicators = scoring.compute_indicators(features)
+        fraud_prob = model.predict_proba(features)[:, 1]
+        probs.append(scoring.apply_rule_overrides(fraud_prob, indicators)[0])
+    return probs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=None,
+                        help="Only use the first N rows for the row-by-row run (default: all)")
+    args = parser.parse_args()
+
+    model = scoring.load_model()
+    df = pd.read_csv(DATASET_PATH)
+    single_df = df if args.rows is None else df.head(args.rows)
+
+    start = time.perf_counter()
+    score_row_by_row(model, single_df)
+    single_s = time.perf_counter() - start
+    single_per_row = single_s / len(single_df)
+
+    start = time.perf_counter()
+    scoring.score_batch(model, df)
+    batch_s = time.perf_counter() - start
+
+    print(f"row-by-row: {single_s:.3f}s for {len(single_df):,} rows ({single_per_row * 1e3:.3f} ms/row)")
+    print(f"batch:      {batch_s:.3f}s for {len(df):,} rows ({batch_s / len(df) * 1e6:.2f} us/row)")
+    print(f"speedup:    {single_per_row * len(df) / batch_s:.0f}x on the full file")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Load time and memory of the CSV vs Parquet vs memory-mapped Arrow paths.
+
+Converts the dataset (optionally replicated --copies times to get a more
+production-like size) into a scratch directory, then loads each format in a
+fresh interpreter, once with all columns and once with only the model
+features, and reports wall time and peak RSS growth.
+
+    python -m benchmarks.bench_columnar --copies 100
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+import columnar
+from schema import DATASET_PATH, FEATURE_COLUMNS
+
+
+PROBE = '''
+import json, resource, sys, time
+import pandas, pyarrow
+import columnar
+def peak_kb():
+    # ru_maxrss survives exec on Linux (it would include the parent's peak), VmHWM does not.
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM"))
+    except OSError:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024 if sys.platform == "darwin" else rss
+before = peak_kb()
+start = time.perf_counter()
+df = columnar.load_transactions({path!r}, columns={columns!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "rss_mb": (peak_kb() - before) / 1024,
+                  "frame_mb": df.memory_usage(deep=True).sum() / 2**20}}))
+'''
+
+
+def measure(path, columns):
+    code = PROBE.format(path=path, columns=columns)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark columnar vs CSV loading")
+    parser.add_argument("--copies", type=int, default=20, help="Replicate the dataset N times")
+    parser.add_argument("--workdir", default=None, help="Scratch directory (default: a temp dir)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="securescan-columnar-")
+    csv_path = os.path.join(workdir, "transactions.csv")
+    df = pd.read_csv(DATASET_PATH)
+    pd.concat([df] * args.copies, ignore_index=True).to_csv(csv_path, index=False)
+    paths = {"csv": csv_path}
+    for fmt, suffix in [("parquet", ".parquet"), ("arrow (mmap)", ".arrow")]:
+        paths[fmt] = os.path.join(workdir, "transactions" + suffix)
+        columnar.convert_csv(csv_path, paths[fmt])
+
+    print(f"{len(df) * args.copies:,} rows in {workdir}")
+    print(f"{'format':<14} {'file MB':>8} {'columns':<9} {'load s':>8} {'peak RSS MB':>12} {'frame MB':>9}")
+    for fmt, path in paths.items():
+        size_mb = os.path.getsize(path) / 2**20
+        for label, columns in [("all", None), ("features", FEATURE_COLUMNS)]:
+            r = measure(path, columns)
+            print(f"{fmt:<14} {size_mb:>8.1f} {label:<9} {r['seconds']:>8.3f} {r['rss_mb']:>12.1f} "
+                  f"{r['frame_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Update and lookup cost of the per-account feature store.
+
+Replays the dataset --copies times (each copy shifted later in ``step`` so
+the windows keep sliding) through a TransactionFeatureStore, then times
+single-account lookups and vectorized batch lookups.
+
+    python -m benchmarks.bench_feature_store --copies 20
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_store import TransactionFeatureStore
+from schema import DATASET_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the account feature store")
+    parser.add_argument("--copies", type=int, default=10)
+    parser.add_argument("--window-steps", type=int, default=24)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    df = pd.read_csv(DATASET_PATH).sort_values("step", kind="stable")
+    span = int(df["step"].max()) + 1
+    copies = []
+    for i in range(args.copies):
+        copy = df.copy()
+        copy["step"] += i * span
+        copies.append(copy)
+    log = pd.concat(copies, ignore_index=True)
+    columns = ["step", "nameOrig", "nameDest", "amount", "oldbalanceOrg", "newbalanceOrig", "newbalanceDest"]
+    events = list(zip(*(log[c].to_numpy().tolist() for c in columns)))
+
+    store = TransactionFeatureStore(args.window_steps)
+    start = time.perf_counter()
+    for event in events:
+        store.update(*event)
+    update_s = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(events), args.lookups)
+    queries = [(events[i][1], events[i][2], events[i][0]) for i in picks]
+    start = time.perf_counter()
+    for name_orig, name_dest, step in queries:
+        store.features(name_orig, name_dest, step)
+    lookup_s = time.perf_counter() - start
+
+    sample = log.iloc[picks]
+    start = time.perf_counter()
+    store.features_frame(sample)
+    batch_s = time.perf_counter() - start
+
+    accounts = len(store.senders) + len(store.receivers)
+    nbytes = store.senders.nbytes + store.receivers.nbytes
+    print(f"{len(events):,} events, {accounts:,} accounts, window {args.window_steps} steps")
+    print(f"update:        {update_s / len(events) * 1e6:8.2f} us/event")
+    print(f"lookup:        {lookup_s / len(queries) * 1e6:8.2f} us/transaction (sender + receiver)")
+    print(f"batch lookup:  {len(sample) / batch_s:11,.0f} transactions/s")
+    print(f"memory:        {nbytes / 2**20:8.1f} MiB arrays ({nbytes / accounts:.0f} bytes/account)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Build, append and query cost of the transaction graph at scale.
+
+Generates a synthetic log of --edges transactions between --accounts
+accounts spread over --steps steps, appends it one step at a time (as a
+live feed would) and times neighbourhood and TRANSFER -> CASH_OUT chain
+queries on the result. Before timing anything it checks that appends
+after a compaction, which add accounts the main CSR has not seen, give the
+same chains as a graph built in one pass.
+
+    python -m benchmarks.bench_graph --accounts 2000000 --edges 10000000
+"""
+import argparse
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+
+from schema import TRANSACTION_TYPES
+from transaction_graph import TransactionGraph
+
+
+def synthetic_log(accounts, edges, steps, seed=0):
+    rng = np.random.default_rng(seed)
+    names = np.array([f"C{i}" for i in range(accounts)], dtype=object)
+    return pd.DataFrame({
+        "step": np.sort(rng.integers(1, steps + 1, edges)),
+        "type": np.asarray(TRANSACTION_TYPES, dtype=object)[rng.integers(0, len(TRANSACTION_TYPES), edges)],
+        "amount": rng.exponential(5_000, edges).round(2),
+        "nameOrig": names[rng.integers(0, accounts, edges)],
+        "nameDest": names[rng.integers(0, accounts, edges)],
+    })
+
+
+def check_appends_after_compaction():
+    graph = TransactionGraph(compact_min_edges=100)
+    graph.append([1, 1], ["CASH_OUT", "PAYMENT"], [5.0, 1.0], ["Y", "A"], ["Z", "B"])
+    graph.compact()
+    graph.append([1, 1], ["TRANSFER", "TRANSFER"], [10.0, 20.0], ["A", "A"], ["X", "Y"])
+    chains = graph.transfer_cashout_chains()
+    assert chains[["mule", "transfer_edge", "cash_out_edge"]].values.tolist() == [["Y", 3, 0]], chains
+    rebuilt = TransactionGraph.from_frame(pd.DataFrame({
+        "step": 1, "type": ["CASH_OUT", "PAYMENT", "TRANSFER", "TRANSFER"], "amount": [5.0, 1.0, 10.0, 20.0],
+        "nameOrig": ["Y", "A", "A", "A"], "nameDest": ["Z", "B", "X", "Y"]}))
+    pd.testing.assert_frame_equal(chains, rebuilt.transfer_cashout_chains())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transaction graph")
+    parser.add_argument("--accounts", type=int, default=1_000_000)
+    parser.add_argument("--edges", type=int, default=5_000_000)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--seeds", type=int, default=100, help="Accounts to start neighbourhood queries from")
+    parser.add_argument("--hops", type=int, default=2)
+    parser.add_argument("--max-steps", type=int, default=1)
+    args = parser.parse_args()
+
+    check_appends_after_compaction()
+    log = synthetic_log(args.accounts, args.edges, args.steps)
+    bounds = np.searchsorted(log["step"].to_numpy(), np.arange(1, args.steps + 2))
+
+    graph = TransactionGraph()
+    start = time.perf_counter()
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        graph.append_frame(log.iloc[lo:hi])
+    append_s = time.perf_counter() - start
+    stats = graph.stats()
+    print(f"appended {stats['edges']:,} edges / {stats['accounts']:,} accounts in {args.steps} steps: "
+          f"{append_s:.2f}s ({stats['edges'] / append_s:,.0f} edges/s, {stats['compactions']} compactions)")
+    print(f"graph arrays {stats['nbytes'] / 1e6:,.1f} MB ({stats['nbytes'] / stats['edges']:.1f} B/edge), "
+          f"process peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3:,.0f} MB")
+
+    seeds = log["nameOrig"].iloc[:args.seeds].to_numpy()
+    # The first query after an append also groups the not-yet-merged edges.
+    for label in ("first", "warm"):
+        start = time.perf_counter()
+        near = graph.neighborhood(seeds, args.hops)
+        print(f"{args.hops}-hop neighbourhood of {len(seeds)} accounts ({label}): {len(near):,} accounts "
+              f"in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    start = time.perf_counter()
+    graph.neighborhood(seeds[:1], 1)
+    print(f"1-hop neighbourhood of one account: {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+    start = time.perf_counter()
+    chains = graph.transfer_cashout_chains(args.max_steps)
+    print(f"TRANSFER -> CASH_OUT chains within {args.max_steps} step(s): {len(chains):,} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Overhead of the per-stage timers in instrumentation.py on the scoring path.
+
+Scores the same batches with the timers on and off, interleaving the two
+so drift affects both equally, and reports the median slowdown per batch
+size. The single-row case goes through records_to_frame as the app and the
+service do.
+
+    python -m benchmarks.bench_instrumentation
+    python -m benchmarks.bench_instrumentation --max-overhead-pct 3   # exit 1 above 3%
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+import scoring
+from schema import DATASET_PATH, FEATURE_COLUMNS
+
+
+def median_seconds(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def overhead(fn, rounds, repeat):
+    """Median on/off time ratio over ``rounds`` interleaved rounds."""
+    ratios = []
+    for _ in range(rounds):
+        instrumentation.set_enabled(False)
+        off = median_seconds(fn, repeat)
+        instrumentation.set_enabled(True)
+        on = median_seconds(fn, repeat)
+        ratios.append(on / off)
+    return float(np.median(ratios)) - 1.0, on
+
+
+def stage_cost_ns(iterations=200_000):
+    instrumentation.set_enabled(True)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with instrumentation.stage("bench", 1):
+            pass
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the overhead of the scoring stage timers")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--max-overhead-pct", type=float, default=None,
+                        help="Fail if any case is slower than this with instrumentation on")
+    args = parser.parse_args()
+
+    model = scoring.load_model()
+    df = pd.read_csv(DATASET_PATH)
+    record = df[FEATURE_COLUMNS].iloc[0].to_dict()
+    batch_1k = df.head(1_000)
+    scoring.warm_up(model)
+
+    cases = [
+        ("single record", lambda: scoring.score_batch(model, scoring.records_to_frame([record])), 30),
+        ("batch 1,000", lambda: scoring.score_batch(model, batch_1k), 10),
+        (f"batch {len(df):,}", lambda: scoring.score_batch(model, df), 3),
+    ]
+    print(f"one stage() enter/exit: {stage_cost_ns():.0f} ns")
+    print(f"{'case':<16} {'time':>10} {'overhead':>9}")
+    worst = 0.0
+    for label, fn, repeat in cases:
+        fn()
+        ratio, seconds = overhead(fn, args.rounds, repeat)
+        worst = max(worst, ratio)
+        print(f"{label:<16} {seconds * 1e3:>8.2f}ms {ratio * 100:>+8.2f}%")
+
+    if args.max_overhead_pct is not None and worst * 100 > args.max_overhead_pct:
+        print(f"Instrumentation overhead {worst * 100:.2f}% exceeds {args.max_overhead_pct:g}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
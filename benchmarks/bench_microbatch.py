@@ -0,0 +1,85 @@
+"""Throughput/latency curve of MicroBatcher vs one predict_proba call per row.
+
+Each of --concurrency client threads scores single transactions back to
+back. The baseline builds a one-row DataFrame and calls the pipeline
+directly, as fraud.py does; the other rows route the same requests through
+a MicroBatcher with different batch-size / wait settings.
+
+    python -m benchmarks.bench_microbatch --concurrency 16 --requests 2000
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import scoring
+from microbatch import MicroBatcher
+from schema import DATASET_PATH
+
+
+SETTINGS = [(8, 1.0), (32, 2.0), (128, 5.0), (512, 10.0)]
+
+
+def run_clients(score_one, records, concurrency):
+    latencies = []
+    lock = threading.Lock()
+    indices = iter(range(len(records)))
+
+    def client():
+        local = []
+        while True:
+            with lock:
+                i = next(indices, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            score_one(records[i])
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, np.array(latencies)
+
+
+def report(label, n, elapsed, latencies):
+    print(f"{label:<22} {n / elapsed:>10,.0f} {np.percentile(latencies, 50) * 1e3:>9.2f} "
+          f"{np.percentile(latencies, 99) * 1e3:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched scoring")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    model = scoring.load_model()
+    df = pd.read_csv(DATASET_PATH)[scoring.FEATURE_COLUMNS]
+    records = df.head(args.requests).to_dict(orient="records")
+
+    def score_single(record):
+        features = pd.DataFrame({col: [record[col]] for col in scoring.FEATURE_COLUMNS})
+        fraud_prob = model.predict_proba(features)[:, 1]
+        return scoring.apply_rule_overrides(fraud_prob, scoring.compute_indicators(features))[0]
+
+    print(f"{len(records):,} single-row requests, {args.concurrency} concurrent clients")
+    print(f"{'path':<22} {'rows/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    report("one row per call", len(records), *run_clients(score_single, records, args.concurrency))
+
+    for max_batch_size, max_wait_ms in SETTINGS:
+        with MicroBatcher(model, max_batch_size, max_wait_ms) as batcher:
+            elapsed, latencies = run_clients(batcher.score, records, args.concurrency)
+        label = f"batch<={max_batch_size} wait {max_wait_ms:g}ms"
+        report(label, len(records), elapsed, latencies)
+        print(f"{'':<22} mean batch {batcher.rows / batcher.batches:.1f} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Throughput of validation.parse_columns against per-value float(x.replace(',', '')).
+
+Tiles the dataset to --rows rows and parses and validates the money columns
+in the forms they arrive in:
+
+    numeric      float columns, as pd.read_csv returns clean files (validation only)
+    formatted    "1,250.00" strings, as typed into the app or exported with separators
+    prefixed     "Rs 1,250.00" strings, every row needing the currency prefix stripped
+    records      transaction dicts of formatted strings, as the service receives them
+
+The per-value loop is timed on the formatted strings for comparison.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parsing [--rows N]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import validation
+from schema import DATASET_PATH, FEATURE_COLUMNS, NUMERIC_COLUMNS
+
+
+def replicate(frame, rows):
+    """``frame`` tiled to exactly ``rows`` rows."""
+    return frame.iloc[np.arange(rows) % len(frame)].reset_index(drop=True)
+
+
+def formatted(frame, prefix=""):
+    return frame.assign(**{col: pd.array([f"{prefix}{v:,.2f}" for v in frame[col].tolist()], dtype="str")
+                           for col in NUMERIC_COLUMNS})
+
+
+def parse_per_value(frame):
+    return {col: [float(x.replace(',', '')) for x in frame[col].tolist()] for col in NUMERIC_COLUMNS}
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    frame = replicate(pd.read_csv(DATASET_PATH)[FEATURE_COLUMNS], args.rows)
+    inputs = {
+        "numeric": frame,
+        "formatted": formatted(frame),
+        "prefixed": formatted(frame, "Rs "),
+    }
+    records_rows = min(args.rows, 100_000)
+    records = inputs["formatted"].head(records_rows).to_dict(orient="records")
+
+    print(f"{'input':<12} {'rows':>10} {'seconds':>9} {'rows/s':>13}")
+    for name, data in inputs.items():
+        parsed = validation.parse_columns(data)
+        assert parsed.valid.all(), parsed.counts()
+        seconds = best_of(lambda: validation.parse_columns(data), args.repeat)
+        print(f"{name:<12} {len(data):>10,} {seconds:>9.3f} {len(data) / seconds:>13,.0f}")
+    seconds = best_of(lambda: validation.parse_records(records), args.repeat)
+    print(f"{'records':<12} {len(records):>10,} {seconds:>9.3f} {len(records) / seconds:>13,.0f}")
+    seconds = best_of(lambda: parse_per_value(inputs["formatted"]), 1)
+    print(f"{'per-value':<12} {args.rows:>10,} {seconds:>9.3f} {args.rows / seconds:>13,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Scaling of sharded.ShardedScorer from one worker process to one per core.
+
+Scores the dataset tiled to --rows rows in --chunk-size chunks, first in
+this process with scoring.score_batch on the same NumPy trees, then through
+ShardedScorer with 1 .. N workers. For each run it reports rows/s, speedup
+over the in-process run, parallel efficiency, worker start-up time and the
+private (unshared) memory of each worker, read from /proc on Linux.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sharded                    # 1 .. os.cpu_count() workers
+    python -m benchmarks.bench_sharded --workers 1 2 4 8 --rows 5000000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import scoring
+from numpy_trees import TREES_PATH, NumpyTreeEnsemble
+from schema import DATASET_PATH
+from sharded import DEFAULT_CHUNK_ROWS, ShardedScorer
+
+
+def replicate(frame, rows):
+    """``frame`` tiled to exactly ``rows`` rows."""
+    return frame.iloc[np.arange(rows) % len(frame)].reset_index(drop=True)
+
+
+def private_mb(pid):
+    """Private resident memory of ``pid`` in MB, or NaN where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return float("nan")
+    return sum(int(fields[key].split()[0]) for key in ("Private_Clean", "Private_Dirty")) / 1024
+
+
+def chunks_of(frame, chunk_rows):
+    return [frame.iloc[start:start + chunk_rows] for start in range(0, len(frame), chunk_rows)]
+
+
+def run_in_process(model, chunks):
+    start = time.perf_counter()
+    for chunk in chunks:
+        scoring.score_batch(model, chunk, chunk_size=len(chunk))
+    return time.perf_counter() - start
+
+
+def run_sharded(model_path, workers, chunks, chunk_rows):
+    start = time.perf_counter()
+    with ShardedScorer(model_path, workers, chunk_rows) as scorer:
+        startup = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in scorer.score_chunks(chunks):
+            pass
+        seconds = time.perf_counter() - start
+        memory = [private_mb(pid) for pid in scorer.pids]
+        return {"seconds": seconds, "startup": startup, "worker_mb": float(np.mean(memory)),
+                "model_kb": scorer.model_bytes / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="Worker counts to run (default: 1 .. os.cpu_count())")
+    parser.add_argument("--model", default=TREES_PATH)
+    args = parser.parse_args()
+
+    frame = replicate(pd.read_csv(DATASET_PATH), args.rows)
+    chunks = chunks_of(frame, args.chunk_size)
+    baseline = run_in_process(NumpyTreeEnsemble.load(args.model), chunks)
+    counts = args.workers or list(range(1, (os.cpu_count() or 1) + 1))
+
+    print(f"{args.rows:,} rows in {len(chunks)} chunks on {os.cpu_count()} cores")
+    print(f"{'workers':>7} {'rows/s':>12} {'speedup':>8} {'efficiency':>10} {'start-up s':>10} {'worker MB':>10}")
+    print(f"{'inproc':>7} {args.rows / baseline:>12,.0f} {1.0:>8.2f} {'':>10} {'':>10} {'':>10}")
+    for workers in counts:
+        result = run_sharded(args.model, workers, chunks, args.chunk_size)
+        speedup = baseline / result["seconds"]
+        print(f"{workers:>7} {args.rows / result['seconds']:>12,.0f} {speedup:>8.2f} {speedup / workers:>10.0%} "
+              f"{result['startup']:>10.2f} {result['worker_mb']:>10.1f}")
+    print(f"model shared by every worker: {result['model_kb']:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Cold-start budget: import time, model load time and first-prediction latency.
+
+Every loading path runs in a fresh interpreter so imports are measured cold:
+
+    pickle  joblib-unpickled sklearn pipeline (what fraud.py loads)
+    native  compiled.CompiledPredictor from the UBJ booster bundle
+    numpy   numpy_trees.NumpyTreeEnsemble (NumPy only)
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --variants native numpy --max-startup-ms 1500
+
+With --max-startup-ms the run exits non-zero when any variant's import +
+load + first prediction exceeds the budget, so regressions fail CI.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from schema import MODEL_PATH, NATIVE_MODEL_PATH
+
+
+TREES_PATH = 'xgboost_fraud_trees.npz'
+
+VARIANTS = {
+    "pickle": (
+        "import joblib, pandas as pd, sklearn.pipeline, xgboost",
+        f"model = joblib.load({MODEL_PATH!r})",
+        "frame = pd.DataFrame([WARMUP_RECORD]); predict = lambda: model.predict_proba(frame)",
+    ),
+    "native": (
+        "import xgboost; from compiled import CompiledPredictor",
+        f"model = CompiledPredictor.load_native({NATIVE_MODEL_PATH!r})",
+        "predict = lambda: model.predict_arrays(types, numeric)",
+    ),
+    "numpy": (
+        "from numpy_trees import NumpyTreeEnsemble",
+        f"model = NumpyTreeEnsemble.load({TREES_PATH!r})",
+        "predict = lambda: model.predict_arrays(types, numeric)",
+    ),
+}
+
+PROBE = '''
+import time, json, warnings
+warnings.filterwarnings("ignore")
+t0 = time.perf_counter()
+{imports}
+t1 = time.perf_counter()
+{load}
+t2 = time.perf_counter()
+from schema import NUMERIC_COLUMNS, WARMUP_RECORD
+types = [WARMUP_RECORD["type"]]
+numeric = [[WARMUP_RECORD[c] for c in NUMERIC_COLUMNS]]
+{predict}
+t3 = time.perf_counter()
+predict()
+t4 = time.perf_counter()
+steady = []
+for _ in range(50):
+    s = time.perf_counter(); predict(); steady.append(time.perf_counter() - s)
+steady.sort()
+print(json.dumps({{"import_ms": (t1 - t0) * 1e3, "load_ms": (t2 - t1) * 1e3,
+                  "first_predict_ms": (t4 - t3) * 1e3, "steady_predict_ms": steady[len(steady) // 2] * 1e3}}))
+'''
+
+
+def measure(variant):
+    imports, load, predict = VARIANTS[variant]
+    code = PROBE.format(imports=imports, load=load, predict=predict)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.getcwd(), check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start cost of each model loading path")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--max-startup-ms", type=float, default=None,
+                        help="Fail if import + load + first prediction exceeds this for any variant")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = {variant: measure(variant) for variant in args.variants}
+    for result in results.values():
+        result["startup_ms"] = result["import_ms"] + result["load_ms"] + result["first_predict_ms"]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'variant':<8} {'import':>9} {'load':>9} {'1st pred':>9} {'steady':>9} {'total':>9}  (ms)")
+        for variant, r in results.items():
+            print(f"{variant:<8} {r['import_ms']:>9.1f} {r['load_ms']:>9.1f} {r['first_predict_ms']:>9.2f} "
+                  f"{r['steady_predict_ms']:>9.3f} {r['startup_ms']:>9.1f}")
+
+    if args.max_startup_ms is not None:
+        over = [v for v, r in results.items() if r["startup_ms"] > args.max_startup_ms]
+        if over:
+            print(f"Startup budget of {args.max_startup_ms:g} ms exceeded by: {', '.join(over)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Concurrent load generator for server.py.
+
+Sends dataset rows to a running scoring service (or starts one in-process
+when --url is not given) and reports throughput and p50/p99 latency.
+
+    python -m benchmarks.load_server --concurrency 8 --requests 2000
+    python -m benchmarks.load_server --url http://127.0.0.1:8000 --batch-size 100
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+import scoring
+from schema import DATASET_PATH
+
+
+def load_payloads(batch_size, count):
+    df = pd.read_csv(DATASET_PATH)[scoring.FEATURE_COLUMNS]
+    records = df.to_dict(orient="records")
+    payloads = []
+    for i in range(count):
+        start = (i * batch_size) % len(records)
+        if batch_size == 1:
+            payloads.append(json.dumps(records[start]).encode("utf-8"))
+        else:
+            chunk = records[start:start + batch_size]
+            payloads.append(json.dumps({"transactions": chunk}).encode("utf-8"))
+    return payloads
+
+
+def run_load(host, port, path, payloads, concurrency):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    next_index = iter(range(len(payloads)))
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port)
+        local = []
+        while True:
+            with lock:
+                i = next(next_index, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            conn.request("POST", path, body=payloads[i], headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            local.append(time.perf_counter() - start)
+            if response.status != 200:
+                errors.append(response.status)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, np.array(latencies), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the scoring service")
+    parser.add_argument("--url", default=None, help="Base URL of a running server (default: start one in-process)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=1, help="Transactions per request; >1 uses /score/batch")
+    args = parser.parse_args()
+
+    server = None
+    if args.url is None:
+        import server as scoring_server
+        server = scoring_server.make_server(port=0, model=scoring.load_model())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = "127.0.0.1", server.server_port
+    else:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+
+    path = "/score" if args.batch_size == 1 else "/score/batch"
+    payloads = load_payloads(args.batch_size, args.requests)
+    elapsed, latencies, errors = run_load(host, port, path, payloads, args.concurrency)
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    rows = args.requests * args.batch_size
+    print(f"{args.requests:,} requests x {args.batch_size} rows, concurrency {args.concurrency}")
+    print(f"throughput: {args.requests / elapsed:,.0f} req/s, {rows / elapsed:,.0f} rows/s")
+    print(f"latency:    p50 {np.percentile(latencies, 50) * 1e3:.2f} ms, "
+          f"p99 {np.percentile(latencies, 99) * 1e3:.2f} ms")
+    if errors:
+        print(f"errors:     {len(errors)} non-200 responses")
+
+
+if __name__ == "__main__":
+    main()
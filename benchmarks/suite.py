@@ -0,0 +1,220 @@
+"""Inference benchmark suite with a tracked baseline.
+
+Measures the deployed model (xgboost_fraud_model.pkl) on the real dataset:
+
+    single_row   latency of scoring one transaction record end to end
+    throughput   rows/s of scoring.score_batch at batch sizes 1 .. 100k
+    rules        indicator + override cost per row, alone and as a share of scoring
+    parsing      records_to_frame on app-style strings, and CSV parsing
+    memory       peak NumPy/Python allocation per batch (tracemalloc)
+
+Results are written as JSON and compared with benchmarks/baseline.json;
+any metric that is worse than the baseline by more than --tolerance is
+reported as a regression.
+
+    python -m benchmarks.suite                      # run and compare
+    python -m benchmarks.suite --check              # exit 1 on regressions
+    python -m benchmarks.suite --save-baseline      # accept the current numbers
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import scoring
+from rules import load_rules
+from schema import DATASET_PATH, FEATURE_COLUMNS, MODEL_PATH, NUMERIC_COLUMNS
+
+
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+RESULTS_PATH = os.path.join('benchmarks', 'results.json')
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000]
+PARSE_ROWS = 10_000
+RULES_ROWS = 100_000
+
+
+def time_call(fn, min_seconds=0.2, min_repeat=5, max_repeat=10_000):
+    """Per-call wall times of ``fn``, repeated until ``min_seconds`` have passed."""
+    times = []
+    deadline = time.perf_counter() + min_seconds
+    while len(times) < min_repeat or (time.perf_counter() < deadline and len(times) < max_repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def metric(value, unit, better):
+    return {"value": float(value), "unit": unit, "better": better}
+
+
+def replicate(frame, rows):
+    """``frame`` tiled to exactly ``rows`` rows."""
+    return frame.iloc[np.arange(rows) % len(frame)].reset_index(drop=True)
+
+
+def bench_single_row(model, df):
+    record = df[FEATURE_COLUMNS].iloc[0].to_dict()
+    times = time_call(lambda: scoring.score_batch(model, scoring.records_to_frame([record])))
+    return {
+        "single_row.p50_us": metric(np.percentile(times, 50) * 1e6, "us", "lower"),
+        "single_row.p99_us": metric(np.percentile(times, 99) * 1e6, "us", "lower"),
+    }
+
+
+def bench_throughput(model, df, batch_sizes):
+    results = {}
+    for size in batch_sizes:
+        batch = replicate(df, size)
+        times = time_call(lambda: scoring.score_batch(model, batch), min_repeat=3)
+        results[f"throughput.batch_{size}.rows_per_s"] = metric(size / np.median(times), "rows/s", "higher")
+    return results
+
+
+def bench_rules(model, df, rows):
+    ruleset = load_rules()
+    features = replicate(df, rows)[FEATURE_COLUMNS]
+    prob = model.predict_proba(features)[:, 1]
+    rules_s = np.median(time_call(lambda: ruleset.apply_overrides(prob, ruleset.evaluate(features)), min_repeat=3))
+    total_s = np.median(time_call(lambda: scoring.score_batch(model, features), min_repeat=3))
+    return {
+        "rules.per_row_ns": metric(rules_s / rows * 1e9, "ns", "lower"),
+        "rules.share_of_scoring_pct": metric(rules_s / total_s * 100, "%", "lower"),
+    }
+
+
+def bench_parsing(df, rows):
+    sample = replicate(df, rows)
+    # Money as the app receives it: strings with thousands separators.
+    records = [{"type": t, **{col: f"{v:,.2f}" for col, v in zip(NUMERIC_COLUMNS, values)}}
+               for t, values in zip(sample["type"], sample[NUMERIC_COLUMNS].to_numpy())]
+    records_s = np.median(time_call(lambda: scoring.records_to_frame(records), min_repeat=3))
+    csv_text = sample.to_csv(index=False)
+    csv_s = np.median(time_call(lambda: pd.read_csv(io.StringIO(csv_text)), min_repeat=3))
+    return {
+        "parsing.records_to_frame.rows_per_s": metric(rows / records_s, "rows/s", "higher"),
+        "parsing.read_csv.rows_per_s": metric(rows / csv_s, "rows/s", "higher"),
+    }
+
+
+def bench_memory(model, df, batch_sizes):
+    """Peak traced allocation while scoring one batch, per row.
+
+    tracemalloc sees Python and NumPy buffers, not the booster's native
+    scratch space, so this tracks the frame/indicator overhead we control.
+    """
+    results = {}
+    for size in batch_sizes:
+        batch = replicate(df, size)
+        scoring.score_batch(model, batch)
+        tracemalloc.start()
+        scoring.score_batch(model, batch)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f"memory.batch_{size}.bytes_per_row"] = metric(peak / size, "bytes", "lower")
+    return results
+
+
+def environment(model_path):
+    import sklearn
+    import xgboost
+
+    stat = os.stat(model_path)
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "model": {"path": model_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "xgboost": xgboost.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run(model_path=MODEL_PATH, data_path=DATASET_PATH, batch_sizes=BATCH_SIZES):
+    model = scoring.load_model(model_path)
+    df = pd.read_csv(data_path)
+    scoring.warm_up(model)
+    metrics = {}
+    metrics.update(bench_single_row(model, df))
+    metrics.update(bench_throughput(model, df, batch_sizes))
+    metrics.update(bench_rules(model, df, RULES_ROWS))
+    metrics.update(bench_parsing(df, PARSE_ROWS))
+    metrics.update(bench_memory(model, df, [s for s in batch_sizes if s >= 100]))
+    return {"environment": environment(model_path), "metrics": metrics}
+
+
+def compare(results, baseline, tolerance):
+    """Rows of ``(name, current, baseline, change, regressed)``; change > 0 means worse."""
+    rows = []
+    for name, current in results["metrics"].items():
+        base = baseline["metrics"].get(name)
+        if base is None or base["value"] == 0:
+            rows.append((name, current, None, None, False))
+            continue
+        change = (current["value"] - base["value"]) / base["value"]
+        if current["better"] == "higher":
+            change = -change
+        rows.append((name, current, base, change, change > tolerance))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'metric':<42} {'current':>14} {'baseline':>14} {'change':>8}")
+    for name, current, base, change, regressed in rows:
+        base_text = f"{base['value']:>14,.1f}" if base else f"{'-':>14}"
+        change_text = f"{change:>+8.1%}" if change is not None else f"{'new':>8}"
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<42} {current['value']:>14,.1f} {base_text} {change_text}{flag}  {current['unit']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scoring latency, throughput, rules, parsing and memory")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=DATASET_PATH)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--out", default=RESULTS_PATH, help="Where to write this run's JSON results")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when any metric regressed")
+    args = parser.parse_args()
+
+    results = run(args.model, args.data, args.batch_sizes)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["environment"]["model"] != results["environment"]["model"]:
+            print(f"Note: the model differs from the baseline's ({baseline['environment']['model']['path']})")
+        rows = compare(results, baseline, args.tolerance)
+    else:
+        rows = compare(results, {"metrics": {}}, args.tolerance)
+    print_comparison(rows)
+    print(f"Results in {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    regressed = [name for name, *_, flag in rows if flag]
+    if args.check and regressed:
+        print(f"{len(regressed)} metric(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
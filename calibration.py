@@ -0,0 +1,320 @@
+"""Calibrated probabilities and per-type alert thresholds.
+
+The scores that ``scoring.score_batch`` produces (model probability with the
+rule floors from ``rules.json`` applied) are ranked well but are not
+probabilities. The old flag, ``fraud_prob > 0.5``, also ignores how many
+alerts the review team can work. ``fit`` learns, on held-out labeled scores:
+
+- a calibrator per transaction type (isotonic or Platt), falling back to one
+  fitted on every type when a type has too few frauds to fit its own;
+- a threshold per type on the score, chosen to keep the false-positive
+  rate of each type under ``fpr`` and/or total alerts under a daily budget.
+  The budget goes to the rows with the highest calibrated probability,
+  whatever their type, which is what makes the thresholds differ by type.
+
+Each threshold comes from one sorted sweep over the scores (O(n log n)):
+after sorting by score, cumulative sums give the true and false positives
+for every cut at once. Thresholds are kept on the score rather than the
+calibrated probability, whose isotonic steps would tie too many rows to cut
+between them; within a type calibration is monotone, so the order is the
+same.
+
+The result is a small JSON lookup (``calibration.json``): isotonic
+breakpoints or Platt coefficients plus one threshold per type. ``apply``
+and ``flag`` evaluate it with one ``np.interp`` per type and a gather.
+``score_batch`` loads it automatically when the file exists and then adds
+``calibrated_prob`` and sets ``is_flagged`` from the thresholds.
+
+    python calibration.py --fpr 0.01
+    python calibration.py --daily-alerts 200 --method platt
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from schema import CALIBRATION_PATH, DATASET_PATH, FEATURE_COLUMNS, MODEL_PATH, TRANSACTION_TYPES
+
+METHODS = ['isotonic', 'platt']
+GLOBAL = '*'
+MIN_FRAUDS = 20
+EPS = 1e-6
+# Thresholds flag ``score >= threshold``; the smallest float above 0.5 keeps the old ``fraud_prob > 0.5`` cut exact.
+DEFAULT_THRESHOLD = float(np.nextafter(0.5, 1.0))
+
+
+def _logit(p):
+    p = np.clip(p, EPS, 1 - EPS)
+    return np.log(p / (1 - p))
+
+
+def fit_isotonic(scores, labels):
+    """Breakpoints ``(x, y)`` of a non-decreasing step map from score to fraud rate."""
+    from sklearn.isotonic import IsotonicRegression
+
+    iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds='clip').fit(scores, labels)
+    return {'x': iso.X_thresholds_.tolist(), 'y': iso.y_thresholds_.tolist()}
+
+
+def fit_platt(scores, labels):
+    """Coefficients of ``sigmoid(a * logit(score) + b)``."""
+    from sklearn.linear_model import LogisticRegression
+
+    lr = LogisticRegression(C=1e6).fit(_logit(scores).reshape(-1, 1), labels)
+    return {'a': float(lr.coef_[0, 0]), 'b': float(lr.intercept_[0])}
+
+
+def _calibrate(calibrator, scores):
+    if 'x' in calibrator:
+        return np.interp(scores, calibrator['x'], calibrator['y'])
+    return 1.0 / (1.0 + np.exp(-(calibrator['a'] * _logit(scores) + calibrator['b'])))
+
+
+def sweep(scores, labels):
+    """Every distinct cut of ``scores`` as ``(threshold, true positives, false positives)`` arrays.
+
+    Flagging ``scores >= threshold[i]`` catches ``tp[i]`` frauds and raises
+    ``fp[i]`` false alerts. Cuts are ordered from the highest threshold down.
+    """
+    order = np.argsort(-scores, kind='stable')
+    s = scores[order]
+    y = labels[order].astype(np.int64)
+    tp = np.cumsum(y)
+    fp = np.cumsum(1 - y)
+    last = np.append(s[1:] != s[:-1], True) if len(s) else np.zeros(0, dtype=bool)
+    return s[last], tp[last], fp[last]
+
+
+def fpr_threshold(scores, labels, fpr):
+    """The lowest threshold that flags at most ``fpr`` of the negatives; ``None`` if even the top does not."""
+    thresholds, _, fp = sweep(scores, labels)
+    allowed = np.flatnonzero(fp <= fpr * max(1, int(np.sum(labels == 0))))
+    return float(thresholds[allowed[-1]]) if len(allowed) else None
+
+
+def budget_thresholds(scores, calibrated, types, max_alerts):
+    """Per-type score thresholds that flag the (at most) ``max_alerts`` rows most likely to be fraud.
+
+    Rows are ranked by calibrated probability, then score; a type none of
+    whose rows make the cut gets ``None``.
+    """
+    order = np.lexsort((-scores, -calibrated))
+    c, s = calibrated[order], scores[order]
+    last = np.flatnonzero(np.append((c[1:] != c[:-1]) | (s[1:] != s[:-1]), True)) if len(s) else np.zeros(0, int)
+    allowed = last[last + 1 <= max_alerts]
+    selected = order[:allowed[-1] + 1] if len(allowed) else order[:0]
+    thresholds = {t: None for t in TRANSACTION_TYPES}
+    for t in TRANSACTION_TYPES:
+        picked = scores[selected][types[selected] == t]
+        if len(picked):
+            thresholds[t] = float(picked.min())
+    thresholds[GLOBAL] = float(scores[selected].min()) if len(selected) else None
+    return thresholds
+
+
+class Calibration:
+    """A fitted calibration lookup; see ``fit`` and ``Calibration.from_file``."""
+
+    def __init__(self, config, version=None):
+        self.config = config
+        self.version = version
+        self.method = config['method']
+        calibrators = config['calibrators']
+        self._calibrators = [calibrators.get(t, calibrators[GLOBAL]) for t in TRANSACTION_TYPES]
+        thresholds = config['thresholds']
+        # Slot -1 (an unknown type) uses the global threshold; None never flags.
+        self._thresholds = np.array([np.inf if thresholds.get(t, thresholds[GLOBAL]) is None
+                                     else thresholds.get(t, thresholds[GLOBAL])
+                                     for t in TRANSACTION_TYPES + [GLOBAL]], dtype=np.float64)
+        self._global = calibrators[GLOBAL]
+
+    @classmethod
+    def from_file(cls, path=CALIBRATION_PATH):
+        stat = os.stat(path)
+        with open(path) as f:
+            return cls(json.load(f), version=(stat.st_size, stat.st_mtime_ns))
+
+    def save(self, path=CALIBRATION_PATH):
+        with open(path, 'w') as f:
+            json.dump(self.config, f, indent=2)
+
+    @staticmethod
+    def _codes(types):
+        return np.asarray(pd.Categorical(types, categories=TRANSACTION_TYPES).codes)
+
+    def score(self, types, scores):
+        """``(calibrated, flagged)`` for ``scores`` of transactions of ``types``, mapping the types once."""
+        codes = self._codes(types)
+        return self._apply(codes, scores), np.asarray(scores) >= self._thresholds[codes]
+
+    def apply(self, types, scores):
+        """Calibrated probabilities for ``scores`` of transactions of ``types``."""
+        return self._apply(self._codes(types), scores)
+
+    def _apply(self, codes, scores):
+        scores = np.asarray(scores, dtype=np.float64)
+        out = np.empty(len(scores))
+        for code, calibrator in enumerate(self._calibrators + [self._global]):
+            mask = codes == (code if code < len(TRANSACTION_TYPES) else -1)
+            if mask.any():
+                out[mask] = _calibrate(calibrator, scores[mask])
+        return out
+
+    def flag(self, types, scores):
+        """Which scores reach their type's threshold."""
+        return np.asarray(scores) >= self._thresholds[self._codes(types)]
+
+
+def fit(scores, types, labels, method='isotonic', fpr=None, max_alerts=None, min_frauds=MIN_FRAUDS):
+    """Fit a ``Calibration`` on held-out ``scores`` with their transaction ``types`` and 0/1 ``labels``.
+
+    ``fpr`` caps each type's false-positive rate; ``max_alerts`` caps the
+    total number of rows flagged in this sample. With both, the stricter
+    threshold wins; with neither, the score must exceed 0.5 as before.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}; choose from {', '.join(METHODS)}")
+    scores = np.asarray(scores, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.int8)
+    types = np.asarray(types, dtype=object)
+    fit_one = fit_isotonic if method == 'isotonic' else fit_platt
+
+    calibrators = {GLOBAL: fit_one(scores, labels)}
+    for t in TRANSACTION_TYPES:
+        mask = types == t
+        frauds = int(labels[mask].sum())
+        if frauds >= min_frauds and mask.sum() - frauds >= min_frauds:
+            calibrators[t] = fit_one(scores[mask], labels[mask])
+    calibration = Calibration({'method': method, 'calibrators': calibrators, 'thresholds': {GLOBAL: DEFAULT_THRESHOLD}})
+    calibrated = calibration.apply(types, scores)
+
+    budget = budget_thresholds(scores, calibrated, types, max_alerts) if max_alerts is not None else None
+    thresholds = {}
+    for t in TRANSACTION_TYPES + [GLOBAL]:
+        mask = types == t if t != GLOBAL else np.ones(len(types), dtype=bool)
+        if fpr is None and max_alerts is None:
+            thresholds[t] = DEFAULT_THRESHOLD
+            continue
+        candidates = []
+        if fpr is not None:
+            candidates.append(fpr_threshold(scores[mask], labels[mask], fpr) if mask.any() else None)
+        if budget is not None:
+            candidates.append(budget[t])
+        thresholds[t] = None if None in candidates else max(candidates)
+    calibration.config.update(thresholds=thresholds, target={'fpr': fpr, 'max_alerts': max_alerts},
+                              rows=len(scores), frauds=int(labels.sum()))
+    return Calibration(calibration.config)
+
+
+def evaluate(calibration, scores, types, labels):
+    """Per-type alerts, recall and false-positive rate of ``calibration`` on labeled scores."""
+    types = np.asarray(types, dtype=object)
+    labels = np.asarray(labels, dtype=np.int8)
+    calibrated = calibration.apply(types, scores)
+    flagged = calibration.flag(types, scores)
+    report = {}
+    for t in TRANSACTION_TYPES + [GLOBAL]:
+        mask = types == t if t != GLOBAL else np.ones(len(types), dtype=bool)
+        pos, neg = mask & (labels == 1), mask & (labels == 0)
+        report[t] = {'rows': int(mask.sum()), 'frauds': int(pos.sum()), 'alerts': int(flagged[mask].sum()),
+                     'recall': float(flagged[pos].mean()) if pos.any() else None,
+                     'fpr': float(flagged[neg].mean()) if neg.any() else None,
+                     'brier': float(np.mean((calibrated[mask] - labels[mask]) ** 2)) if mask.any() else None}
+    return report
+
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def load_calibration(path=CALIBRATION_PATH, check_interval=1.0):
+    """Shared ``Calibration`` for ``path``, reloaded when the file changes; ``None`` if there is no file.
+
+    Like ``rules.load_rules``, a file that fails to reload keeps the
+    previous calibration active with a warning.
+    """
+    now = time.monotonic()
+    with _load_lock:
+        entry = _loaded.get(path)
+        if entry is not None and now - entry[1] < check_interval:
+            return entry[0]
+        calibration = entry[0] if entry is not None else None
+        try:
+            stat = os.stat(path)
+            if calibration is None or calibration.version != (stat.st_size, stat.st_mtime_ns):
+                calibration = Calibration.from_file(path)
+        except FileNotFoundError:
+            calibration = None
+        except (OSError, ValueError, KeyError) as e:
+            if calibration is None:
+                raise
+            warnings.warn(f"Keeping previous calibration; could not reload {path}: {e}")
+        _loaded[path] = (calibration, now)
+        return calibration
+
+
+def daily_volume(frame):
+    """Transactions per day in ``frame``, from its hourly ``step`` column."""
+    days = (frame['step'].max() - frame['step'].min() + 1) / 24.0
+    return len(frame) / days
+
+
+def main():
+    import joblib
+    from sklearn.model_selection import train_test_split
+
+    import scoring
+    from columnar import load_transactions
+
+    parser = argparse.ArgumentParser(description="Fit score calibration and per-type alert thresholds")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=DATASET_PATH, help="Labeled transactions (CSV, Parquet or Arrow)")
+    parser.add_argument("--method", choices=METHODS, default='isotonic')
+    parser.add_argument("--fpr", type=float, default=None, help="Largest false-positive rate allowed per type")
+    parser.add_argument("--daily-alerts", type=float, default=None, help="Alerts the team can review per day")
+    parser.add_argument("--daily-volume", type=float, default=None,
+                        help="Transactions per day (default: inferred from the data's step column)")
+    parser.add_argument("--out", default=CALIBRATION_PATH)
+    args = parser.parse_args()
+
+    df = load_transactions(args.data, columns=['step'] + FEATURE_COLUMNS + ['isFraud'])
+    # The test split train.py held out, halved: one half to fit on, one to report on.
+    _, held = train_test_split(df, test_size=0.2, random_state=42)
+    fit_rows, check_rows = train_test_split(held, test_size=0.5, random_state=0, stratify=held['isFraud'])
+    model = joblib.load(args.model)
+    scored = {name: scoring.score_batch(model, rows[FEATURE_COLUMNS], calibration=False)
+              for name, rows in (('fit', fit_rows), ('check', check_rows))}
+
+    volume = args.daily_volume or daily_volume(df)
+    max_alerts = args.daily_alerts / volume * len(fit_rows) if args.daily_alerts is not None else None
+    start = time.perf_counter()
+    calibration = fit(scored['fit']['fraud_prob'].to_numpy(), fit_rows['type'].to_numpy(),
+                      fit_rows['isFraud'].to_numpy(), args.method, args.fpr, max_alerts)
+    fit_s = time.perf_counter() - start
+    calibration.save(args.out)
+
+    print(f"{args.method} calibration fitted on {len(fit_rows):,} held-out rows in {fit_s * 1e3:.1f} ms -> {args.out}")
+    print(f"checked on {len(check_rows):,} other held-out rows:")
+    print(f"{'type':<10} {'threshold':>9} {'rows':>6} {'frauds':>6} {'alerts':>6} {'recall':>7} {'fpr':>7} "
+          f"{'brier':>7} {'raw@0.5':>8}")
+    report = evaluate(calibration, scored['check']['fraud_prob'].to_numpy(), check_rows['type'].to_numpy(),
+                      check_rows['isFraud'].to_numpy())
+    raw = scored['check']['fraud_prob'].to_numpy() > 0.5
+    types = check_rows['type'].to_numpy()
+    fmt = lambda v, digits=4: f"{v:.{digits}f}" if v is not None else "-"
+    for t, r in report.items():
+        threshold = calibration.config['thresholds'].get(t, calibration.config['thresholds'][GLOBAL])
+        raw_alerts = int(raw.sum() if t == GLOBAL else raw[types == t].sum())
+        print(f"{'all' if t == GLOBAL else t:<10} {fmt(threshold, 6):>9} {r['rows']:>6} {r['frauds']:>6} "
+              f"{r['alerts']:>6} {fmt(r['recall']):>7} {fmt(r['fpr']):>7} {fmt(r['brier']):>7} {raw_alerts:>8}")
+    print(f"about {report[GLOBAL]['alerts'] / len(check_rows) * volume:,.0f} alerts/day at {volume:,.0f} "
+          f"transactions/day (raw > 0.5: {raw.mean() * volume:,.0f})")
+
+
+if __name__ == "__main__":
+    main()
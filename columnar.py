@@ -0,0 +1,177 @@
+"""Columnar storage for the transaction dataset and score outputs.
+
+``convert_csv`` streams a transactions CSV into either
+
+* Parquet (``.parquet``): zstd-compressed, dictionary-encoded ``type``,
+  ``nameOrig`` and ``nameDest``, readable column by column; or
+* Arrow IPC (``.arrow`` / ``.feather``): uncompressed so it can be
+  memory-mapped and read without copying. ``type`` is dictionary-encoded
+  with a fixed dictionary; the account names stay plain strings because an
+  IPC file only allows one dictionary per column across all batches.
+
+Numeric columns use compact types (int32 ``step``, int8 ``isFraud``); money
+columns stay float64 unless ``money_type=pa.float32()`` is requested, since
+float32 rounds cents on large amounts.
+
+``load_transactions`` and ``iter_batches`` read any of the three formats
+(CSV included) with optional column selection, so the training flow and the
+batch scorers can use whichever file is on disk.
+
+    python columnar.py "Fraud_Analysis_Dataset(in).csv" transactions.parquet
+"""
+import argparse
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from schema import DATASET_PATH, NUMERIC_COLUMNS, TRANSACTION_TYPES
+
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+DICTIONARY_COLUMNS = ["type", "nameOrig", "nameDest"]
+DEFAULT_BATCH_ROWS = 100_000
+
+TYPE_DICTIONARY = pa.array(TRANSACTION_TYPES, type=pa.string())
+
+
+def storage_format(path):
+    path = str(path).lower()
+    if path.endswith(PARQUET_SUFFIXES):
+        return "parquet"
+    if path.endswith(ARROW_SUFFIXES):
+        return "arrow"
+    return "csv"
+
+
+def transaction_schema(columns, money_type=pa.float64()):
+    """Arrow schema for the dataset columns present in ``columns``, in that order."""
+    types = {
+        "step": pa.int32(),
+        "type": pa.dictionary(pa.int8(), pa.string()),
+        "nameOrig": pa.string(),
+        "nameDest": pa.string(),
+        "isFraud": pa.int8(),
+        **{col: money_type for col in NUMERIC_COLUMNS},
+    }
+    return pa.schema([(col, types.get(col, pa.string())) for col in columns])
+
+
+def _encode_batch(batch, schema):
+    columns = []
+    for field in schema:
+        column = batch.column(field.name)
+        if field.name == "type":
+            indices = pc.index_in(column, value_set=TYPE_DICTIONARY)
+            if indices.null_count > column.null_count:
+                unknown = pc.filter(column, pc.and_(pc.is_null(indices), pc.is_valid(column)))
+                raise ValueError(f"Unknown transaction type: {unknown[0].as_py()!r}")
+            column = pa.DictionaryArray.from_arrays(indices.cast(pa.int8()), TYPE_DICTIONARY)
+        else:
+            column = column.cast(field.type)
+        columns.append(column)
+    return pa.record_batch(columns, schema=schema)
+
+
+def _open_writer(path, schema):
+    if storage_format(path) == "parquet":
+        return pq.ParquetWriter(path, schema, compression="zstd", use_dictionary=True)
+    if storage_format(path) == "arrow":
+        return ipc.new_file(path, schema)
+    raise ValueError(f"Unsupported output format for {path}; use .parquet or .arrow")
+
+
+def convert_csv(csv_path, out_path, money_type=pa.float64(), block_size=64 << 20):
+    """Stream ``csv_path`` into a Parquet or Arrow IPC file. Returns the row count."""
+    reader = pv.open_csv(
+        csv_path,
+        read_options=pv.ReadOptions(block_size=block_size),
+        convert_options=pv.ConvertOptions(column_types={col: pa.string() for col in DICTIONARY_COLUMNS}),
+    )
+    schema = transaction_schema(reader.schema.names, money_type)
+    rows = 0
+    with _open_writer(out_path, schema) as writer:
+        for batch in reader:
+            writer.write_batch(_encode_batch(batch, schema))
+            rows += batch.num_rows
+    return rows
+
+
+def read_table(path, columns=None, memory_map=True):
+    """Read ``path`` (CSV, Parquet or Arrow IPC) into an Arrow table."""
+    fmt = storage_format(path)
+    if fmt == "parquet":
+        wanted = DICTIONARY_COLUMNS if columns is None else [c for c in DICTIONARY_COLUMNS if c in columns]
+        return pq.read_table(path, columns=columns, memory_map=memory_map, read_dictionary=wanted)
+    if fmt == "arrow":
+        source = pa.memory_map(str(path)) if memory_map else pa.OSFile(str(path))
+        table = ipc.open_file(source).read_all()
+        return table if columns is None else table.select(columns)
+    convert = pv.ConvertOptions(include_columns=columns)
+    return pv.read_csv(path, convert_options=convert)
+
+
+def load_transactions(path=DATASET_PATH, columns=None, memory_map=True):
+    """Load transactions as a DataFrame; dictionary columns become categoricals."""
+    if storage_format(path) == "csv":
+        import pandas as pd
+        return pd.read_csv(path, usecols=columns)
+    return read_table(path, columns, memory_map).to_pandas()
+
+
+def iter_batches(path, columns=None, batch_rows=DEFAULT_BATCH_ROWS, memory_map=True):
+    """Yield DataFrames of roughly ``batch_rows`` rows from a Parquet or Arrow file."""
+    fmt = storage_format(path)
+    if fmt == "parquet":
+        wanted = DICTIONARY_COLUMNS if columns is None else [c for c in DICTIONARY_COLUMNS if c in columns]
+        parquet_file = pq.ParquetFile(path, memory_map=memory_map, read_dictionary=wanted)
+        for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+    elif fmt == "arrow":
+        source = pa.memory_map(str(path)) if memory_map else pa.OSFile(str(path))
+        table = ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"iter_batches reads .parquet or .arrow files, not {path}")
+
+
+class ParquetSink:
+    """Append scored DataFrames to a Parquet file; the schema comes from the first frame."""
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+    def write(self, frame):
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema, compression="zstd")
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a transactions CSV to Parquet or Arrow IPC")
+    parser.add_argument("input", nargs="?", default=DATASET_PATH)
+    parser.add_argument("output", nargs="?", default="transactions.parquet",
+                        help="Output path ending in .parquet or .arrow")
+    parser.add_argument("--float32", action="store_true", help="Store money columns as float32")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = convert_csv(args.input, args.output, pa.float32() if args.float32 else pa.float64())
+    print(f"Wrote {rows:,} rows to {args.output} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Pandas-free inference path for the deployed pipeline.
+
+``CompiledPredictor.from_pipeline`` reads the fitted ``Pipeline`` from
+``xgboost_fraud_model.pkl`` and keeps only what inference needs: the
+StandardScaler mean/scale, the category order of the drop-first one-hot
+encoding of ``type`` and the XGBoost booster. Rows are laid out as a fixed
+float32 matrix (five scaled numerics followed by the one-hot columns) and
+scored with ``Booster.inplace_predict``, skipping DataFrame construction,
+ColumnTransformer column lookup and sklearn validation.
+
+``save``/``load_native`` store the same predictor as a native XGBoost UBJ
+booster plus the preprocessing arrays in one ``.npz`` file, which loads
+much faster than unpickling the pipeline and never imports joblib.
+
+    python compiled.py            # parity check against pipeline.predict_proba
+    python compiled.py --save     # also write xgboost_fraud_model.native.npz
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from schema import DATASET_PATH, FEATURE_COLUMNS, MODEL_PATH, NATIVE_MODEL_PATH, NUMERIC_COLUMNS
+
+
+PARITY_TOLERANCE = 1e-6
+
+
+class CompiledPredictor:
+    def __init__(self, booster, mean, scale, categories, drop_idx):
+        self.booster = booster
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.categories = np.asarray(categories, dtype=object)
+        self.drop_idx = drop_idx
+        # Column offset of each category in the one-hot block, -1 for the dropped one.
+        offsets = np.arange(len(categories)) - (np.arange(len(categories)) > drop_idx)
+        offsets[drop_idx] = -1
+        self.onehot_offsets = offsets
+        self.n_features = len(self.mean) + len(categories) - 1
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        preprocessor = pipeline.named_steps["preprocessor"]
+        scaler = preprocessor.named_transformers_["num"]
+        encoder = preprocessor.named_transformers_["cat"]
+        numeric = next(cols for name, _, cols in preprocessor.transformers_ if name == "num")
+        if list(numeric) != NUMERIC_COLUMNS:
+            raise ValueError(f"Unexpected numeric column order: {numeric}")
+        if encoder.drop_idx_ is None:
+            raise ValueError("Expected a drop='first' OneHotEncoder")
+        booster = pipeline.named_steps["classifier"].get_booster()
+        return cls(booster, scaler.mean_, scaler.scale_, encoder.categories_[0], int(encoder.drop_idx_[0]))
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        import joblib
+        return cls.from_pipeline(joblib.load(path))
+
+    @classmethod
+    def load_native(cls, path=NATIVE_MODEL_PATH):
+        """Load a predictor written by ``save`` without unpickling the pipeline."""
+        import xgboost
+
+        with np.load(path, allow_pickle=False) as data:
+            booster = xgboost.Booster(model_file=bytearray(data["booster"].tobytes()))
+            return cls(booster, data["mean"], data["scale"], data["categories"].tolist(), int(data["drop_idx"]))
+
+    def save(self, path=NATIVE_MODEL_PATH):
+        np.savez(
+            path,
+            booster=np.frombuffer(bytes(self.booster.save_raw("ubj")), dtype=np.uint8),
+            mean=self.mean,
+            scale=self.scale,
+            categories=self.categories.astype(str),
+            drop_idx=np.int64(self.drop_idx),
+        )
+
+    def encode_types(self, types):
+        """Map transaction type strings to category indices."""
+        types = np.asarray(types, dtype=object)
+        codes = np.searchsorted(self.categories, types)
+        codes = np.minimum(codes, len(self.categories) - 1)
+        unknown = self.categories[codes] != types
+        if unknown.any():
+            raise ValueError(f"Unknown transaction type: {types[unknown][0]!r}")
+        return codes
+
+    def transform(self, type_codes, numeric):
+        """Build the float32 model matrix from category codes and an (n, 5) numeric array."""
+        numeric = np.asarray(numeric, dtype=np.float64)
+        X = np.zeros((len(numeric), self.n_features), dtype=np.float32)
+        X[:, :numeric.shape[1]] = (numeric - self.mean) / self.scale
+        offsets = self.onehot_offsets[type_codes]
+        hot = offsets >= 0
+        X[np.flatnonzero(hot), numeric.shape[1] + offsets[hot]] = 1.0
+        return X
+
+    def predict_arrays(self, types, numeric):
+        """Fraud probability per row from type strings and an (n, 5) numeric array."""
+        X = self.transform(self.encode_types(types), numeric)
+        return self.booster.inplace_predict(X)
+
+    def predict_proba(self, frame):
+        """Drop-in for ``pipeline.predict_proba`` on a feature DataFrame."""
+        prob = self.predict_arrays(frame["type"].to_numpy(),
+                                   frame[NUMERIC_COLUMNS].to_numpy(dtype=np.float64))
+        return np.column_stack([1.0 - prob, prob])
+
+
+class StudentPredictor(CompiledPredictor):
+    """A distilled regressor of the booster's log-odds behind the same preprocessing (see ``variants.py``)."""
+
+    def __init__(self, student, mean, scale, categories, drop_idx):
+        super().__init__(None, mean, scale, categories, drop_idx)
+        self.student = student
+
+    def predict_arrays(self, types, numeric):
+        X = self.transform(self.encode_types(types), numeric)
+        return 1.0 / (1.0 + np.exp(-self.student.predict(X)))
+
+
+def check_parity(pipeline, predictor, frame, tolerance=PARITY_TOLERANCE):
+    """Return the largest absolute probability difference over ``frame``.
+
+    Raises ``AssertionError`` when it exceeds ``tolerance``.
+    """
+    expected = pipeline.predict_proba(frame[FEATURE_COLUMNS])[:, 1]
+    actual = predictor.predict_proba(frame)[:, 1]
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > tolerance:
+        raise AssertionError(f"Compiled predictor differs from pipeline by {max_diff:.3g} (> {tolerance:g})")
+    return max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the compiled predictor and check it against the pipeline")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=DATASET_PATH)
+    parser.add_argument("--repeat", type=int, default=200, help="Single-row timing iterations")
+    parser.add_argument("--save", action="store_true", help="Write the native bundle after a passing check")
+    parser.add_argument("--out", default=NATIVE_MODEL_PATH, help="Native bundle path for --save")
+    args = parser.parse_args()
+
+    import joblib
+    import pandas as pd
+
+    pipeline = joblib.load(args.model)
+    predictor = CompiledPredictor.from_pipeline(pipeline)
+    df = pd.read_csv(args.data)
+
+    try:
+        max_diff = check_parity(pipeline, predictor, df)
+        if args.save:
+            predictor.save(args.out)
+            check_parity(pipeline, CompiledPredictor.load_native(args.out), df)
+    except AssertionError as e:
+        print(f"FAIL: {e}")
+        sys.exit(1)
+    print(f"parity: OK on {len(df):,} rows (max abs diff {max_diff:.3g})")
+    if args.save:
+        print(f"Wrote {args.out}")
+
+    row = df[FEATURE_COLUMNS].head(1)
+    types = row["type"].to_numpy()
+    numeric = row[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+    for label, fn in [("pipeline.predict_proba", lambda: pipeline.predict_proba(row)),
+                      ("compiled.predict_arrays", lambda: predictor.predict_arrays(types, numeric))]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        print(f"{label:<24} {(time.perf_counter() - start) / args.repeat * 1e6:9.1f} us/row (single row)")
+
+
+if __name__ == "__main__":
+    main()
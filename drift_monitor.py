@@ -0,0 +1,364 @@
+"""Streaming drift monitor for the model's inputs and scores.
+
+A ``Profile`` summarises a stream of scored transactions in constant
+memory:
+
+- one ``QuantileSketch`` per money column and for ``fraud_prob``;
+- per-type counters of rows, flags and (when labels are present) frauds.
+
+A sketch is a DDSketch-style histogram with logarithmic buckets that keeps
+every quantile within 1% relative error. Its buckets are fixed, so a
+batch is folded in with one ``np.log`` and one ``np.bincount``. Two
+sketches or profiles merge by adding counts, so profiles built by separate
+workers or days combine exactly.
+
+``DriftMonitor`` compares a live window against a saved training profile
+(``drift_profile.json``). Per feature it reports the PSI over the
+reference's deciles and the KS distance between the two CDFs. For the type
+mix it reports a PSI over types, plus flag rates per type. Both
+comparisons are computed on the shared bucket grid, so a report costs the
+same whatever the window size.
+
+    python drift_monitor.py --build                    # profile of the training split -> drift_profile.json
+    python drift_monitor.py --data new_transactions.csv
+"""
+import argparse
+import json
+import math
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from schema import DATASET_PATH, MODEL_PATH, NUMERIC_COLUMNS, TRANSACTION_TYPES
+
+PROFILE_PATH = 'drift_profile.json'
+MONITORED_COLUMNS = NUMERIC_COLUMNS + ['fraud_prob']
+RELATIVE_ACCURACY = 0.01
+MIN_VALUE = 1e-6
+MAX_VALUE = 1e13
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+PSI_BINS = 10
+EPS = 1e-4
+TYPE_SLOTS = {name: slot for slot, name in enumerate(TRANSACTION_TYPES)}
+
+
+class QuantileSketch:
+    """Counts of values in fixed logarithmic buckets, mergeable by addition.
+
+    Values whose magnitude is below ``min_value`` count as zero; magnitudes
+    above ``max_value`` land in the last bucket.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, min_value=MIN_VALUE, max_value=MAX_VALUE):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        size = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1
+        self.positive = np.zeros(size, dtype=np.int64)
+        self.negative = np.zeros(size, dtype=np.int64)
+        self.zero = 0
+        self.missing = 0
+
+    @property
+    def count(self):
+        return int(self.positive.sum() + self.negative.sum()) + self.zero
+
+    def layout(self):
+        return self.relative_accuracy, self.min_value, self.max_value
+
+    def _index(self, magnitudes):
+        idx = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64) - self._offset
+        return np.clip(idx, 0, len(self.positive) - 1)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        nan = np.isnan(values)
+        if nan.any():
+            self.missing += int(nan.sum())
+            values = values[~nan]
+        positive = values >= self.min_value
+        negative = values <= -self.min_value
+        self.zero += len(values) - int(positive.sum()) - int(negative.sum())
+        size = len(self.positive)
+        if positive.any():
+            self.positive += np.bincount(self._index(values[positive]), minlength=size)
+        if negative.any():
+            self.negative += np.bincount(self._index(-values[negative]), minlength=size)
+
+    def merge(self, other):
+        if other.layout() != self.layout():
+            raise ValueError("Cannot merge sketches with different bucket layouts")
+        self.positive += other.positive
+        self.negative += other.negative
+        self.zero += other.zero
+        self.missing += other.missing
+        return self
+
+    def counts(self):
+        """All bucket counts in value order: negatives, zero, positives."""
+        return np.concatenate([self.negative[::-1], [self.zero], self.positive])
+
+    def values(self):
+        """A representative value for each entry of ``counts()`` (within the relative accuracy)."""
+        mid = 2.0 * self._gamma ** (np.arange(len(self.positive)) + self._offset) / (self._gamma + 1)
+        return np.concatenate([-mid[::-1], [0.0], mid])
+
+    def quantile(self, q):
+        counts = self.counts()
+        total = counts.sum()
+        if total == 0:
+            return None
+        rank = np.searchsorted(np.cumsum(counts), q * (total - 1), side='right')
+        return float(self.values()[min(rank, len(counts) - 1)])
+
+    def to_dict(self):
+        pos, neg = np.flatnonzero(self.positive), np.flatnonzero(self.negative)
+        return {'relative_accuracy': self.relative_accuracy, 'min_value': self.min_value,
+                'max_value': self.max_value, 'zero': self.zero, 'missing': self.missing,
+                'positive': [pos.tolist(), self.positive[pos].tolist()],
+                'negative': [neg.tolist(), self.negative[neg].tolist()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'], data['min_value'], data['max_value'])
+        sketch.zero, sketch.missing = data['zero'], data['missing']
+        for name in ('positive', 'negative'):
+            idx, counts = data[name]
+            getattr(sketch, name)[idx] = counts
+        return sketch
+
+
+def psi(expected, actual):
+    """Population stability index between two count vectors over the same bins."""
+    e = np.clip(expected / max(expected.sum(), 1), EPS, None)
+    a = np.clip(actual / max(actual.sum(), 1), EPS, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def compare_sketches(reference, current, bins=PSI_BINS):
+    """``{'psi', 'ks'}`` of ``current`` against ``reference``; PSI is over the reference's quantile bins."""
+    ref, cur = reference.counts(), current.counts()
+    ref_cdf = np.cumsum(ref) / max(ref.sum(), 1)
+    cur_cdf = np.cumsum(cur) / max(cur.sum(), 1)
+    # Bin edges at the buckets holding the reference's deciles; ties (e.g. zero balances) merge bins.
+    edges = np.unique(np.searchsorted(ref_cdf, np.linspace(0, 1, bins + 1)[1:-1], side='left'))
+    ref_bins = np.diff(np.concatenate([[0], np.cumsum(ref)[edges], [ref.sum()]]))
+    cur_bins = np.diff(np.concatenate([[0], np.cumsum(cur)[edges], [cur.sum()]]))
+    return {'psi': psi(ref_bins, cur_bins), 'ks': float(np.max(np.abs(ref_cdf - cur_cdf)))}
+
+
+class Profile:
+    """Sketches and per-type counters of a stream of (scored) transactions."""
+
+    def __init__(self):
+        self.sketches = {column: QuantileSketch() for column in MONITORED_COLUMNS}
+        # One slot per known type plus one for anything else.
+        self.type_counts = np.zeros(len(TRANSACTION_TYPES) + 1, dtype=np.int64)
+        self.flag_counts = np.zeros_like(self.type_counts)
+        self.fraud_counts = np.zeros_like(self.type_counts)
+        self.labeled = 0
+        self.rows = 0
+
+    def update(self, frame):
+        """Fold in a frame with ``FEATURE_COLUMNS`` and, if present, ``fraud_prob``, ``is_flagged``, ``isFraud``."""
+        # Factorizing and mapping the handful of distinct values is several times cheaper than a Categorical.
+        local, uniques = pd.factorize(frame['type'])
+        other = len(TRANSACTION_TYPES)
+        lookup = np.array([TYPE_SLOTS.get(value, other) for value in uniques] + [other], dtype=np.int64)
+        codes = lookup[local]  # missing types (-1) map to the trailing "other" slot
+        slots = len(self.type_counts)
+        self.type_counts += np.bincount(codes, minlength=slots)
+        if 'is_flagged' in frame:
+            self.flag_counts += np.bincount(codes, weights=frame['is_flagged'].to_numpy(), minlength=slots
+                                            ).astype(np.int64)
+        if 'isFraud' in frame:
+            self.fraud_counts += np.bincount(codes, weights=frame['isFraud'].to_numpy(), minlength=slots
+                                             ).astype(np.int64)
+            self.labeled += len(frame)
+        for column, sketch in self.sketches.items():
+            if column in frame:
+                sketch.update(frame[column].to_numpy())
+        self.rows += len(frame)
+
+    def merge(self, other):
+        for column, sketch in self.sketches.items():
+            sketch.merge(other.sketches[column])
+        self.type_counts += other.type_counts
+        self.flag_counts += other.flag_counts
+        self.fraud_counts += other.fraud_counts
+        self.labeled += other.labeled
+        self.rows += other.rows
+        return self
+
+    def to_dict(self):
+        return {'rows': self.rows, 'labeled': self.labeled, 'types': TRANSACTION_TYPES + ['other'],
+                'type_counts': self.type_counts.tolist(), 'flag_counts': self.flag_counts.tolist(),
+                'fraud_counts': self.fraud_counts.tolist(),
+                'sketches': {column: sketch.to_dict() for column, sketch in self.sketches.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls()
+        if data['types'] != TRANSACTION_TYPES + ['other']:
+            raise ValueError("Profile was built for different transaction types")
+        profile.rows, profile.labeled = data['rows'], data['labeled']
+        for name in ('type_counts', 'flag_counts', 'fraud_counts'):
+            setattr(profile, name, np.array(data[name], dtype=np.int64))
+        for column, sketch in data['sketches'].items():
+            profile.sketches[column] = QuantileSketch.from_dict(sketch)
+        return profile
+
+    def save(self, path=PROFILE_PATH):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path=PROFILE_PATH):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def _status(value):
+    return 'alert' if value > PSI_ALERT else 'warn' if value > PSI_WARN else 'ok'
+
+
+def _rates(counts, totals):
+    return [float(c / t) if t else None for c, t in zip(counts, totals)]
+
+
+def compare(reference, current):
+    """Drift report of ``current`` against ``reference``; ``drifted`` lists the inputs with PSI above warn."""
+    names = TRANSACTION_TYPES + ['other']
+    report = {'rows': current.rows, 'reference_rows': reference.rows, 'features': {}}
+    for column in MONITORED_COLUMNS:
+        ref, cur = reference.sketches[column], current.sketches[column]
+        if not ref.count or not cur.count:
+            continue
+        entry = compare_sketches(ref, cur)
+        entry.update({f"p{int(q * 100)}": [ref.quantile(q), cur.quantile(q)] for q in (0.5, 0.9, 0.99)},
+                     status=_status(entry['psi']))
+        report['features'][column] = entry
+    mix = psi(reference.type_counts, current.type_counts)
+    report['type_mix'] = {'psi': mix, 'status': _status(mix),
+                          'share': {name: [r / max(reference.rows, 1), c / max(current.rows, 1)]
+                                    for name, r, c in zip(names, reference.type_counts.tolist(),
+                                                          current.type_counts.tolist())}}
+    report['flag_rate'] = dict(zip(names, zip(_rates(reference.flag_counts, reference.type_counts),
+                                              _rates(current.flag_counts, current.type_counts))))
+    if current.labeled:
+        report['fraud_rate'] = dict(zip(names, zip(_rates(reference.fraud_counts, reference.type_counts),
+                                                   _rates(current.fraud_counts, current.type_counts))))
+    report['drifted'] = [name for name, entry in report['features'].items() if entry['status'] != 'ok']
+    if report['type_mix']['status'] != 'ok':
+        report['drifted'].append('type')
+    return report
+
+
+class DriftMonitor:
+    """Thread-safe live window compared against a reference ``Profile``.
+
+    With ``window_rows`` the window is closed once it holds that many rows:
+    its report is kept as ``last_report`` and a new window starts.
+    """
+
+    def __init__(self, reference, window_rows=None):
+        self.reference = reference
+        self.window_rows = window_rows
+        self._lock = threading.Lock()
+        self._window = Profile()
+        self.last_report = None
+        self.windows = 0
+        self.seconds = 0.0
+
+    def observe(self, frame):
+        start = time.perf_counter()
+        with self._lock:
+            self._window.update(frame)
+            if self.window_rows and self._window.rows >= self.window_rows:
+                self.last_report = compare(self.reference, self._window)
+                self._window = Profile()
+                self.windows += 1
+            self.seconds += time.perf_counter() - start
+
+    def observe_results(self, records, results):
+        """Fold in transactions and their result dicts, as the service returns them.
+
+        ``records`` is a list of transaction dicts or an already parsed feature frame.
+        """
+        import scoring
+
+        frame = records.copy() if isinstance(records, pd.DataFrame) else scoring.records_to_frame(records)
+        frame['fraud_prob'] = [result['fraud_prob'] for result in results]
+        frame['is_flagged'] = [result['is_flagged'] for result in results]
+        self.observe(frame)
+
+    def report(self):
+        with self._lock:
+            window = self._window
+            report = compare(self.reference, window) if window.rows else None
+            return {'window': report, 'last_window': self.last_report, 'closed_windows': self.windows,
+                    'observe_seconds': self.seconds}
+
+
+def print_report(report, file=None):
+    print(f"{report['rows']:,} rows against a {report['reference_rows']:,}-row reference", file=file)
+    print(f"{'input':<16} {'PSI':>7} {'KS':>7} {'p50 ref':>12} {'p50 now':>12} {'p99 ref':>12} {'p99 now':>12}  status",
+          file=file)
+    for name, e in report['features'].items():
+        print(f"{name:<16} {e['psi']:>7.3f} {e['ks']:>7.3f} {e['p50'][0]:>12,.2f} {e['p50'][1]:>12,.2f} "
+              f"{e['p99'][0]:>12,.2f} {e['p99'][1]:>12,.2f}  {e['status']}", file=file)
+    mix = report['type_mix']
+    print(f"{'type mix':<16} {mix['psi']:>7.3f} {'':>7} " + ", ".join(
+        f"{name} {ref:.1%}->{cur:.1%}" for name, (ref, cur) in mix['share'].items() if ref or cur)
+        + f"  {mix['status']}", file=file)
+    print("flag rate by type: " + ", ".join(
+        f"{name} {ref:.1%}->{cur:.1%}" for name, (ref, cur) in report['flag_rate'].items()
+        if ref is not None and cur is not None), file=file)
+    print(f"Drifted: {', '.join(report['drifted'])}" if report['drifted'] else "No drift above PSI "
+          f"{PSI_WARN:g}", file=file)
+
+
+def main():
+    import scoring
+    from columnar import load_transactions
+
+    parser = argparse.ArgumentParser(description="Profile transactions and check them for drift")
+    parser.add_argument("--build", action="store_true",
+                        help="Write the reference profile from the training split of --data")
+    parser.add_argument("--data", default=DATASET_PATH, help="Transactions (CSV, Parquet or Arrow)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--profile", default=PROFILE_PATH)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    frame = load_transactions(args.data)
+    if args.build:
+        from sklearn.model_selection import train_test_split
+        # The rows train.py fits on.
+        frame, _ = train_test_split(frame, test_size=0.2, random_state=42)
+    model = scoring.load_model(args.model)
+    profile = Profile()
+    start = time.perf_counter()
+    for lo in range(0, len(frame), args.chunk_size):
+        profile.update(scoring.score_batch(model, frame.iloc[lo:lo + args.chunk_size]))
+    elapsed = time.perf_counter() - start
+    if args.build:
+        profile.save(args.profile)
+        print(f"Profiled {profile.rows:,} rows in {elapsed:.2f}s -> {args.profile}")
+        return
+    report = compare(Profile.load(args.profile), profile)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Per-feature explanations of the booster's scores, computed off the scoring path.
+
+``explain`` asks XGBoost for its exact tree contributions (``pred_contribs``,
+TreeSHAP) for a whole batch at once and folds the one-hot ``type`` columns
+back into a single ``type`` feature. Contributions are in log-odds: they add
+up, with the bias, to the booster's margin. Rule overrides from
+``rules.json`` are not part of the model and are reported by the indicators
+instead.
+
+Contributions cost far more than a prediction, so ``ExplanationService``
+computes them in background worker threads. ``request`` only queues
+transactions and returns their keys; ``get``/``wait`` collect results once
+they are ready. Results are cached per canonical transaction (the prediction
+cache's key) and dropped as soon as any of them sees that the underlying
+model has changed; a failed batch is reported once and then retried on the
+next request instead of being cached. Batch jobs call
+``request_flagged`` with a scored frame to explain only the flagged rows.
+
+    python explanations.py --data transactions.csv --out explanations.csv
+"""
+import argparse
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import scoring
+from compiled import CompiledPredictor
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache, canonical_keys, frame_keys
+from schema import DATASET_PATH, FEATURE_COLUMNS, MODEL_PATH, NUMERIC_COLUMNS
+
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_BATCH_SIZE = 512
+
+
+def as_compiled(model):
+    """The ``CompiledPredictor`` behind ``model``; raises ``ValueError`` if it has no XGBoost booster."""
+    if isinstance(model, CompiledPredictor) and model.booster is not None:
+        return model
+    if hasattr(model, "named_steps") and hasattr(model.named_steps.get("classifier"), "get_booster"):
+        return CompiledPredictor.from_pipeline(model)
+    raise ValueError(f"Cannot explain a {type(model).__name__}; explanations need an XGBoost booster")
+
+
+def explain(model, frame):
+    """Contributions of ``frame``'s rows as ``(contributions, bias)``.
+
+    ``contributions`` is an (n, 6) array over ``FEATURE_COLUMNS``; ``bias``
+    is the per-row expected margin.
+    """
+    import xgboost
+
+    predictor = as_compiled(model)
+    X = predictor.transform(predictor.encode_types(frame["type"].to_numpy()),
+                            frame[NUMERIC_COLUMNS].to_numpy(dtype=np.float64))
+    raw = predictor.booster.predict(xgboost.DMatrix(X), pred_contribs=True)
+    n_numeric = len(NUMERIC_COLUMNS)
+    contributions = np.empty((len(X), len(FEATURE_COLUMNS)))
+    contributions[:, 0] = raw[:, n_numeric:-1].sum(axis=1)
+    contributions[:, 1:] = raw[:, :n_numeric]
+    return contributions, raw[:, -1]
+
+
+def explain_frame(model, frame):
+    """``frame`` with one ``contrib_<feature>`` column per feature plus ``contrib_bias``."""
+    contributions, bias = explain(model, frame)
+    out = frame.copy()
+    for i, name in enumerate(FEATURE_COLUMNS):
+        out[f"contrib_{name}"] = contributions[:, i]
+    out["contrib_bias"] = bias
+    return out
+
+
+def _current_model(source):
+    if isinstance(source, ModelRegistry):
+        return source.active.model
+    if isinstance(source, PredictionCache):
+        return source.model
+    return source
+
+
+class ExplanationService:
+    def __init__(self, model, workers=1, max_batch_size=DEFAULT_BATCH_SIZE, max_entries=DEFAULT_MAX_ENTRIES):
+        """``model`` is a model, a ``ModelRegistry`` (its active model) or a ``PredictionCache``."""
+        self.source = model
+        self.max_batch_size = max_batch_size
+        self.max_entries = max_entries
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()
+        self._in_flight = set()
+        self._entries = OrderedDict()
+        self._failed = {}
+        self._model = None
+        self._closed = False
+        self.requested = self.computed = self.batches = self.errors = self.evictions = 0
+        self.seconds = 0.0
+        self._threads = [threading.Thread(target=self._run, name=f"explainer-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def request(self, records):
+        """Queue transaction dicts for explanation without waiting; returns their keys."""
+        return self.request_keys(canonical_keys(records))
+
+    def request_keys(self, keys):
+        """``request`` for canonical keys, as from ``prediction_cache.frame_keys``."""
+        model = _current_model(self.source)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ExplanationService is closed")
+            self._sync_model(model)
+            queued = 0
+            for key in keys:
+                if key not in self._entries and not self._is_queued(key):
+                    self._failed.pop(key, None)
+                    self._pending[key] = key
+                    queued += 1
+            self.requested += queued
+            if queued:
+                self._cond.notify_all()
+        return keys
+
+    def _is_queued(self, key):
+        return key in self._pending or key in self._in_flight
+
+    def _sync_model(self, model):
+        # Called with the lock held; a new model makes every cached explanation stale.
+        if model is not self._model:
+            self._entries.clear()
+            self._failed.clear()
+            self._model = model
+
+    def _result(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        return self._failed.get(key)
+
+    def request_flagged(self, scored):
+        """Queue only the rows of a ``scoring.score_batch`` result that were flagged."""
+        return self.request_keys(frame_keys(scored.loc[scored["is_flagged"], FEATURE_COLUMNS]))
+
+    def get(self, key):
+        """The explanation for ``key``, or ``None`` while it is still pending."""
+        model = _current_model(self.source)
+        with self._cond:
+            self._sync_model(model)
+            return self._result(key)
+
+    def wait(self, keys, timeout=None):
+        """Explanations for ``keys``, waiting up to ``timeout`` seconds; ``None`` for any not ready."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        model = _current_model(self.source)
+        with self._cond:
+            self._sync_model(model)
+            while any(key not in self._entries and self._is_queued(key) for key in keys):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [self._result(key) for key in keys]
+
+    def stats(self):
+        with self._cond:
+            return {"entries": len(self._entries), "pending": len(self._pending) + len(self._in_flight),
+                    "requested": self.requested, "computed": self.computed, "batches": self.batches,
+                    "errors": self.errors, "evictions": self.evictions, "seconds": self.seconds}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                keys = []
+                while self._pending and len(keys) < self.max_batch_size:
+                    keys.append(self._pending.popitem(last=False)[0])
+                self._in_flight.update(keys)
+            self._process(keys)
+
+    def _process(self, keys):
+        frame = pd.DataFrame(keys, columns=FEATURE_COLUMNS)
+        start = time.perf_counter()
+        model = _current_model(self.source)
+        try:
+            contributions, bias = explain(model, frame)
+        except Exception as e:
+            results = [{"error": str(e)}] * len(keys)
+            failed = True
+        else:
+            results = [{"bias": float(b), "margin": float(b + row.sum()),
+                        "contributions": dict(zip(FEATURE_COLUMNS, row.tolist()))}
+                       for row, b in zip(contributions, bias)]
+            failed = False
+        elapsed = time.perf_counter() - start
+
+        current = _current_model(self.source)
+        with self._cond:
+            self._sync_model(current)
+            self._in_flight.difference_update(keys)
+            if model is not current:
+                # Computed with a model that was swapped out meanwhile: explain these again.
+                for key in keys:
+                    self._pending.setdefault(key, key)
+                self._cond.notify_all()
+                return
+            for key, result in zip(keys, results):
+                if failed:
+                    self._failed[key] = result
+                else:
+                    self._entries[key] = result
+            while len(self._failed) > self.max_entries:
+                self._failed.pop(next(iter(self._failed)))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self.batches += 1
+            self.computed += len(keys)
+            self.errors += len(keys) if failed else 0
+            self.seconds += elapsed
+            self._cond.notify_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Explain the model's scores for a file of transactions")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=DATASET_PATH)
+    parser.add_argument("--out", default="explanations.csv")
+    parser.add_argument("--all", action="store_true", help="Explain every row, not just the flagged ones")
+    args = parser.parse_args()
+
+    model = scoring.load_model(args.model)
+    scored = scoring.score_batch(model, pd.read_csv(args.data))
+    rows = scored if args.all else scored[scored["is_flagged"]]
+    start = time.perf_counter()
+    explained = explain_frame(model, rows[FEATURE_COLUMNS + ["fraud_prob"]])
+    elapsed = time.perf_counter() - start
+    explained.to_csv(args.out, index=False)
+    print(f"Explained {len(rows):,} of {len(scored):,} rows in {elapsed:.2f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
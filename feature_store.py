@@ -0,0 +1,229 @@
+"""In-process per-account behavioral feature store.
+
+The model only sees the six raw fields of one transaction. This store keeps
+rolling aggregates per account over the last ``window_steps`` values of
+``step`` -- transaction count, total amount, last balance and the fraction
+of transactions that left the balance at zero -- so the scorer can see how
+an account has been behaving.
+
+Accounts are mapped to dense row ids. Each account owns ``window_steps``
+ring-buffer buckets (one per step) plus running window totals, all stored in
+flat typed ``array.array`` columns (about 20 bytes per bucket). An update
+adds to one bucket and subtracts the buckets that slid out of the window
+since the account was last touched, so it is O(1) amortized; a lookup at the
+account's latest step reads the running totals directly.
+"""
+from array import array
+
+import numpy as np
+
+
+DEFAULT_WINDOW_STEPS = 24
+ACCOUNT_FEATURES = ("txn_count", "total_amount", "last_balance", "drained_fraction")
+
+
+class AccountFeatureStore:
+    def __init__(self, window_steps=DEFAULT_WINDOW_STEPS):
+        if window_steps < 1:
+            raise ValueError("window_steps must be at least 1")
+        self.window_steps = window_steps
+        self._ids = {}
+        # Per bucket (row * window_steps + step % window_steps).
+        self._bucket_step = array("i")
+        self._bucket_count = array("i")
+        self._bucket_drained = array("i")
+        self._bucket_amount = array("d")
+        # Per account: latest step seen and totals over (head - window_steps, head].
+        self._head = array("i")
+        self._count = array("i")
+        self._drained = array("i")
+        self._amount = array("d")
+        self._last_balance = array("d")
+        self._empty_buckets = array("i", [-1] * window_steps)
+        self._zero_buckets = array("i", [0] * window_steps)
+        self._zero_amounts = array("d", [0.0] * window_steps)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, account):
+        return account in self._ids
+
+    @property
+    def nbytes(self):
+        arrays = (self._bucket_step, self._bucket_count, self._bucket_drained, self._bucket_amount,
+                  self._head, self._count, self._drained, self._amount, self._last_balance)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def _row(self, account):
+        row = self._ids.get(account)
+        if row is None:
+            row = self._ids[account] = len(self._ids)
+            self._bucket_step.extend(self._empty_buckets)
+            self._bucket_count.extend(self._zero_buckets)
+            self._bucket_drained.extend(self._zero_buckets)
+            self._bucket_amount.extend(self._zero_amounts)
+            self._head.append(-1)
+            self._count.append(0)
+            self._drained.append(0)
+            self._amount.append(0.0)
+            self._last_balance.append(float("nan"))
+        return row
+
+    def _expired(self, row, head, step):
+        """Sum of the buckets that leave the window when it moves from ``head`` to ``step``."""
+        window = self.window_steps
+        base = row * window
+        count = drained = 0
+        amount = 0.0
+        for old_step in range(head - window + 1, step - window + 1):
+            i = base + old_step % window
+            if self._bucket_step[i] == old_step:
+                count += self._bucket_count[i]
+                drained += self._bucket_drained[i]
+                amount += self._bucket_amount[i]
+        return count, amount, drained
+
+    def update(self, account, step, amount, balance, drained):
+        """Record one transaction for ``account`` at ``step``."""
+        row = self._row(account)
+        window = self.window_steps
+        head = self._head[row]
+        if step > head:
+            if step - head >= window:
+                self._count[row] = self._drained[row] = 0
+                self._amount[row] = 0.0
+            else:
+                count, old_amount, old_drained = self._expired(row, head, step)
+                self._count[row] -= count
+                self._drained[row] -= old_drained
+                self._amount[row] -= old_amount
+            self._head[row] = head = step
+            self._last_balance[row] = balance
+        elif step == head:
+            self._last_balance[row] = balance
+        elif step <= head - window:
+            return  # Too late to fall inside the current window.
+
+        i = row * window + step % window
+        if self._bucket_step[i] != step:
+            self._bucket_step[i] = step
+            self._bucket_count[i] = 0
+            self._bucket_drained[i] = 0
+            self._bucket_amount[i] = 0.0
+        self._bucket_count[i] += 1
+        self._bucket_drained[i] += drained
+        self._bucket_amount[i] += amount
+        self._count[row] += 1
+        self._drained[row] += drained
+        self._amount[row] += amount
+
+    def get(self, account, step):
+        """Return ``ACCOUNT_FEATURES`` for ``account`` over the window ending at ``step``."""
+        row = self._ids.get(account)
+        if row is None:
+            return 0, 0.0, float("nan"), 0.0
+        window = self.window_steps
+        head = self._head[row]
+        last_balance = self._last_balance[row]
+        if step >= head:
+            if step - head >= window:
+                return 0, 0.0, last_balance, 0.0
+            count, amount, drained = self._count[row], self._amount[row], self._drained[row]
+            if step > head:
+                old_count, old_amount, old_drained = self._expired(row, head, step)
+                count -= old_count
+                amount -= old_amount
+                drained -= old_drained
+        else:
+            # Historical query: scan the buckets.
+            count = drained = 0
+            amount = 0.0
+            base = row * window
+            for i in range(base, base + window):
+                if step - window < self._bucket_step[i] <= step:
+                    count += self._bucket_count[i]
+                    drained += self._bucket_drained[i]
+                    amount += self._bucket_amount[i]
+        if count == 0:
+            return 0, 0.0, last_balance, 0.0
+        return count, amount, last_balance, drained / count
+
+    def get_many(self, accounts, steps):
+        """Vectorized ``get`` for many accounts; returns an (n, 4) float64 array."""
+        steps = np.asarray(steps, dtype=np.int64)
+        rows = np.fromiter((self._ids.get(a, -1) for a in accounts), dtype=np.int64, count=len(steps))
+        known = rows >= 0
+        out = np.zeros((len(rows), len(ACCOUNT_FEATURES)), dtype=np.float64)
+        out[:, 2] = np.nan
+        if not known.any():
+            return out
+        window = self.window_steps
+        r = rows[known]
+        step = steps[known][:, None]
+        bucket_step = np.frombuffer(self._bucket_step, dtype=np.int32).reshape(-1, window)[r]
+        live = (bucket_step > step - window) & (bucket_step <= step)
+        bucket_count = np.frombuffer(self._bucket_count, dtype=np.int32).reshape(-1, window)[r]
+        bucket_drained = np.frombuffer(self._bucket_drained, dtype=np.int32).reshape(-1, window)[r]
+        count = np.where(live, bucket_count, 0).sum(axis=1)
+        drained = np.where(live, bucket_drained, 0).sum(axis=1)
+        amount = np.where(live, np.frombuffer(self._bucket_amount).reshape(-1, window)[r], 0.0).sum(axis=1)
+        out[known, 0] = count
+        out[known, 1] = amount
+        out[known, 2] = np.frombuffer(self._last_balance)[r]
+        out[known, 3] = np.divide(drained, count, out=np.zeros(len(r)), where=count > 0)
+        return out
+
+
+class TransactionFeatureStore:
+    """Sender (``nameOrig``) and receiver (``nameDest``) stores fed from the transaction log.
+
+    A sender counts as drained when a non-zero balance ends at zero; a
+    receiver when its balance is still zero after being paid.
+    """
+
+    def __init__(self, window_steps=DEFAULT_WINDOW_STEPS):
+        self.senders = AccountFeatureStore(window_steps)
+        self.receivers = AccountFeatureStore(window_steps)
+
+    @property
+    def feature_names(self):
+        return [f"orig_{f}" for f in ACCOUNT_FEATURES] + [f"dest_{f}" for f in ACCOUNT_FEATURES]
+
+    def update(self, step, nameOrig, nameDest, amount, oldbalanceOrg, newbalanceOrig, newbalanceDest):
+        self.senders.update(nameOrig, step, amount, newbalanceOrig, oldbalanceOrg > 0 and newbalanceOrig == 0)
+        self.receivers.update(nameDest, step, amount, newbalanceDest, newbalanceDest == 0)
+
+    def features(self, nameOrig, nameDest, step):
+        values = self.senders.get(nameOrig, step) + self.receivers.get(nameDest, step)
+        return dict(zip(self.feature_names, values))
+
+    def features_frame(self, frame):
+        """Features for every row of ``frame`` from the current state, without updating it."""
+        import pandas as pd
+
+        steps = frame["step"].to_numpy()
+        values = np.hstack([self.senders.get_many(frame["nameOrig"].to_numpy(), steps),
+                            self.receivers.get_many(frame["nameDest"].to_numpy(), steps)])
+        return pd.DataFrame(values, columns=self.feature_names, index=frame.index)
+
+    def update_frame(self, frame):
+        columns = ["step", "nameOrig", "nameDest", "amount", "oldbalanceOrg", "newbalanceOrig", "newbalanceDest"]
+        for row in zip(*(frame[c].to_numpy().tolist() for c in columns)):
+            self.update(*row)
+
+    def lookup_and_update(self, frame):
+        """Features as of just before each row, then fold the rows into the store.
+
+        Rows are processed in order, so a transaction sees every earlier one,
+        including earlier rows of the same frame.
+        """
+        import pandas as pd
+
+        columns = ["step", "nameOrig", "nameDest", "amount", "oldbalanceOrg", "newbalanceOrig", "newbalanceDest"]
+        out = np.empty((len(frame), 2 * len(ACCOUNT_FEATURES)), dtype=np.float64)
+        for i, row in enumerate(zip(*(frame[c].to_numpy().tolist() for c in columns))):
+            step, name_orig, name_dest = row[:3]
+            out[i] = self.senders.get(name_orig, step) + self.receivers.get(name_dest, step)
+            self.update(*row)
+        return pd.DataFrame(out, columns=self.feature_names, index=frame.index)
@@ -1,8 +1,19 @@
+import io
+import os
+import time
+
 import streamlit as st
 import pandas as pd
-import joblib
 import numpy as np
 
+import instrumentation
+import scoring
+import validation
+from explanations import ExplanationService
+from instrumentation import stage
+from prediction_cache import PredictionCache
+from schema import FEATURE_COLUMNS
+
 
 st.set_page_config(
     page_title="SecureScan - Fraud Detection",
@@ -14,15 +25,32 @@ st.set_page_config(
 @st.cache_resource
 def load_model():
     try:
-        model = joblib.load('xgboost_fraud_model.pkl')
-        st.success(f"Model loaded successfully! Model type: {type(model).__name__} --> XGBoost")
-        return model
+        cache = PredictionCache(scoring.MODEL_PATH)
+        st.success(f"Model loaded successfully! Model type: {type(cache.model).__name__} --> XGBoost")
+        return cache
     except Exception as e:
         st.error(f"Error loading model: {e}")
         return None
 
-# Load model
-model = load_model()
+@st.cache_resource
+def start_metrics_server():
+    # Scoring stage metrics and the profiler at http://127.0.0.1:<port>/metrics, /debug/profile
+    port = os.environ.get("SECURESCAN_METRICS_PORT")
+    return instrumentation.serve_metrics(port=int(port)) if port else None
+
+start_metrics_server()
+
+# Load model (reloaded by the cache whenever the model file changes)
+prediction_cache = load_model()
+model = prediction_cache.model if prediction_cache is not None else None
+
+@st.cache_resource
+def load_explainer(_prediction_cache):
+    # Per-feature contributions, computed in a background thread and cached per transaction.
+    return ExplanationService(_prediction_cache) if _prediction_cache is not None else None
+
+explainer = load_explainer(prediction_cache)
+EXPLANATION_WAIT_S = 5.0
 
 st.markdown('''
     <style>
@@ -430,242 +458,75 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-col_left, col_right = st.columns([1.2, 1], gap="large")
 
-with col_left:
+EXAMPLES = [
+    ["PAYMENT", "1,200.00", "10,000.00", "8,800.00", "5,000.00", "6,200.00"],
+    ["TRANSFER", "7,850.00", "8,000.00", "150.00", "0.00", "7,850.00"],
+    ["CASH_OUT", "2,500.00", "3,000.00", "500.00", "12,000.00", "14,500.00"],
+    ["CASH_IN", "1,500.00", "0.00", "1,500.00", "8,000.00", "6,500.00"],
+    ["DEBIT", "300.00", "500.00", "200.00", "0.00", "300.00"]
+]
 
-    st.markdown("""
-        <div class="card">
-            <div class="card-header">
-                <i>📝</i> Transaction Details
-            </div>
-    """, unsafe_allow_html=True)
-    
-
-    type_ = st.selectbox("Transaction Type", ["PAYMENT", "TRANSFER", "CASH_OUT", "CASH_IN", "DEBIT"], 
-                        help="Select the type of transaction")
-    st.markdown('<div class="info-text">CASH_OUT and TRANSFER transactions have higher fraud risk</div>', unsafe_allow_html=True)
-    
-    col1_1, col1_2 = st.columns(2)
-    with col1_1:
-        amount = st.text_input("Amount (Rs)", "1,250.00", 
-                              help="Transaction amount")
-        st.markdown('<div class="value-badge">Rs 1,250.00</div>', unsafe_allow_html=True)
-    with col1_2:
-        oldbalanceOrg = st.text_input("Sender Old Balance", "8,500.00", 
-                                    help="Sender's balance before transaction")
-        st.markdown('<div class="value-badge">Rs 8,500.00</div>', unsafe_allow_html=True)
-    
-    col2_1, col2_2 = st.columns(2)
-    with col2_1:
-        newbalanceOrig = st.text_input("Sender New Balance", "7,250.00", 
-                                     help="Sender's balance after transaction")
-        st.markdown('<div class="value-badge">Rs 7,250.00</div>', unsafe_allow_html=True)
-    with col2_2:
-        oldbalanceDest = st.text_input("Receiver Old Balance", "3,200.00", 
-                                      help="Receiver's balance before transaction")
-        st.markdown('<div class="value-badge">Rs 3,200.00</div>', unsafe_allow_html=True)
-    
-    newbalanceDest = st.text_input("Receiver New Balance", "4,450.00", 
-                                  help="Receiver's balance after transaction")
-    st.markdown('<div class="value-badge">Rs 4,450.00</div>', unsafe_allow_html=True)
-    
-
-    try:
-        old_org = float(oldbalanceOrg.replace(',', ''))
-        new_org = float(newbalanceOrig.replace(',', ''))
-        old_dest = float(oldbalanceDest.replace(',', ''))
-        new_dest = float(newbalanceDest.replace(',', ''))
-        
-        balance_diff_org = old_org - new_org
-        balance_diff_dest = new_dest - old_dest
-        
-        col_diff_1, col_diff_2 = st.columns(2)
-        with col_diff_1:
-            st.markdown(f'<div class="value-badge" style="background: rgba(239, 35, 60, 0.1); color: #ef233c;">Sender Deducted: Rs {balance_diff_org:,.2f}</div>', unsafe_allow_html=True)
-        with col_diff_2:
-            st.markdown(f'<div class="value-badge" style="background: rgba(82, 183, 136, 0.1); color: #52b788;">Receiver Gained: Rs {balance_diff_dest:,.2f}</div>', unsafe_allow_html=True)
-    except ValueError:
-        st.warning("Please enter valid numeric values for balance calculations")
-    
-    st.markdown("</div>", unsafe_allow_html=True)  # Close card
-    
-
-    predict_btn = st.button("🔍 Analyze Transaction", use_container_width=True, key="predict")
-
-with col_right:
-
-    st.markdown("""
-        <div class="card">
-            <div class="card-header">
-                <i>💡</i> Example Transactions
-            </div>
-    """, unsafe_allow_html=True)
-    
-
-    examples = [
-        ["PAYMENT", "1,200.00", "10,000.00", "8,800.00", "5,000.00", "6,200.00"],
-        ["TRANSFER", "7,850.00", "8,000.00", "150.00", "0.00", "7,850.00"],
-        ["CASH_OUT", "2,500.00", "3,000.00", "500.00", "12,000.00", "14,500.00"],
-        ["CASH_IN", "1,500.00", "0.00", "1,500.00", "8,000.00", "6,500.00"],
-        ["DEBIT", "300.00", "500.00", "200.00", "0.00", "300.00"]
-    ]
-    
-    example_df = pd.DataFrame(examples, columns=[
+@st.cache_data
+def examples_table_html():
+    # Rendered once per process instead of on every rerun.
+    example_df = pd.DataFrame(EXAMPLES, columns=[
         "Type", "Amount", "Sender Old Bal", "Sender New Bal", "Receiver Old Bal", "Receiver New Bal"
     ])
-    
-    st.markdown(example_df.style.hide(axis="index").to_html(), unsafe_allow_html=True)
-    
-    st.markdown("""
-        <div style="margin-top: 1.5rem;">
-            <div class="section-title"><i>🔎</i> Try these examples:</div>
-            <div>
-                <span class="feature-tag">Normal Payment</span>
-                <span class="feature-tag highlight">Suspicious Transfer</span>
-                <span class="feature-tag">Cash Out</span>
-                <span class="feature-tag">Cash In</span>
-                <span class="feature-tag">Debit</span>
-            </div>
-        </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("</div>", unsafe_allow_html=True) 
-    
-
-    st.markdown('<div class="section-title"><i>🔄</i> Autofill Examples</div>', unsafe_allow_html=True)
-    
-
-    with st.container():
-        st.markdown('<div id="autofill-example-select" style="width: 100%;">', unsafe_allow_html=True)
-        row_idx = st.selectbox("Select an example to load:", 
-                              options=list(range(len(examples))), 
-                              format_func=lambda x: f"Example {x+1}: {examples[x][0]} {examples[x][1]}",
-                              key="example_select")
-        
-        autofill_btn = st.button("Load Selected Example", use_container_width=True, key="autofill")
-        st.markdown('</div>', unsafe_allow_html=True)
-
-
-st.markdown("""
-    <div class="section-title" style="margin-top: 2rem;"><i>📊</i> Prediction Result</div>
-""", unsafe_allow_html=True)
-
-if predict_btn or autofill_btn:
-    if autofill_btn:
-        row = examples[row_idx]
-        type_, amount, oldbalanceOrg, newbalanceOrig, oldbalanceDest, newbalanceDest = row
-    
-
+    return example_df.style.hide(axis="index").to_html()
+
+@st.cache_data(max_entries=4)
+def score_uploaded(data, model_version):
+    # Keyed on the file's bytes and the model version, so reruns reuse the scored frame.
+    # Rows that fail validation are left out of the scored frame and returned as the error frame.
+    parsed = validation.parse_columns(pd.read_csv(io.BytesIO(data)))
+    frame = parsed.frame if parsed.valid.all() else parsed.frame[parsed.valid]
+    scored = scoring.score_batch(prediction_cache.model if prediction_cache is not None else None, frame)
+    return scored, parsed.error_frame()
+
+
+def show_result(record):
+    parsed = validation.parse_records([record])
+    error = parsed.error(0)
+    if error is not None:
+        st.error(f"Cannot analyze this transaction: {error['message']}")
+        return
+
+    features = None
     try:
- 
-        amount_val = float(amount.replace(',', ''))
-        oldbalanceOrg_val = float(oldbalanceOrg.replace(',', ''))
-        newbalanceOrig_val = float(newbalanceOrig.replace(',', ''))
-        oldbalanceDest_val = float(oldbalanceDest.replace(',', ''))
-        newbalanceDest_val = float(newbalanceDest.replace(',', ''))
-        
-
-        features = pd.DataFrame({
-            'type': [type_],
-            'amount': [amount_val],
-            'oldbalanceOrg': [oldbalanceOrg_val],
-            'newbalanceOrig': [newbalanceOrig_val],
-            'oldbalanceDest': [oldbalanceDest_val],
-            'newbalanceDest': [newbalanceDest_val]
-        })
-        
-
-        balance_diff_org = oldbalanceOrg_val - newbalanceOrig_val
-        balance_diff_dest = newbalanceDest_val - oldbalanceDest_val
-        
-
-        is_suspicious_cashout = (type_ == "CASH_OUT" and balance_diff_dest == 0 and oldbalanceDest_val > 0)
-        is_large_amount = amount_val > 10000
-        is_full_withdrawal = (type_ == "CASH_OUT" and newbalanceOrig_val < 1000)
-        is_zero_receiver = (oldbalanceDest_val == 0 and newbalanceDest_val == 0)
-        is_receiver_unchanged = (oldbalanceDest_val == newbalanceDest_val and type_ == "CASH_OUT" and oldbalanceDest_val > 0)
-        is_suspicious_transfer = (type_ == "TRANSFER" and balance_diff_dest == 0 and oldbalanceDest_val > 0)
-        is_amount_mismatch = (abs(balance_diff_org - amount_val) > 100)  
-        
-        
+        with stage("analyze", 1):
+            features, result, indicators = scoring.analyze_record(parsed, cache=prediction_cache)
+        fraud_prob, is_flagged = result["fraud_prob"], result["is_flagged"]
+        calibrated_prob = result.get("calibrated_prob")
         if model is not None:
-            
             st.write("Features being passed to model:", features)
-            
-            
-            if hasattr(model, 'predict_proba'):
-                try:
-                    fraud_prob = model.predict_proba(features)[0][1]  
-                    
-                    
-                    if is_suspicious_cashout:
-                        fraud_prob = max(fraud_prob, 0.8) 
-                    if is_suspicious_transfer:
-                        fraud_prob = max(fraud_prob, 0.9)  
-                    if is_amount_mismatch:
-                        fraud_prob = max(fraud_prob, 0.7)  
-                    if is_full_withdrawal and amount_val > 5000:
-                        fraud_prob = max(fraud_prob, 0.6)  
-                        
-                except Exception as pred_error:
-                    st.error(f"Prediction error: {pred_error}")
-                  
-                    fraud_prob = model.predict(features)[0]
-                    if fraud_prob == 1:
-                        fraud_prob = 0.9
-                    else:
-                        fraud_prob = 0.1
-            else:
-                
-                fraud_prob = model.predict(features)[0]
-                if fraud_prob == 1:
-                    fraud_prob = 0.9  
-                else:
-                    fraud_prob = 0.1  
-        else:
-            
-            if type_ == "TRANSFER" and amount_val > 4000:
-                fraud_prob = 0.87
-            elif type_ == "CASH_OUT" and newbalanceDest_val == 0:
-                fraud_prob = 0.76
-            elif amount_val > 8000:
-                fraud_prob = 0.65
-            else:
-                fraud_prob = 0.12
-        
-        
+
         st.write("**Fraud Indicators:**")
-        st.write(f"- Suspicious CASH_OUT (receiver had money but unchanged): {is_suspicious_cashout}")
-        st.write(f"- Suspicious TRANSFER (receiver unchanged): {is_suspicious_transfer}")
-        st.write(f"- Large amount (>10k): {is_large_amount}")
-        st.write(f"- Full withdrawal: {is_full_withdrawal}")
-        st.write(f"- Zero receiver (normal for CASH_OUT): {is_zero_receiver}")
-        st.write(f"- Amount mismatch: {is_amount_mismatch}")
-        st.write(f"- Sender deducted: Rs {balance_diff_org:,.2f}")
-        st.write(f"- Receiver gained: Rs {balance_diff_dest:,.2f}")
-        st.write(f"- Transaction amount: Rs {amount_val:,.2f}")
-        
-    except ValueError as e:
-        st.error("Please enter valid numeric values for all fields")
-        fraud_prob = 0.0
+        st.write(f"- Suspicious CASH_OUT (receiver had money but unchanged): {indicators['is_suspicious_cashout']}")
+        st.write(f"- Suspicious TRANSFER (receiver unchanged): {indicators['is_suspicious_transfer']}")
+        st.write(f"- Large amount (>10k): {indicators['is_large_amount']}")
+        st.write(f"- Full withdrawal: {indicators['is_full_withdrawal']}")
+        st.write(f"- Zero receiver (normal for CASH_OUT): {indicators['is_zero_receiver']}")
+        st.write(f"- Amount mismatch: {indicators['is_amount_mismatch']}")
+        st.write(f"- Sender deducted: Rs {indicators['balance_diff_org']:,.2f}")
+        st.write(f"- Receiver gained: Rs {indicators['balance_diff_dest']:,.2f}")
+        st.write(f"- Transaction amount: Rs {features['amount'].iloc[0]:,.2f}")
+        if prediction_cache is not None:
+            cache_stats = prediction_cache.stats()
+            st.caption(f"Prediction cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                       f"{cache_stats['evictions']} evictions")
+
     except Exception as e:
         st.error(f"Error during prediction: {e}")
-        
         try:
-            amount_val = float(amount.replace(',', ''))
-            if type_ == "TRANSFER" and amount_val > 4000:
-                fraud_prob = 0.87
-            elif type_ == "CASH_OUT":
-                fraud_prob = 0.76
-            elif amount_val > 8000:
-                fraud_prob = 0.65
-            else:
-                fraud_prob = 0.12
-        except:
+            fraud_prob = float(scoring.fallback_probability(parsed.frame, error=True)[0])
+        except Exception:
             fraud_prob = 0.0
-    
-    if fraud_prob > 0.5:
+        calibrated_prob = None
+        is_flagged = fraud_prob > 0.5
+
+    # With calibration.json the flag comes from the per-type thresholds rather than 0.5.
+    if is_flagged:
         result_text = "⚠️ High Fraud Risk Detected"
         result_class = "fraud"
         result_color = "#ef233c"
@@ -675,11 +536,13 @@ if predict_btn or autofill_btn:
         result_class = "safe"
         result_color = "#52b788"
         recommendation = "Recommendation: No action required"
-    
+
     #  probability display
     prob_display = f"{fraud_prob*100:.1f}%"
-    risk_level = "HIGH RISK" if fraud_prob > 0.5 else "LOW RISK"
-    
+    if calibrated_prob is not None:
+        prob_display += f" (calibrated: {calibrated_prob*100:.1f}%)"
+    risk_level = "HIGH RISK" if is_flagged else "LOW RISK"
+
     #  prediction display
     st.markdown(f"""
         <div class="prediction-box {result_class}">
@@ -692,6 +555,176 @@ if predict_btn or autofill_btn:
         </div>
     """, unsafe_allow_html=True)
 
+    # Shown after the score, which never waits for it.
+    if explainer is not None and features is not None:
+        show_explanation(explainer.request(features.to_dict(orient="records"))[0])
+
+
+def show_explanation(key):
+    # The score above is already on the page; poll only until this explanation is ready, has failed or times out.
+    placeholder = st.empty()
+    deadline = time.monotonic() + EXPLANATION_WAIT_S
+    explanation = explainer.get(key)
+    while explanation is None and time.monotonic() < deadline:
+        placeholder.caption("Explanation is still being computed...")
+        time.sleep(0.1)
+        explanation = explainer.get(key)
+    if explanation is None:
+        placeholder.caption("Explanation is not ready yet; analyze the transaction again to see it.")
+    elif "error" in explanation:
+        placeholder.empty()
+    else:
+        with placeholder.container():
+            st.write("**Why this score** (contribution of each feature to the model's log-odds):")
+            st.bar_chart(pd.Series(explanation["contributions"]), horizontal=True)
+
+
+# Interacting with a fragment reruns only that fragment, not the page (styles, header, batch scoring).
+@st.fragment
+def transaction_section():
+    col_left, col_right = st.columns([1.2, 1], gap="large")
+
+    with col_left:
+
+        st.markdown("""
+            <div class="card">
+                <div class="card-header">
+                    <i>📝</i> Transaction Details
+                </div>
+        """, unsafe_allow_html=True)
+
+        # Editing a field inside the form reruns nothing; the form is sent on "Analyze".
+        with st.form("transaction_form", border=False):
+            type_ = st.selectbox("Transaction Type", ["PAYMENT", "TRANSFER", "CASH_OUT", "CASH_IN", "DEBIT"], 
+                                help="Select the type of transaction")
+            st.markdown('<div class="info-text">CASH_OUT and TRANSFER transactions have higher fraud risk</div>', unsafe_allow_html=True)
+
+            col1_1, col1_2 = st.columns(2)
+            with col1_1:
+                amount = st.text_input("Amount (Rs)", "1,250.00", 
+                                      help="Transaction amount")
+                st.markdown('<div class="value-badge">Rs 1,250.00</div>', unsafe_allow_html=True)
+            with col1_2:
+                oldbalanceOrg = st.text_input("Sender Old Balance", "8,500.00", 
+                                            help="Sender's balance before transaction")
+                st.markdown('<div class="value-badge">Rs 8,500.00</div>', unsafe_allow_html=True)
+
+            col2_1, col2_2 = st.columns(2)
+            with col2_1:
+                newbalanceOrig = st.text_input("Sender New Balance", "7,250.00", 
+                                             help="Sender's balance after transaction")
+                st.markdown('<div class="value-badge">Rs 7,250.00</div>', unsafe_allow_html=True)
+            with col2_2:
+                oldbalanceDest = st.text_input("Receiver Old Balance", "3,200.00", 
+                                              help="Receiver's balance before transaction")
+                st.markdown('<div class="value-badge">Rs 3,200.00</div>', unsafe_allow_html=True)
+
+            newbalanceDest = st.text_input("Receiver New Balance", "4,450.00", 
+                                          help="Receiver's balance after transaction")
+            st.markdown('<div class="value-badge">Rs 4,450.00</div>', unsafe_allow_html=True)
+
+
+            # Inside the form, so the preview follows the values last sent with "Analyze", not each keystroke.
+            balances, codes = validation.parse_money([oldbalanceOrg, newbalanceOrig, oldbalanceDest, newbalanceDest])
+            if (codes == validation.OK).all():
+                old_org, new_org, old_dest, new_dest = balances.tolist()
+
+                balance_diff_org = old_org - new_org
+                balance_diff_dest = new_dest - old_dest
+
+                col_diff_1, col_diff_2 = st.columns(2)
+                with col_diff_1:
+                    st.markdown(f'<div class="value-badge" style="background: rgba(239, 35, 60, 0.1); color: #ef233c;">Sender Deducted: Rs {balance_diff_org:,.2f}</div>', unsafe_allow_html=True)
+                with col_diff_2:
+                    st.markdown(f'<div class="value-badge" style="background: rgba(82, 183, 136, 0.1); color: #52b788;">Receiver Gained: Rs {balance_diff_dest:,.2f}</div>', unsafe_allow_html=True)
+            else:
+                labels = ["Sender Old Balance", "Sender New Balance", "Receiver Old Balance", "Receiver New Balance"]
+                bad = [label for label, code in zip(labels, codes) if code != validation.OK]
+                st.warning(f"Please enter valid non-negative amounts for: {', '.join(bad)}")
+
+            predict_btn = st.form_submit_button("🔍 Analyze Transaction", use_container_width=True, key="predict")
+
+        st.markdown("</div>", unsafe_allow_html=True)  # Close card
+
+    with col_right:
+
+        st.markdown("""
+            <div class="card">
+                <div class="card-header">
+                    <i>💡</i> Example Transactions
+                </div>
+        """, unsafe_allow_html=True)
+
+        st.markdown(examples_table_html(), unsafe_allow_html=True)
+
+        st.markdown("""
+            <div style="margin-top: 1.5rem;">
+                <div class="section-title"><i>🔎</i> Try these examples:</div>
+                <div>
+                    <span class="feature-tag">Normal Payment</span>
+                    <span class="feature-tag highlight">Suspicious Transfer</span>
+                    <span class="feature-tag">Cash Out</span>
+                    <span class="feature-tag">Cash In</span>
+                    <span class="feature-tag">Debit</span>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+
+        st.markdown("</div>", unsafe_allow_html=True) 
+
+
+        st.markdown('<div class="section-title"><i>🔄</i> Autofill Examples</div>', unsafe_allow_html=True)
+
+
+        with st.container():
+            st.markdown('<div id="autofill-example-select" style="width: 100%;">', unsafe_allow_html=True)
+            row_idx = st.selectbox("Select an example to load:", 
+                                  options=list(range(len(EXAMPLES))), 
+                                  format_func=lambda x: f"Example {x+1}: {EXAMPLES[x][0]} {EXAMPLES[x][1]}",
+                                  key="example_select")
+
+            autofill_btn = st.button("Load Selected Example", use_container_width=True, key="autofill")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+
+    st.markdown("""
+        <div class="section-title" style="margin-top: 2rem;"><i>📊</i> Prediction Result</div>
+    """, unsafe_allow_html=True)
+
+    if predict_btn or autofill_btn:
+        values = EXAMPLES[row_idx] if autofill_btn else [type_, amount, oldbalanceOrg, newbalanceOrig,
+                                                          oldbalanceDest, newbalanceDest]
+        show_result(dict(zip(FEATURE_COLUMNS, values)))
+
+
+@st.fragment
+def batch_section():
+    st.markdown("""
+        <div class="section-title" style="margin-top: 2rem;"><i>📂</i> Batch Scoring</div>
+    """, unsafe_allow_html=True)
+
+    batch_file = st.file_uploader("Upload a transactions CSV (same columns as the dataset)", type=["csv"],
+                                  key="batch_file")
+
+    if batch_file is not None:
+        try:
+            scored_df, rejected_df = score_uploaded(batch_file.getvalue(),
+                                                    prediction_cache.version if prediction_cache is not None else None)
+            flagged = int(scored_df["is_flagged"].sum())
+            st.write(f"Scored {len(scored_df):,} transactions, {flagged:,} flagged as high fraud risk")
+            if len(rejected_df):
+                st.warning(f"{len(rejected_df):,} rows failed validation and were not scored")
+                st.dataframe(rejected_df.head(100))
+            st.dataframe(scored_df[scored_df["is_flagged"]].head(100))
+            st.download_button("Download scored CSV", scored_df.to_csv(index=False).encode("utf-8"),
+                               file_name="scored_transactions.csv", mime="text/csv")
+        except ValueError as e:
+            st.error(f"Could not score file: {e}")
+
+
+transaction_section()
+batch_section()
+
 # Footer
 st.markdown("""
     <div class="footer">
@@ -700,4 +733,4 @@ st.markdown("""
             <small>Using advanced machine learning to protect your transactions</small>
         </div>
     </div>
-""", unsafe_allow_html=True)    
\ No newline at end of file
+""", unsafe_allow_html=True)
@@ -0,0 +1,344 @@
+"""Per-stage timing of the scoring path, exported in Prometheus text format.
+
+Every scoring call is split into stages and each one is timed into a
+histogram and a row counter:
+
+    parse        string -> float conversion of input records
+    frame        DataFrame construction
+    indicators   rule indicators and derived values
+    preprocess   the pipeline's ColumnTransformer
+    booster      the classifier's predict_proba
+    model        predict_proba of non-pipeline models (compiled / NumPy trees)
+    overrides    rule floors after the model
+    fallback     rule probabilities instead of the model, when none is loaded
+    calibration  calibrated probabilities and per-type flags, with ``calibration.json``
+    account_features  per-account window features, when a feature store is used
+    assemble     copying the chunk and attaching result columns
+    score_batch  the whole of ``scoring.score_batch``
+    analyze      one transaction from the app form, end to end (``fraud.py``)
+
+``render()`` returns every metric in the Prometheus text exposition format;
+``server.py`` serves it at ``GET /metrics`` and ``serve_metrics`` starts a
+small sidecar endpoint for processes without one (the Streamlit app).
+
+``SamplingProfiler`` is off until started. It samples the Python stacks of
+all threads from a background thread and aggregates them as folded stacks
+(flamegraph input); ``GET /debug/profile?seconds=N`` runs it for N seconds,
+one session at a time (409 while another is running).
+
+Set ``SECURESCAN_METRICS=0`` (or call ``set_enabled(False)``) to turn the
+timers into no-ops.
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+MAX_PROFILE_SECONDS = 60
+
+_enabled = os.environ.get("SECURESCAN_METRICS", "1") != "0"
+
+
+def set_enabled(flag):
+    global _enabled
+    _enabled = bool(flag)
+
+
+def is_enabled():
+    return _enabled
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{name}_bucket", labels + (("le", le),), cumulative
+        yield f"{name}_sum", labels, total
+        yield f"{name}_count", labels, cumulative
+
+
+class Registry:
+    """Metric families keyed by name, each holding one child per label set."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+
+    def counter(self, name, help, **labels):
+        return self._child("counter", name, help, labels, Counter)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, **labels):
+        return self._child("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def _child(self, kind, name, help, labels, factory):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help, {}))
+            if family[0] != kind:
+                raise ValueError(f"Metric {name!r} is already a {family[0]}")
+            children = family[2]
+            if key not in children:
+                children[key] = factory()
+            return children[key]
+
+    def render(self):
+        with self._lock:
+            families = [(name, kind, help, list(children.items()))
+                        for name, (kind, help, children) in sorted(self._families.items())]
+        lines = []
+        for name, kind, help, children in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, child in children:
+                for sample, sample_labels, value in child.samples(name, labels):
+                    lines.append(f"{sample}{_format_labels(sample_labels)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._families.clear()
+        _stages.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry()
+_stages = {}
+
+
+class _Stage:
+    __slots__ = ("metrics", "rows", "start")
+
+    def __init__(self, metrics, rows):
+        self.metrics = metrics
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds, rows, errors = self.metrics
+        seconds.observe(time.perf_counter() - self.start)
+        if self.rows:
+            rows.inc(self.rows)
+        if exc_type is not None:
+            errors.inc()
+        return False
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name, rows=0):
+    """Context manager timing one scoring stage of ``rows`` rows."""
+    if not _enabled:
+        return _NULL_STAGE
+    metrics = _stages.get(name)
+    if metrics is None:
+        metrics = _stages[name] = (
+            REGISTRY.histogram("securescan_stage_seconds", "Time spent in each scoring stage.", stage=name),
+            REGISTRY.counter("securescan_stage_rows_total", "Rows processed by each scoring stage.", stage=name),
+            REGISTRY.counter("securescan_stage_errors_total", "Scoring stage calls that raised.", stage=name),
+        )
+    return _Stage(metrics, rows)
+
+
+def render():
+    return REGISTRY.render()
+
+
+class SamplingProfiler:
+    """Statistical profiler: samples every thread's Python stack each ``interval`` seconds.
+
+    Costs nothing until ``start``; while running, the sampling thread holds
+    the GIL for a few microseconds per sample.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = _Tally()
+        self.samples = 0
+        self.ignored_threads = set()
+        self._lock = threading.Lock()
+        # Held for a whole ``profile_for`` session, whose reset/start/stop would corrupt another's samples.
+        self.session = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            sampled = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident in self.ignored_threads:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                sampled.append(";".join(reversed(names)))
+            with self._lock:
+                self.stacks.update(sampled)
+                self.samples += 1
+
+    def folded(self):
+        """Samples as ``root;...;leaf count`` lines, the input format of flamegraph.pl/speedscope."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit=20):
+        """The ``limit`` frames seen most often at the top of a stack, with their sample counts."""
+        leaves = _Tally()
+        with self._lock:
+            for stack, count in self.stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+PROFILER = SamplingProfiler()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def profile_for(seconds, profiler=PROFILER):
+    """Run ``profiler`` for ``seconds`` and return its folded stacks.
+
+    The calling thread, which only sleeps meanwhile, is left out. Raises
+    ``ProfilerBusy`` if another session is already running on ``profiler``.
+    """
+    if not profiler.session.acquire(blocking=False):
+        raise ProfilerBusy("A profiling session is already running")
+    try:
+        caller = threading.get_ident()
+        profiler.reset()
+        profiler.ignored_threads.add(caller)
+        profiler.start()
+        try:
+            time.sleep(seconds)
+        finally:
+            profiler.stop()
+            profiler.ignored_threads.discard(caller)
+        return profiler.folded()
+    finally:
+        profiler.session.release()
+
+
+def handle_request(path):
+    """Serve ``/metrics`` and ``/debug/profile``; returns ``(status, content_type, body)`` or ``None``."""
+    url = urlparse(path)
+    if url.path == "/metrics":
+        return 200, CONTENT_TYPE, render()
+    if url.path == "/debug/profile":
+        query = parse_qs(url.query)
+        try:
+            seconds = float(query.get("seconds", ["5"])[0])
+        except ValueError:
+            return 400, "text/plain; charset=utf-8", "seconds must be a number\n"
+        seconds = min(max(seconds, 0.0), MAX_PROFILE_SECONDS)
+        try:
+            return 200, "text/plain; charset=utf-8", profile_for(seconds)
+        except ProfilerBusy as e:
+            return 409, "text/plain; charset=utf-8", f"{e}\n"
+    return None
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        response = handle_request(self.path) or (404, "text/plain; charset=utf-8", "Not found\n")
+        status, content_type, body = response
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(host="127.0.0.1", port=9108):
+    """Serve ``/metrics`` and ``/debug/profile`` from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,263 @@
+"""In-memory registry of versioned models with hot swap and shadow scoring.
+
+``ModelRegistry`` holds several loaded models under version names. One is
+active; it answers every ``predict_proba`` call, so the registry can be
+passed anywhere a model is expected (``scoring.score_batch``, the
+``MicroBatcher``, the HTTP service). ``activate`` swaps the active model by
+replacing a single reference: a call that already started finishes on the
+model it started with and the next call uses the new one, so no request is
+dropped or split between models.
+
+An optional shadow model sees the same inputs. After the active model has
+answered, the batch is handed to a small background thread pool which
+scores it with the shadow model and records the flag agreement, the
+probability differences and the latency difference. The shadow never
+delays or changes the active result; when the pool is saturated, batches
+are skipped and counted instead of queued.
+
+    registry = ModelRegistry()
+    registry.register("v1", path="xgboost_fraud_model.pkl", activate=True)
+    registry.register("v2", path="artifacts/<version>/xgboost.pkl")
+    registry.set_shadow("v2")             # compare v2 on live traffic
+    scoring.score_batch(registry, frame)
+    registry.activate("v2")               # atomic hot swap
+"""
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import scoring
+
+
+logger = logging.getLogger("securescan.registry")
+
+FLAG_THRESHOLD = 0.5
+
+
+class ModelVersion:
+    def __init__(self, version, model, path=None, warmup_seconds=None):
+        self.version = version
+        self.model = model
+        self.path = path
+        self.loaded_at = time.time()
+        self.warmup_seconds = warmup_seconds
+
+    def info(self):
+        return {"version": self.version, "path": self.path, "type": type(self.model).__name__,
+                "loaded_at": self.loaded_at, "warmup_seconds": self.warmup_seconds}
+
+
+class ShadowStats:
+    """Running comparison of a shadow model against the active one."""
+
+    def __init__(self, active, shadow):
+        self.active = active
+        self.shadow = shadow
+        self.batches = self.rows = self.agreements = self.errors = 0
+        self.abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+        self.active_seconds = self.shadow_seconds = 0.0
+
+    def add(self, active_prob, shadow_prob, active_seconds, shadow_seconds):
+        diff = np.abs(shadow_prob - active_prob)
+        self.batches += 1
+        self.rows += len(diff)
+        self.agreements += int(np.count_nonzero((active_prob > FLAG_THRESHOLD) == (shadow_prob > FLAG_THRESHOLD)))
+        self.abs_diff_sum += float(diff.sum())
+        self.max_abs_diff = max(self.max_abs_diff, float(diff.max(initial=0.0)))
+        self.active_seconds += active_seconds
+        self.shadow_seconds += shadow_seconds
+
+    def summary(self):
+        rows = max(self.rows, 1)
+        return {
+            "active": self.active, "shadow": self.shadow, "batches": self.batches, "rows": self.rows,
+            "errors": self.errors, "agreement": self.agreements / rows if self.rows else None,
+            "mean_abs_diff": self.abs_diff_sum / rows, "max_abs_diff": self.max_abs_diff,
+            "active_us_per_row": self.active_seconds / rows * 1e6,
+            "shadow_us_per_row": self.shadow_seconds / rows * 1e6,
+            "latency_delta_us_per_row": (self.shadow_seconds - self.active_seconds) / rows * 1e6,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, shadow_workers=2, max_pending_shadow=8, shadow_sample_rate=1.0, log_every=100,
+                 loader=scoring.load_model):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._active = None
+        self._shadow = None
+        self.swaps = 0
+        self.shadow_sample_rate = shadow_sample_rate
+        self.log_every = log_every
+        self._shadow_stats = {}
+        self._shadow_pool = ThreadPoolExecutor(max_workers=shadow_workers, thread_name_prefix="shadow")
+        self.max_pending_shadow = max_pending_shadow
+        self._shadow_slots = threading.BoundedSemaphore(max_pending_shadow)
+        self.shadow_skipped = 0
+
+    def register(self, version, model=None, path=None, activate=False, warm=True):
+        """Add ``model`` (or the model loaded from ``path``) under ``version``.
+
+        Loading and warm-up happen before the registry lock is taken, so
+        traffic keeps flowing while a new model is prepared.
+        """
+        if (model is None) == (path is None):
+            raise ValueError("Pass exactly one of model or path")
+        with self._lock:
+            if version in self._versions:
+                raise ValueError(f"Model version {version!r} is already registered")
+        if model is None:
+            model = self._loader(path)
+        warmup_s = scoring.warm_up(model) if warm else None
+        entry = ModelVersion(version, model, path, warmup_s)
+        with self._lock:
+            if version in self._versions:
+                raise ValueError(f"Model version {version!r} is already registered")
+            self._versions[version] = entry
+        logger.info("Registered model %s (%s)", version, path or type(model).__name__)
+        if activate or self._active is None:
+            self.activate(version)
+        return entry
+
+    def unregister(self, version):
+        with self._lock:
+            entry = self._get(version)
+            if entry is self._active or entry is self._shadow:
+                raise ValueError(f"Model version {version!r} is active or shadow; switch away from it first")
+            del self._versions[version]
+
+    def _get(self, version):
+        try:
+            return self._versions[version]
+        except KeyError:
+            raise ValueError(f"Unknown model version {version!r}") from None
+
+    def activate(self, version):
+        """Make ``version`` the active model. Calls already in flight finish on the previous one."""
+        with self._lock:
+            entry = self._get(version)
+            previous, self._active = self._active, entry
+            if self._shadow is entry:
+                self._shadow = None
+            self.swaps += previous is not None and previous is not entry
+        logger.info("Active model: %s (was %s)", version, previous.version if previous else None)
+
+    def set_shadow(self, version):
+        """Mirror traffic to ``version`` in the background; ``None`` stops shadowing."""
+        with self._lock:
+            entry = None if version is None else self._get(version)
+            if entry is not None and entry is self._active:
+                raise ValueError(f"Model version {version!r} is already active")
+            self._shadow = entry
+        logger.info("Shadow model: %s", version)
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def shadow(self):
+        return self._shadow
+
+    def versions(self):
+        with self._lock:
+            return list(self._versions)
+
+    def predict_fraud_proba(self, features):
+        """Fraud probabilities from the active model; mirrors the batch to the shadow if one is set."""
+        active, shadow = self._active, self._shadow
+        if active is None:
+            raise RuntimeError("No active model registered")
+        start = time.perf_counter()
+        prob = scoring.predict_fraud_proba(active.model, features)
+        elapsed = time.perf_counter() - start
+        if shadow is not None and (self.shadow_sample_rate >= 1.0 or random.random() < self.shadow_sample_rate):
+            self._submit_shadow(active, shadow, features, prob, elapsed)
+        return prob
+
+    def predict_proba(self, features):
+        prob = self.predict_fraud_proba(features)
+        return np.column_stack([1.0 - prob, prob])
+
+    def _submit_shadow(self, active, shadow, features, active_prob, active_seconds):
+        if not self._shadow_slots.acquire(blocking=False):
+            with self._lock:
+                self.shadow_skipped += 1
+            return
+        try:
+            future = self._shadow_pool.submit(self._run_shadow, active, shadow, features, active_prob, active_seconds)
+        except RuntimeError:
+            # Pool already shut down.
+            self._shadow_slots.release()
+            return
+        future.add_done_callback(lambda _: self._shadow_slots.release())
+
+    def _run_shadow(self, active, shadow, features, active_prob, active_seconds):
+        key = (active.version, shadow.version)
+        try:
+            # predict_proba directly, so the shadow does not show up in the scoring stage metrics.
+            start = time.perf_counter()
+            shadow_prob = np.asarray(shadow.model.predict_proba(features)[:, 1], dtype=np.float64)
+            shadow_seconds = time.perf_counter() - start
+        except Exception:
+            logger.exception("Shadow model %s failed", shadow.version)
+            with self._lock:
+                self._shadow_stats.setdefault(key, ShadowStats(*key)).errors += 1
+            return
+        with self._lock:
+            stats = self._shadow_stats.setdefault(key, ShadowStats(*key))
+            stats.add(np.asarray(active_prob, dtype=np.float64), shadow_prob, active_seconds, shadow_seconds)
+            summary = stats.summary() if stats.batches % self.log_every == 0 else None
+        if summary is not None:
+            logger.info("Shadow %s vs active %s: %d rows, agreement %.4f, mean |dp| %.5f, max |dp| %.4f, "
+                        "latency %+.1f us/row", summary["shadow"], summary["active"], summary["rows"],
+                        summary["agreement"], summary["mean_abs_diff"], summary["max_abs_diff"],
+                        summary["latency_delta_us_per_row"])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": self._active.version if self._active else None,
+                "shadow": self._shadow.version if self._shadow else None,
+                "swaps": self.swaps,
+                "shadow_skipped": self.shadow_skipped,
+                "versions": [entry.info() for entry in self._versions.values()],
+                "comparisons": [stats.summary() for stats in self._shadow_stats.values()],
+            }
+
+    def wait_for_shadow(self, timeout=None):
+        """Block until every queued shadow batch has been scored (for tests and benchmarks)."""
+        slots = self.max_pending_shadow
+        deadline = None if timeout is None else time.monotonic() + timeout
+        taken = 0
+        try:
+            while taken < slots:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not self._shadow_slots.acquire(timeout=remaining):
+                    return False
+                taken += 1
+            return True
+        finally:
+            for _ in range(taken):
+                self._shadow_slots.release()
+
+    def close(self):
+        self._shadow_pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def version_name(path):
+    """Default version name for a model file: its file name plus modification time."""
+    return f"{os.path.basename(path)}@{int(os.stat(path).st_mtime)}"
@@ -0,0 +1,216 @@
+"""Pure-NumPy evaluator for the deployed XGBoost tree ensemble.
+
+``export_model`` (which needs the full training stack) flattens the booster
+inside ``xgboost_fraud_model.pkl`` into node arrays -- split feature,
+float32 threshold, left/right child, missing-value direction and leaf
+value -- plus the scaler and one-hot layout of the preprocessing step, and
+saves them to an ``.npz`` file. ``NumpyTreeEnsemble`` loads that file with
+nothing but NumPy and walks every tree for a whole batch at once, one tree
+level per step. The preprocessing is ``CompiledPredictor``'s own
+``encode_types``/``transform``; only the booster is replaced.
+
+It trades speed for dependencies: ``check`` measures about 110k rows/s
+against about 330k rows/s for ``pipeline.predict_proba`` on one core,
+roughly 3x slower, because every tree level is a gather over all rows
+where XGBoost walks each row in compiled code. Use it where importing
+XGBoost is the cost that matters (start-up, spawned workers) rather than
+steady-state throughput.
+
+    python numpy_trees.py export --out xgboost_fraud_trees.npz
+    python numpy_trees.py check  --trees xgboost_fraud_trees.npz
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from compiled import CompiledPredictor
+from schema import DATASET_PATH, MODEL_PATH, NUMERIC_COLUMNS
+
+
+TREES_PATH = 'xgboost_fraud_trees.npz'
+EVAL_CHUNK_ROWS = 65_536
+
+
+class NumpyTreeEnsemble(CompiledPredictor):
+    def __init__(self, arrays):
+        offsets = arrays["onehot_offsets"]
+        super().__init__(None, arrays["mean"], arrays["scale"], arrays["categories"].tolist(),
+                         int(np.flatnonzero(offsets < 0)[0]))
+        self.feature = arrays["feature"].astype(np.intp, copy=False)
+        self.threshold = arrays["threshold"]
+        self.default_left = arrays["default_left"]
+        self.leaf_value = arrays["leaf_value"]
+        self.roots = arrays["roots"].astype(np.intp, copy=False)
+        # children[2 * node] is the left child, children[2 * node + 1] the right.
+        if "children" in arrays:
+            self.children = arrays["children"]
+        else:
+            self.children = np.column_stack([arrays["left"], arrays["right"]]).ravel().astype(np.intp)
+        self.max_depth = int(arrays["max_depth"])
+        self.base_margin = float(arrays["base_margin"])
+
+    @classmethod
+    def load(cls, path=TREES_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def arrays(self):
+        """The evaluator's arrays in their final dtypes; ``NumpyTreeEnsemble(arrays)`` uses them without copying."""
+        return {"feature": self.feature, "threshold": self.threshold, "default_left": self.default_left,
+                "leaf_value": self.leaf_value, "roots": self.roots, "children": self.children,
+                "max_depth": np.int64(self.max_depth), "base_margin": np.float64(self.base_margin),
+                "mean": self.mean, "scale": self.scale, "categories": self.categories.astype(str),
+                "onehot_offsets": self.onehot_offsets.astype(np.int64, copy=False)}
+
+    def predict_margin(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        flat = X.ravel()
+        has_missing = bool(np.isnan(X).any())
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), EVAL_CHUNK_ROWS):
+            n = min(EVAL_CHUNK_ROWS, len(X) - start)
+            row_base = (np.arange(start, start + n, dtype=np.intp) * X.shape[1])[:, None]
+            node = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+            # Leaves point at themselves, so every row can take max_depth steps.
+            for _ in range(self.max_depth):
+                x = flat[row_base + self.feature[node]]
+                if has_missing:
+                    go_right = np.where(np.isnan(x), ~self.default_left[node], ~(x < self.threshold[node]))
+                else:
+                    go_right = x >= self.threshold[node]
+                node = self.children[2 * node + go_right]
+            out[start:start + n] = self.leaf_value[node].sum(axis=1, dtype=np.float64)
+        return out + self.base_margin
+
+    def predict_matrix(self, X):
+        return 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+
+    def predict_arrays(self, types, numeric):
+        return self.predict_matrix(self.transform(self.encode_types(types), numeric))
+
+
+def _parse_base_score(value):
+    return float(str(value).strip("[]"))
+
+
+def flatten_booster(booster):
+    """Flatten a binary:logistic gbtree booster into global node arrays."""
+    model = json.loads(booster.save_raw("json"))
+    learner = model["learner"]
+    if learner["objective"]["name"] != "binary:logistic":
+        raise ValueError(f"Unsupported objective {learner['objective']['name']}")
+    trees = learner["gradient_booster"]["model"]["trees"]
+
+    feature, threshold, left, right, default_left, leaf_value, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        if any(tree["split_type"]):
+            raise ValueError("Categorical splits are not supported")
+        lc = np.asarray(tree["left_children"], dtype=np.int64)
+        rc = np.asarray(tree["right_children"], dtype=np.int64)
+        cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+        is_leaf = lc == -1
+        ids = np.arange(len(lc))
+
+        depth = np.zeros(len(lc), dtype=np.int64)
+        for node in ids:
+            if not is_leaf[node]:
+                depth[lc[node]] = depth[rc[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+        feature.append(np.where(is_leaf, 0, tree["split_indices"]))
+        threshold.append(np.where(is_leaf, 0.0, cond).astype(np.float32))
+        left.append(np.where(is_leaf, ids, lc) + offset)
+        right.append(np.where(is_leaf, ids, rc) + offset)
+        default_left.append(np.asarray(tree["default_left"], dtype=bool))
+        leaf_value.append(np.where(is_leaf, cond, 0.0).astype(np.float32))
+        roots.append(offset)
+        offset += len(lc)
+
+    base_score = _parse_base_score(learner["learner_model_param"]["base_score"])
+    return {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "default_left": np.concatenate(default_left),
+        "leaf_value": np.concatenate(leaf_value),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "max_depth": np.int64(max_depth),
+        "base_margin": np.float64(np.log(base_score / (1.0 - base_score))),
+    }
+
+
+def export_model(pipeline, path=TREES_PATH):
+    """Write the flattened booster and preprocessing layout of ``pipeline`` to ``path`` (``None`` skips it)."""
+    compiled = CompiledPredictor.from_pipeline(pipeline)
+    arrays = flatten_booster(compiled.booster)
+    arrays.update(
+        mean=compiled.mean,
+        scale=compiled.scale,
+        categories=compiled.categories.astype(str),
+        onehot_offsets=compiled.onehot_offsets.astype(np.int64),
+    )
+    if path is not None:
+        np.savez(path, **arrays)
+    return NumpyTreeEnsemble(arrays)
+
+
+def _check(args):
+    import pandas as pd
+
+    import scoring
+
+    pipeline = scoring.load_model(args.model)
+    ensemble = NumpyTreeEnsemble.load(args.trees)
+    df = pd.read_csv(args.data)
+    features = df[scoring.FEATURE_COLUMNS]
+
+    expected = pipeline.predict_proba(features)[:, 1]
+    actual = ensemble.predict_proba(features)[:, 1]
+    max_diff = float(np.max(np.abs(expected - actual)))
+    status = "OK" if max_diff <= args.tolerance else "FAIL"
+    print(f"parity: {status} on {len(df):,} rows (max abs diff {max_diff:.3g}, tolerance {args.tolerance:g})")
+
+    types = features["type"].to_numpy()
+    numeric = features[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+    for label, fn in [("pipeline.predict_proba", lambda: pipeline.predict_proba(features)),
+                      ("numpy_trees", lambda: ensemble.predict_arrays(types, numeric))]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(f"{label:<24} {elapsed * 1e3:8.2f} ms per {len(df):,} rows ({len(df) / elapsed:,.0f} rows/s)")
+    return status == "OK"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and check the pure-NumPy tree evaluator")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Flatten the pickled pipeline's booster to an .npz file")
+    export.add_argument("--model", default=MODEL_PATH)
+    export.add_argument("--out", default=TREES_PATH)
+    check = sub.add_parser("check", help="Check parity with and benchmark against the pipeline")
+    check.add_argument("--model", default=MODEL_PATH)
+    check.add_argument("--trees", default=TREES_PATH)
+    check.add_argument("--data", default=DATASET_PATH)
+    check.add_argument("--tolerance", type=float, default=1e-6)
+    check.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        import scoring
+
+        ensemble = export_model(scoring.load_model(args.model), args.out)
+        print(f"Wrote {len(ensemble.roots)} trees, {len(ensemble.feature):,} nodes "
+              f"(max depth {ensemble.max_depth}) to {args.out}")
+    elif not _check(args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Bounded LRU/TTL cache of scoring results keyed on canonical transaction features.
+
+Analysts re-score the same transactions over and over (the app's example
+rows, repeated clicks that rerun the whole script, re-runs of the same
+batch). ``PredictionCache`` owns the loaded model and remembers the scored
+result of each canonical feature tuple -- type plus the five money fields
+rounded to cents -- for the current model version.
+
+The model version is the model file's size and modification time. It is
+re-checked at most every ``check_interval`` seconds; when the file changes
+the model is reloaded once, by whichever request noticed, and every cached
+entry is dropped, so stale scores are never served. Entries are also keyed
+on the versions of ``rules.json`` and ``calibration.json``, so an edited
+rule set or a refitted calibration is picked up the same way.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import scoring
+from calibration import load_calibration
+from rules import load_rules
+from schema import FEATURE_COLUMNS, MODEL_PATH, NUMERIC_COLUMNS
+from validation import parse_records
+
+
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+def canonical_keys(records):
+    """Hashable, normalized form of each transaction's model features.
+
+    Money fields may be numbers or strings with thousands separators or a
+    currency prefix (see ``validation.py``); they are rounded to cents so
+    ``"1,250.00"`` and ``1250`` share an entry. Raises ``ValueError`` naming
+    the first invalid record.
+    """
+    parsed = parse_records(records).check()
+    money = np.round(np.column_stack([parsed.money[col] for col in NUMERIC_COLUMNS]), 2) + 0.0
+    return list(zip(parsed.types, *money.T.tolist()))
+
+
+def frame_keys(frame):
+    """``canonical_keys`` of an already parsed feature frame, such as ``validation.ParsedBatch.frame``."""
+    money = np.round(frame[NUMERIC_COLUMNS].to_numpy(dtype=np.float64), 2) + 0.0
+    return list(zip(frame["type"].tolist(), *money.T.tolist()))
+
+
+def canonical_key(record):
+    return canonical_keys([record])[0]
+
+
+def model_version(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class PredictionCache:
+    def __init__(self, model_path=MODEL_PATH, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=None,
+                 check_interval=1.0, loader=scoring.load_model, clock=time.monotonic):
+        self.model_path = model_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.check_interval = check_interval
+        self._loader = loader
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+        self._version = model_version(model_path)
+        self._model = loader(model_path)
+        scoring.warm_up(self._model)
+        self._checked_at = clock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def model(self):
+        self._check_model()
+        return self._model
+
+    @property
+    def version(self):
+        return self._version
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "expirations": self.expirations,
+                    "invalidations": self.invalidations}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _check_model(self):
+        if self._clock() - self._checked_at < self.check_interval:
+            return
+        # One thread checks and reloads; the others wait here and then score against the new model.
+        with self._reload_lock:
+            now = self._clock()
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            version = model_version(self.model_path)
+            if version == self._version:
+                return
+            model = self._loader(self.model_path)
+            scoring.warm_up(model)
+            with self._lock:
+                self._model = model
+                self._version = version
+                self._entries.clear()
+                self.invalidations += 1
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at is not None and now >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _put(self, key, value, now):
+        expires_at = None if self.ttl_seconds is None else now + self.ttl_seconds
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def score_records(self, records):
+        """Score transaction dicts, hitting the model only for uncached ones.
+
+        Returns result dicts in the same shape as ``scoring.results_to_records``.
+        """
+        return self._score_keys(canonical_keys(records))
+
+    def score_features(self, frame):
+        """``score_records`` for an already parsed feature frame, such as ``validation.ParsedBatch.frame``."""
+        return self._score_keys(frame_keys(frame), frame)
+
+    def _score_keys(self, keys, frame=None):
+        self._check_model()
+        results = [None] * len(keys)
+        ruleset = load_rules()
+        calibration = load_calibration() or False
+        now = self._clock()
+        with self._lock:
+            model, version = self._model, (self._version, ruleset.version, calibration and calibration.version)
+            missing = {}
+            for i, key in enumerate(keys):
+                value = self._get((version, key), now)
+                if value is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    results[i] = value
+        if missing:
+            if frame is None:
+                frame = scoring.records_to_frame([dict(zip(FEATURE_COLUMNS, key)) for key in missing])
+            else:
+                frame = frame.iloc[[indices[0] for indices in missing.values()]]
+            scored = scoring.results_to_records(
+                scoring.score_batch(model, frame, ruleset=ruleset, calibration=calibration), ruleset)
+            with self._lock:
+                for (key, indices), value in zip(missing.items(), scored):
+                    if version[0] == self._version:
+                        self._put((version, key), value, now)
+                    for i in indices:
+                        results[i] = value
+        return results
+
+    def score_frame(self, frame):
+        """Score a feature frame through the cache; returns ``fraud_prob`` per row."""
+        records = frame[FEATURE_COLUMNS].to_dict(orient="records")
+        return [result["fraud_prob"] for result in self.score_records(records)]
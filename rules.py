@@ -0,0 +1,317 @@
+"""Declarative fraud rules compiled to vectorized NumPy expressions.
+
+``rules.json`` holds every hand-written rule of the app:
+
+    derived      named intermediate values, e.g. ``balance_diff_org``
+    indicators   named boolean flags reported next to each score
+    overrides    probability floors applied after the model, highest wins
+    fallback     first-match probabilities used when no model is loaded
+    error_fallback  the same, used when the loaded model fails on a transaction
+                 (defaults to ``fallback``)
+
+Expressions are a small Python subset -- column and rule names, numbers,
+strings, comparisons, ``and``/``or``/``not``, ``+ - * /`` and ``abs()`` --
+parsed with ``ast`` and compiled into closures that evaluate a whole batch
+as NumPy arrays. Nothing is passed to ``eval``.
+
+Every indicator, override and fallback rule counts how many rows it saw and
+matched, and how long it took. ``load_rules`` caches the rule set per file
+and reloads it when the file changes, so rules can be edited on a running
+service without redeploying.
+"""
+import ast
+import json
+import operator
+import os
+import threading
+import time
+import warnings
+from functools import reduce
+
+import numpy as np
+
+from schema import RULES_PATH
+
+
+_BINARY_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+_COMPARE_OPS = {ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+                ast.Gt: operator.gt, ast.GtE: operator.ge}
+
+
+def compile_expression(source):
+    """Compile a rule expression into ``fn(namespace) -> array``.
+
+    Returns ``(fn, names)``, where ``names`` lists the variables the
+    expression reads. Raises ``ValueError`` on unsupported syntax.
+    """
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid rule expression {source!r}: {e.msg}") from None
+    names = []
+    return _compile(tree.body, source, names), names
+
+
+def _compile(node, source, names):
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(value, source, names) for value in node.values]
+        op = operator.and_ if isinstance(node.op, ast.And) else operator.or_
+        return lambda ns: reduce(op, (part(ns) for part in parts))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+        operand = _compile(node.operand, source, names)
+        if isinstance(node.op, ast.Not):
+            return lambda ns: ~np.asarray(operand(ns), dtype=bool)
+        return lambda ns: -operand(ns)
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPS for op in node.ops):
+        operands = [_compile(value, source, names) for value in [node.left] + node.comparators]
+        ops = [_COMPARE_OPS[type(op)] for op in node.ops]
+
+        def compare(ns):
+            left = operands[0](ns)
+            result = None
+            for op, right_fn in zip(ops, operands[1:]):
+                right = right_fn(ns)
+                part = op(left, right)
+                result = part if result is None else result & part
+                left = right
+            return result
+        return compare
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        left, right = _compile(node.left, source, names), _compile(node.right, source, names)
+        op = _BINARY_OPS[type(node.op)]
+        return lambda ns: op(left(ns), right(ns))
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "abs"
+            and len(node.args) == 1 and not node.keywords):
+        arg = _compile(node.args[0], source, names)
+        return lambda ns: np.abs(arg(ns))
+    if isinstance(node, ast.Name):
+        names.append(node.id)
+        return lambda ns: ns[node.id]
+    if isinstance(node, ast.Constant) and isinstance(node.value, (bool, int, float, str)):
+        return lambda ns: node.value
+    raise ValueError(f"Unsupported syntax in rule {source!r}: {ast.unparse(node)}")
+
+
+class Namespace(dict):
+    """Rule values for one batch; frame columns are converted on first use."""
+
+    def __init__(self, frame, n_rows):
+        super().__init__()
+        self.frame = frame
+        self.n_rows = n_rows
+
+    def __missing__(self, name):
+        try:
+            column = self.frame[name]
+        except KeyError:
+            raise ValueError(f"Rules reference unknown column {name!r}") from None
+        values = np.asarray(column)
+        if values.dtype.kind in "iuf":
+            values = values.astype(np.float64, copy=False)
+        self[name] = values
+        return values
+
+
+class Rule:
+    def __init__(self, name, kind, when, probability=None):
+        self.name = name
+        self.kind = kind
+        self.when = when
+        self.probability = None if probability is None else float(probability)
+        self._fn, self.names = compile_expression(when)
+        self.calls = self.rows = self.hits = 0
+        self.seconds = 0.0
+
+    def evaluate(self, ns):
+        """Boolean mask over the batch in ``ns``."""
+        return np.broadcast_to(np.asarray(self._fn(ns), dtype=bool), (ns.n_rows,))
+
+    def stats(self):
+        return {"name": self.name, "kind": self.kind, "when": self.when, "probability": self.probability,
+                "calls": self.calls, "rows": self.rows, "hits": self.hits,
+                "hit_rate": self.hits / self.rows if self.rows else 0.0, "seconds": self.seconds}
+
+
+class RuleSet:
+    def __init__(self, config, version=None):
+        self.version = version
+        self._lock = threading.Lock()
+        self.derived = [(name, compile_expression(source)) for name, source in config.get("derived", {}).items()]
+        self.indicators = [Rule(name, "indicator", when) for name, when in config.get("indicators", {}).items()]
+        self.overrides = [Rule(r["name"], "override", r["when"], r["probability"])
+                          for r in config.get("overrides", [])]
+        self.fallback_rules, self.fallback_default = _fallback_rules(config.get("fallback", {}), "fallback")
+        if "error_fallback" in config:
+            self.error_fallback_rules, self.error_fallback_default = _fallback_rules(config["error_fallback"],
+                                                                                    "error_fallback")
+        else:
+            self.error_fallback_rules, self.error_fallback_default = self.fallback_rules, self.fallback_default
+        self.rules = self.indicators + self.overrides + self.fallback_rules
+        if self.error_fallback_rules is not self.fallback_rules:
+            self.rules += self.error_fallback_rules
+        self.indicator_names = [rule.name for rule in self.indicators]
+        self.derived_names = [name for name, _ in self.derived]
+        # Assigned from lowest to highest floor, so the highest matching floor wins.
+        self._overrides_by_floor = sorted(self.overrides, key=lambda rule: rule.probability)
+        self._check_references()
+
+    @classmethod
+    def from_file(cls, path=RULES_PATH):
+        with open(path) as f:
+            config = json.load(f)
+        stat = os.stat(path)
+        return cls(config, version=(stat.st_size, stat.st_mtime_ns))
+
+    def _check_references(self):
+        """Derived values and indicators may only use names defined above them."""
+        defined = set()
+        later = set(self.derived_names) | set(self.indicator_names)
+        steps = [(name, names) for name, (_, names) in self.derived]
+        steps += [(rule.name, rule.names) for rule in self.indicators]
+        for name, names in steps:
+            early = [n for n in names if n in later and n not in defined]
+            if early:
+                raise ValueError(f"Rule {name!r} uses {', '.join(early)} before it is defined")
+            defined.add(name)
+
+    def _record(self, rule, mask, seconds):
+        hits = int(np.count_nonzero(mask))
+        with self._lock:
+            rule.calls += 1
+            rule.rows += len(mask)
+            rule.hits += hits
+            rule.seconds += seconds
+
+    def evaluate(self, frame):
+        """Compute derived values and indicators for ``frame``; returns the ``Namespace``.
+
+        ``frame`` is a DataFrame or a dict of equal-length columns.
+        """
+        n_rows = len(next(iter(frame.values()), ())) if isinstance(frame, dict) else len(frame)
+        ns = Namespace(frame, n_rows)
+        for name, (fn, _) in self.derived:
+            ns[name] = fn(ns)
+        for rule in self.indicators:
+            start = time.perf_counter()
+            mask = rule.evaluate(ns)
+            self._record(rule, mask, time.perf_counter() - start)
+            ns[rule.name] = mask
+        return ns
+
+    def outputs(self, ns):
+        """Indicators followed by derived values, as reported next to each score."""
+        return {name: ns[name] for name in self.indicator_names + self.derived_names}
+
+    def apply_overrides(self, fraud_prob, ns):
+        """Raise probabilities to the highest floor of any matching override, in one pass.
+
+        ``ns`` is the ``Namespace`` from ``evaluate`` or a dict of indicator arrays.
+        """
+        fraud_prob = np.asarray(fraud_prob, dtype=np.float64)
+        if not isinstance(ns, Namespace):
+            ns = self._wrap(ns, len(fraud_prob))
+        floor = np.zeros(len(fraud_prob))
+        for rule in self._overrides_by_floor:
+            start = time.perf_counter()
+            mask = rule.evaluate(ns)
+            np.putmask(floor, mask, rule.probability)
+            self._record(rule, mask, time.perf_counter() - start)
+        return np.maximum(fraud_prob, floor)
+
+    def fallback(self, ns, error=False):
+        """Model-less probabilities: the first matching fallback rule, else the default.
+
+        With ``error`` the ``error_fallback`` rules are used, for a model that failed rather than one
+        that is not loaded.
+        """
+        rules, default = ((self.error_fallback_rules, self.error_fallback_default) if error
+                          else (self.fallback_rules, self.fallback_default))
+        fraud_prob = np.full(ns.n_rows, default)
+        taken = np.zeros(ns.n_rows, dtype=bool)
+        for rule in rules:
+            start = time.perf_counter()
+            mask = rule.evaluate(ns) & ~taken
+            fraud_prob[mask] = rule.probability
+            taken |= mask
+            self._record(rule, mask, time.perf_counter() - start)
+        return fraud_prob
+
+    @staticmethod
+    def _wrap(values, n_rows):
+        ns = Namespace({}, n_rows)
+        ns.update(values)
+        return ns
+
+    def stats(self):
+        with self._lock:
+            return {"version": list(self.version) if self.version else None,
+                    "rules": [rule.stats() for rule in self.rules]}
+
+    def reset_stats(self):
+        with self._lock:
+            for rule in self.rules:
+                rule.calls = rule.rows = rule.hits = 0
+                rule.seconds = 0.0
+
+
+def _fallback_rules(config, kind):
+    rules = [Rule(r["name"], kind, r["when"], r["probability"]) for r in config.get("rules", [])]
+    return rules, float(config.get("default", 0.0))
+
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def load_rules(path=RULES_PATH, check_interval=1.0):
+    """Shared ``RuleSet`` for ``path``, reloaded when the file changes.
+
+    The file is re-checked at most every ``check_interval`` seconds. If an
+    edited file fails to load, the previous rules stay active and a warning
+    is issued; the very first load raises instead.
+    """
+    now = time.monotonic()
+    with _load_lock:
+        entry = _loaded.get(path)
+        if entry is not None and now - entry[1] < check_interval:
+            return entry[0]
+        ruleset = entry[0] if entry is not None else None
+        try:
+            stat = os.stat(path)
+            if ruleset is None or ruleset.version != (stat.st_size, stat.st_mtime_ns):
+                ruleset = RuleSet.from_file(path)
+        except (OSError, ValueError, KeyError) as e:
+            if ruleset is None:
+                raise
+            warnings.warn(f"Keeping previous rules; could not reload {path}: {e}")
+        _loaded[path] = (ruleset, now)
+        return ruleset
+
+
+def main():
+    import argparse
+
+    import pandas as pd
+
+    from schema import DATASET_PATH
+
+    parser = argparse.ArgumentParser(description="Evaluate the rules over a dataset and print per-rule statistics")
+    parser.add_argument("--rules", default=RULES_PATH)
+    parser.add_argument("--data", default=DATASET_PATH)
+    args = parser.parse_args()
+
+    ruleset = RuleSet.from_file(args.rules)
+    frame = pd.read_csv(args.data)
+    ns = ruleset.evaluate(frame)
+    ruleset.apply_overrides(np.zeros(len(frame)), ns)
+    ruleset.fallback(ns)
+    ruleset.fallback(ns, error=True)
+    print(f"{len(frame):,} rows")
+    print(f"{'rule':<28} {'kind':<14} {'hits':>8} {'hit rate':>9} {'us':>9}")
+    for rule in ruleset.stats()["rules"]:
+        print(f"{rule['name']:<28} {rule['kind']:<14} {rule['hits']:>8,} {rule['hit_rate']:>9.2%} "
+              f"{rule['seconds'] * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
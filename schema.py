@@ -0,0 +1,25 @@
+"""Dataset schema and artifact paths shared by every scoring path.
+
+Kept free of third-party imports so NumPy-only workers can use it.
+"""
+
+MODEL_PATH = 'xgboost_fraud_model.pkl'
+NATIVE_MODEL_PATH = 'xgboost_fraud_model.native.npz'
+DATASET_PATH = 'Fraud_Analysis_Dataset(in).csv'
+RULES_PATH = 'rules.json'
+CALIBRATION_PATH = 'calibration.json'
+
+TRANSACTION_TYPES = ["PAYMENT", "TRANSFER", "CASH_OUT", "CASH_IN", "DEBIT"]
+NUMERIC_COLUMNS = ["amount", "oldbalanceOrg", "newbalanceOrig", "oldbalanceDest", "newbalanceDest"]
+FEATURE_COLUMNS = ["type"] + NUMERIC_COLUMNS
+
+# A representative transaction (the app's "Suspicious Transfer" example),
+# used to warm up a freshly loaded model.
+WARMUP_RECORD = {
+    "type": "TRANSFER",
+    "amount": 7850.0,
+    "oldbalanceOrg": 8000.0,
+    "newbalanceOrig": 150.0,
+    "oldbalanceDest": 0.0,
+    "newbalanceDest": 7850.0,
+}
@@ -0,0 +1,222 @@
+"""Importable scoring helpers shared by the Streamlit app and batch tools.
+
+Indicators, rule overrides and the model-less fallback come from the
+declarative rules in ``rules.json`` (see ``rules.py``) and work on whole
+columns at once, so a file of transactions is scored with one
+``predict_proba`` call per chunk instead of one per row.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from calibration import load_calibration
+from instrumentation import stage
+from rules import load_rules
+from schema import FEATURE_COLUMNS, MODEL_PATH, WARMUP_RECORD
+from validation import ParsedBatch, parse_records
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def load_model(path=MODEL_PATH):
+    """Load a scoring model from ``path``.
+
+    ``.pkl`` files are the pickled sklearn pipeline. ``.npz`` files are
+    either a native booster bundle written by ``compiled.py`` or flattened
+    trees from ``numpy_trees.py``; both skip unpickling the pipeline.
+    Heavy libraries are only imported for the format being loaded.
+    """
+    path = str(path)
+    if not path.endswith('.npz'):
+        import joblib
+        return joblib.load(path)
+    with np.load(path, allow_pickle=False) as data:
+        is_native = 'booster' in data.files
+    if is_native:
+        from compiled import CompiledPredictor
+        return CompiledPredictor.load_native(path)
+    from numpy_trees import NumpyTreeEnsemble
+    return NumpyTreeEnsemble.load(path)
+
+
+def warm_up(model):
+    """Score one representative row so the first real request is not cold.
+
+    Returns the warm-up latency in seconds.
+    """
+    start = time.perf_counter()
+    score_batch(model, records_to_frame([WARMUP_RECORD]))
+    return time.perf_counter() - start
+
+
+def compute_indicators(frame, ruleset=None):
+    """Return the fraud indicators for every row as boolean NumPy arrays.
+
+    Derived values such as ``balance_diff_org`` are included after the
+    indicators. ``ruleset`` defaults to the rules in ``rules.json``.
+    """
+    ruleset = ruleset or load_rules()
+    return ruleset.outputs(ruleset.evaluate(frame))
+
+
+def apply_rule_overrides(fraud_prob, indicators, ruleset=None):
+    """Raise model probabilities to the rule floors where a rule fires."""
+    return (ruleset or load_rules()).apply_overrides(fraud_prob, indicators)
+
+
+def fallback_probability(frame, ruleset=None, error=False):
+    """Heuristic probabilities used by the app when no model is loaded, or with ``error`` when the model failed."""
+    ruleset = ruleset or load_rules()
+    return ruleset.fallback(ruleset.evaluate(frame), error=error)
+
+
+def predict_fraud_proba(model, features):
+    """``model.predict_proba(features)[:, 1]``.
+
+    For an sklearn ``Pipeline`` the steps are run one by one so that the
+    preprocessor and the booster are timed as separate stages. Models that
+    implement ``predict_fraud_proba`` themselves (``ModelRegistry``) are
+    called through it.
+    """
+    delegate = getattr(model, "predict_fraud_proba", None)
+    if delegate is not None:
+        return delegate(features)
+    steps = getattr(model, "steps", None)
+    if steps is None:
+        with stage("model", len(features)):
+            return model.predict_proba(features)[:, 1]
+    X = features
+    with stage("preprocess", len(features)):
+        for _, step in steps[:-1]:
+            X = step.transform(X)
+    with stage("booster", len(features)):
+        return steps[-1][1].predict_proba(X)[:, 1]
+
+
+def _score_chunk(model, chunk, feature_store=None, ruleset=None, calibration=None):
+    rows = len(chunk)
+    features = chunk[FEATURE_COLUMNS]
+    with stage("indicators", rows):
+        ns = ruleset.evaluate(features)
+    if rows == 0:
+        # Every row failed validation; the pipeline rejects 0 samples, so only the output columns are built.
+        fraud_prob = np.zeros(0)
+    elif model is None:
+        with stage("fallback", rows):
+            fraud_prob = ruleset.fallback(ns)
+    else:
+        fraud_prob = predict_fraud_proba(model, features)
+        with stage("overrides", rows):
+            fraud_prob = ruleset.apply_overrides(fraud_prob, ns)
+    # Calibration is fitted on model scores, so the model-less fallback keeps the 0.5 cut.
+    calibrated = None
+    if calibration and model is not None and rows == 0:
+        calibrated, flagged = np.zeros(0), np.zeros(0, dtype=bool)
+    elif calibration and model is not None:
+        with stage("calibration", rows):
+            calibrated, flagged = calibration.score(features["type"].to_numpy(), fraud_prob)
+
+    behavior = None
+    if feature_store is not None:
+        with stage("account_features", rows):
+            behavior = feature_store.lookup_and_update(chunk)
+    with stage("assemble", rows):
+        scored = chunk.copy()
+        for name, values in ruleset.outputs(ns).items():
+            scored[name] = values
+        if behavior is not None:
+            for name in behavior.columns:
+                scored[name] = behavior[name].to_numpy()
+        scored["fraud_prob"] = fraud_prob
+        if calibrated is None:
+            scored["is_flagged"] = fraud_prob > 0.5
+        else:
+            scored["calibrated_prob"] = calibrated
+            scored["is_flagged"] = flagged
+    return scored
+
+
+def score_batch(model, frame, chunk_size=DEFAULT_CHUNK_SIZE, feature_store=None, ruleset=None, calibration=None):
+    """Score a DataFrame shaped like the dataset CSV.
+
+    ``predict_proba`` is called once per ``chunk_size`` rows. The returned
+    frame keeps the input columns and adds every indicator, ``fraud_prob``
+    and ``is_flagged``. With a ``feature_store.TransactionFeatureStore`` the
+    per-account window features (as of just before each row) are added too
+    and the rows are folded into the store; the frame then also needs
+    ``step``, ``nameOrig`` and ``nameDest``. ``ruleset`` defaults to the
+    rules in ``rules.json``. ``calibration`` defaults to ``calibration.json``
+    when that file exists (``False`` turns it off); with one, the frame
+    also gets ``calibrated_prob`` and ``is_flagged`` uses its per-type
+    thresholds instead of ``fraud_prob > 0.5``.
+    """
+    required = FEATURE_COLUMNS if feature_store is None else FEATURE_COLUMNS + ["step", "nameOrig", "nameDest"]
+    missing = [c for c in required if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    ruleset = ruleset or load_rules()
+    calibration = load_calibration() if calibration is None else calibration
+    with stage("score_batch", len(frame)):
+        if len(frame) <= chunk_size:
+            return _score_chunk(model, frame, feature_store, ruleset, calibration)
+        parts = [_score_chunk(model, frame.iloc[start:start + chunk_size], feature_store, ruleset, calibration)
+                 for start in range(0, len(frame), chunk_size)]
+        return pd.concat(parts)
+
+
+def score_csv(model, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    return score_batch(model, pd.read_csv(path), chunk_size=chunk_size)
+
+
+def records_to_frame(records):
+    """Build a feature frame from a list of transaction dicts.
+
+    Numeric fields may be numbers or strings with thousands separators or a
+    currency prefix, as typed into the app (see ``validation.py``). Raises
+    ``ValueError`` naming the first bad record; use
+    ``validation.parse_records`` to get every row's error instead.
+    """
+    return parse_records(records).check().frame
+
+
+def analyze_record(record, model=None, cache=None, ruleset=None):
+    """Score one transaction dict the way the app shows it.
+
+    ``record`` may also be a one-row ``validation.ParsedBatch``, so a caller
+    that has already validated it does not parse it again.
+
+    Returns ``(features, result, indicators)``: the one-row feature frame,
+    the result dict of ``results_to_records`` (through ``cache`` when given,
+    else ``model``, else the rule fallback) and the indicators and derived
+    values of the row as scalars. Raises ``ValueError`` for unparseable input.
+    """
+    ruleset = ruleset or load_rules()
+    features = record.check().frame if isinstance(record, ParsedBatch) else records_to_frame([record])
+    indicators = {name: values[0] for name, values in compute_indicators(features, ruleset).items()}
+    if cache is not None:
+        result = cache.score_features(features)[0]
+    else:
+        result = results_to_records(score_batch(model, features, ruleset=ruleset), ruleset)[0]
+    return features, result, indicators
+
+
+def results_to_records(scored, ruleset=None):
+    """Convert a scored frame into JSON-friendly result dicts."""
+    probs = scored["fraud_prob"].to_numpy()
+    flags = scored["is_flagged"].to_numpy()
+    names = (ruleset or load_rules()).indicator_names
+    indicators = {name: scored[name].to_numpy() for name in names if name in scored}
+    results = [
+        {
+            "fraud_prob": float(probs[i]),
+            "is_flagged": bool(flags[i]),
+            "indicators": {name: bool(values[i]) for name, values in indicators.items()},
+        }
+        for i in range(len(scored))
+    ]
+    if "calibrated_prob" in scored:
+        for result, value in zip(results, scored["calibrated_prob"].to_numpy().tolist()):
+            result["calibrated_prob"] = value
+    return results
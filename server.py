@@ -0,0 +1,309 @@
+"""Headless HTTP scoring service.
+
+Loads ``xgboost_fraud_model.pkl`` once and serves JSON scoring requests
+with the same rule overrides as the Streamlit app, without rerunning any UI
+code per request. Uses only the standard library HTTP server.
+
+    python server.py --port 8000
+
+Endpoints:
+    GET  /health         -> {"status": "ok", "model_loaded": true}
+    GET  /stats          -> prediction cache counters (with --cache-size)
+    GET  /rules          -> per-rule hit counts and evaluation time
+    GET  /metrics        -> per-stage timings in Prometheus text format
+    GET  /debug/profile?seconds=N -> folded stacks from the sampling profiler
+    GET  /models         -> registered model versions, active/shadow and shadow comparisons
+    GET  /explain        -> explanation queue and cache counters (with --explain)
+    GET  /drift          -> input and score drift against a reference profile (with --drift-profile)
+    POST /score          -> one transaction object in, one result out
+    POST /score/batch    -> {"transactions": [...]} in, {"results": [...]} out
+    POST /explain        -> {"transactions": [...], "wait_ms": 0} in, per-feature contributions
+                            (or {"status": "pending"}) out (with --explain)
+
+Transactions are validated by ``validation.py`` before scoring. An invalid
+one gets {"error": message, "code": ..., "field": ...} instead of a result:
+as a 400 response from /score, and in its own slot of /score/batch and
+/explain, where the valid transactions around it are still handled.
+
+With --explain, flagged transactions are queued for explanation as they are
+scored, so a later POST /explain usually finds them ready; scoring itself
+never waits for an explanation.
+
+With --admin, models can be managed without a restart:
+    POST /models           {"version": "v2", "path": "...", "activate": false}
+    POST /models/activate  {"version": "v2"}       atomic hot swap
+    POST /models/shadow    {"version": "v2"}       mirror traffic; null stops it
+"""
+import argparse
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import instrumentation
+import scoring
+from prediction_cache import frame_keys
+from rules import load_rules
+from validation import parse_records
+
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACKs add ~40 ms to every keep-alive response.
+    disable_nagle_algorithm = True
+    model = None
+    batcher = None
+    cache = None
+    registry = None
+    explainer = None
+    monitor = None
+    admin = False
+    verbose = False
+
+    def do_GET(self):
+        response = instrumentation.handle_request(self.path)
+        if response is not None:
+            self._send(*response)
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok", "model_loaded": self.model is not None})
+        elif self.path == "/stats" and self.cache is not None:
+            self._send_json(200, self.cache.stats())
+        elif self.path == "/rules":
+            self._send_json(200, load_rules().stats())
+        elif self.path == "/models" and self.registry is not None:
+            self._send_json(200, self.registry.stats())
+        elif self.path == "/drift" and self.monitor is not None:
+            self._send_json(200, self.monitor.report())
+        elif self.path == "/explain" and self.explainer is not None:
+            self._send_json(200, self.explainer.stats())
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        admin_paths = ("/models", "/models/activate", "/models/shadow")
+        if self.path in admin_paths and self.admin and self.registry is not None:
+            self._manage_models()
+            return
+        if self.path not in ("/score", "/score/batch") and not (self.path == "/explain" and self.explainer):
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            payload = self._read_json()
+            if self.path == "/score":
+                if not isinstance(payload, dict):
+                    raise ValueError("Expected a JSON object")
+                result = self._score([payload])[0]
+                self._send_json(400 if "error" in result else 200, result)
+            else:
+                records = payload.get("transactions") if isinstance(payload, dict) else payload
+                if not isinstance(records, list):
+                    raise ValueError("Expected a JSON list or {\"transactions\": [...]}")
+                if self.path == "/explain":
+                    wait_ms = float(payload.get("wait_ms", 0)) if isinstance(payload, dict) else 0.0
+                    self._send_json(200, {"results": self._explain(records, wait_ms)})
+                else:
+                    self._send_json(200, {"results": self._score(records)})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"Error during prediction: {e}"})
+
+    def _manage_models(self):
+        try:
+            payload = self._read_json()
+            if not isinstance(payload, dict) or "version" not in payload:
+                raise ValueError("Expected a JSON object with a \"version\"")
+            version = payload["version"]
+            if self.path == "/models":
+                if not payload.get("path"):
+                    raise ValueError("Expected a \"path\" to load the model from")
+                self.registry.register(version, path=payload["path"], activate=bool(payload.get("activate")))
+            elif self.path == "/models/activate":
+                self.registry.activate(version)
+            else:
+                self.registry.set_shadow(version)
+        except (ValueError, OSError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(200, self.registry.stats())
+
+    def _score(self, records):
+        parsed = parse_records(records)
+        valid = parsed.valid
+        if valid.all():
+            return self._score_valid(records, parsed.frame)
+        scored = iter(self._score_valid([record for record, ok in zip(records, valid) if ok], parsed.frame[valid]))
+        return [next(scored) if ok else _error_result(parsed, i) for i, ok in enumerate(valid)]
+
+    def _score_valid(self, records, frame):
+        # ``frame`` holds the already parsed ``records``; nothing below parses them again.
+        if not records:
+            return []
+        if self.cache is not None:
+            results = self.cache.score_features(frame)
+        elif self.batcher is not None and len(records) == 1:
+            results = [self.batcher.score(frame)]
+        else:
+            results = scoring.results_to_records(scoring.score_batch(self.model, frame))
+        if self.monitor is not None:
+            self.monitor.observe_results(frame, results)
+        if self.explainer is not None:
+            self.explainer.request_keys(frame_keys(frame[[result["is_flagged"] for result in results]]))
+        return results
+
+    def _explain(self, records, wait_ms):
+        parsed = parse_records(records)
+        valid = parsed.valid
+        keys = self.explainer.request_keys(frame_keys(parsed.frame[valid]))
+        explanations = iter(self.explainer.wait(keys, timeout=max(wait_ms, 0.0) / 1000.0))
+        results = []
+        for i, ok in enumerate(valid):
+            if not ok:
+                results.append(_error_result(parsed, i))
+                continue
+            explanation = next(explanations)
+            results.append({"status": "pending"} if explanation is None else explanation)
+        return results
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        try:
+            return json.loads(self.rfile.read(length))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+
+    def _send_json(self, status, body):
+        self._send(status, "application/json", json.dumps(body))
+
+    def _send(self, status, content_type, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def _error_result(parsed, row):
+    error = parsed.error(row)
+    return {"error": error["message"], "code": error["code"], "field": error["field"]}
+
+
+def make_server(host="127.0.0.1", port=8000, model=None, verbose=False, batcher=None, cache=None, admin=False,
+                explainer=None, monitor=None):
+    """Create a threaded server bound to ``model``; call ``serve_forever()`` on it.
+
+    When ``batcher`` is a ``microbatch.MicroBatcher``, single-transaction
+    requests are coalesced through it. When ``cache`` is a
+    ``prediction_cache.PredictionCache``, every request is answered through
+    it and its own (auto-reloading) model is used instead. When ``model`` is
+    a ``model_registry.ModelRegistry``, ``/models`` reports on it and, with
+    ``admin``, manages it. ``explainer`` is an
+    ``explanations.ExplanationService`` behind ``/explain`` and ``monitor``
+    a ``drift_monitor.DriftMonitor`` fed every scored request, behind ``/drift``.
+    """
+    from model_registry import ModelRegistry
+
+    registry = model if isinstance(model, ModelRegistry) else None
+    handler = type("BoundScoringHandler", (ScoringHandler,),
+                   {"model": model, "batcher": batcher, "cache": cache, "registry": registry, "admin": admin,
+                    "explainer": explainer, "monitor": monitor, "verbose": verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SecureScan headless scoring service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default=scoring.MODEL_PATH,
+                        help="Pickled pipeline, native bundle or flattened trees (.npz)")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    parser.add_argument("--micro-batch-size", type=int, default=0,
+                        help="Coalesce concurrent /score requests into batches of up to N rows (0 disables)")
+    parser.add_argument("--micro-batch-wait-ms", type=float, default=2.0,
+                        help="Longest a request waits for a micro-batch to fill")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Cache up to N scored feature tuples, reloading the model when its file changes")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="Cache entry lifetime in seconds")
+    parser.add_argument("--model-version", default=None, help="Version name of --model (default: file name@mtime)")
+    parser.add_argument("--shadow", default=None, help="Also score every batch with this model in the background")
+    parser.add_argument("--shadow-version", default=None, help="Version name of --shadow")
+    parser.add_argument("--shadow-sample-rate", type=float, default=1.0,
+                        help="Fraction of batches mirrored to the shadow model")
+    parser.add_argument("--admin", action="store_true",
+                        help="Enable POST /models, /models/activate and /models/shadow")
+    parser.add_argument("--explain", action="store_true",
+                        help="Serve /explain and queue explanations of flagged transactions in the background")
+    parser.add_argument("--explain-workers", type=int, default=1, help="Explanation worker threads")
+    parser.add_argument("--drift-profile", default=None,
+                        help="Serve /drift, comparing scored traffic with this drift_monitor.py profile")
+    parser.add_argument("--drift-window", type=int, default=0,
+                        help="Start a new drift window every N scored rows (0 keeps one window)")
+    args = parser.parse_args()
+    if args.cache_size > 0 and (args.shadow or args.admin):
+        parser.error("--shadow and --admin use the model registry, which --cache-size replaces")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    cache = None
+    registry = None
+    if args.cache_size > 0:
+        from prediction_cache import PredictionCache
+        cache = PredictionCache(args.model, args.cache_size, args.cache_ttl)
+        model = cache.model
+        print(f"Loaded {args.model} ({type(model).__name__}) behind a {args.cache_size:,}-entry prediction cache")
+    else:
+        from model_registry import ModelRegistry, version_name
+
+        registry = model = ModelRegistry(shadow_sample_rate=args.shadow_sample_rate)
+        entry = registry.register(args.model_version or version_name(args.model), path=args.model, activate=True)
+        print(f"Loaded {args.model} as {entry.version} ({type(entry.model).__name__}), "
+              f"warm-up {entry.warmup_seconds * 1e3:.1f} ms")
+        if args.shadow:
+            shadow = registry.register(args.shadow_version or version_name(args.shadow), path=args.shadow)
+            registry.set_shadow(shadow.version)
+            print(f"Shadow scoring with {args.shadow} as {shadow.version}")
+    batcher = None
+    if args.micro_batch_size > 0:
+        from microbatch import MicroBatcher
+        batcher = MicroBatcher(model, args.micro_batch_size, args.micro_batch_wait_ms)
+
+    explainer = None
+    if args.explain:
+        from explanations import ExplanationService
+        explainer = ExplanationService(cache if cache is not None else model, workers=args.explain_workers)
+
+    monitor = None
+    if args.drift_profile:
+        from drift_monitor import DriftMonitor, Profile
+        monitor = DriftMonitor(Profile.load(args.drift_profile), window_rows=args.drift_window or None)
+        print(f"Monitoring drift against {args.drift_profile}")
+
+    server = make_server(args.host, args.port, model, args.verbose, batcher, cache, args.admin, explainer, monitor)
+    print(f"Serving on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if batcher is not None:
+            batcher.close()
+        if explainer is not None:
+            explainer.close()
+        if registry is not None:
+            registry.close()
+
+
+if __name__ == "__main__":
+    main()
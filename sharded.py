@@ -0,0 +1,322 @@
+"""Multi-process sharded scoring with a shared-memory model.
+
+``ShardedScorer`` starts one worker process per shard and partitions every
+chunk of transactions by a hash of ``nameOrig``, so all of an account's
+rows go to the same worker in their original order. The flattened trees of
+``numpy_trees.py`` are copied once into a shared-memory block that every
+worker maps read-only, instead of each worker unpickling its own pipeline.
+Feature batches and results move through per-worker shared-memory NumPy
+buffers; the pipes between coordinator and workers only carry row counts.
+
+Two buffer slots per worker let the coordinator read and partition the next
+chunk, and write out the previous one, while the workers score the current
+one. Scores are the NumPy tree evaluator's plus the rules and calibration of
+``scoring.score_batch``, and come back in input order.
+
+    python sharded.py transactions.csv scored.csv --workers 4
+    python sharded.py transactions.parquet flagged.parquet --workers 8 --flagged-only
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from schema import NUMERIC_COLUMNS, TRANSACTION_TYPES
+from validation import type_codes
+
+
+DEFAULT_CHUNK_ROWS = 100_000
+SLOTS = 2
+ALIGN = 64
+
+
+def _layout(specs):
+    """Byte offsets for ``{name: (dtype, shape)}`` packed into one block."""
+    layout, offset = [], 0
+    for name, (dtype, shape) in specs.items():
+        dtype = np.dtype(dtype)
+        offset = -(-offset // ALIGN) * ALIGN
+        layout.append((name, dtype.str, tuple(shape), offset))
+        offset += dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+    return layout, offset
+
+
+def _views(shm, layout, writeable=True):
+    arrays = {}
+    for name, dtype, shape, offset in layout:
+        view = np.ndarray(shape, dtype, shm.buf, offset)
+        view.flags.writeable = writeable
+        arrays[name] = view
+    return arrays
+
+
+def create_arrays(specs):
+    """A new shared-memory block holding ``{name: (dtype, shape)}``; returns ``(shm, layout, arrays)``."""
+    layout, size = _layout(specs)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    return shm, layout, _views(shm, layout)
+
+
+def share_arrays(arrays):
+    """Copy named arrays into a new shared-memory block; returns ``(shm, layout)``."""
+    arrays = {name: np.asarray(value) for name, value in arrays.items()}
+    shm, layout, views = create_arrays({name: (value.dtype, value.shape) for name, value in arrays.items()})
+    for name, value in arrays.items():
+        views[name][...] = value
+    return shm, layout
+
+
+def attach_arrays(name, layout, writeable=True):
+    """Map a block made by ``create_arrays``/``share_arrays`` in another process; returns ``(shm, arrays)``."""
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, _views(shm, layout, writeable)
+
+
+def shard_ids(names, shards):
+    """Shard of each account name: a stable hash, the same in every process and run."""
+    hashes = pd.util.hash_pandas_object(pd.Series(names, copy=False), index=False).to_numpy()
+    return (hashes % np.uint64(shards)).astype(np.intp)
+
+
+def load_trees(path):
+    """The model at ``path`` as a ``NumpyTreeEnsemble``; pickled pipelines are flattened in memory."""
+    from numpy_trees import NumpyTreeEnsemble, export_model
+
+    path = str(path)
+    if not path.endswith('.npz'):
+        import joblib
+        return export_model(joblib.load(path), None)
+    with np.load(path, allow_pickle=False) as data:
+        if 'booster' in data.files:
+            raise ValueError(f"{path} is a native booster bundle; export flattened trees with numpy_trees.py")
+    return NumpyTreeEnsemble.load(path)
+
+
+def _worker(conn, model_block, input_block, output_block):
+    # Imported here so that a spawned worker only pays for what scoring needs.
+    import scoring
+    from calibration import load_calibration
+    from numpy_trees import NumpyTreeEnsemble
+
+    model_shm, model_arrays = attach_arrays(*model_block, writeable=False)
+    input_shm, inputs = attach_arrays(*input_block, writeable=False)
+    output_shm, outputs = attach_arrays(*output_block)
+    model = NumpyTreeEnsemble(model_arrays)
+    calibration = load_calibration() or False
+    categories = pd.CategoricalDtype(TRANSACTION_TYPES)
+    frame = scored = None
+    conn.send(("ready", os.getpid(), bool(calibration)))
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            slot, rows = message
+            start = time.perf_counter()
+            try:
+                frame = pd.DataFrame(inputs["numeric"][slot, :rows], columns=NUMERIC_COLUMNS, copy=False)
+                frame.insert(0, "type", pd.Categorical.from_codes(inputs["type"][slot, :rows], dtype=categories))
+                scored = scoring.score_batch(model, frame, chunk_size=max(rows, 1), calibration=calibration)
+                outputs["fraud_prob"][slot, :rows] = scored["fraud_prob"].to_numpy()
+                outputs["is_flagged"][slot, :rows] = scored["is_flagged"].to_numpy()
+                if calibration:
+                    outputs["calibrated_prob"][slot, :rows] = scored["calibrated_prob"].to_numpy()
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+                continue
+            conn.send(("done", time.perf_counter() - start))
+    finally:
+        # Views must go before their blocks can be closed.
+        del model, model_arrays, inputs, outputs, frame, scored
+        for shm in (model_shm, input_shm, output_shm):
+            shm.close()
+
+
+class ShardedScorer:
+    """Score transaction frames across ``workers`` processes that share one copy of the model.
+
+    ``chunk_rows`` bounds the rows per chunk and so the size of every
+    worker's buffers. Use as a context manager, or call ``close``.
+    """
+
+    def __init__(self, model_path, workers=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self.worker_seconds = np.zeros(self.workers)
+        self._blocks = []
+        self._conns = []
+        self._processes = []
+        try:
+            self._start(load_trees(model_path))
+        except BaseException:
+            self.close()
+            raise
+
+    def _start(self, model):
+        model_shm, model_layout = share_arrays(model.arrays())
+        self._blocks.append(model_shm)
+        self.model_bytes = model_shm.size
+        self._inputs, self._outputs = [], []
+        context = multiprocessing.get_context("spawn")
+        for _ in range(self.workers):
+            input_shm, input_layout, inputs = create_arrays({
+                "numeric": (np.float64, (SLOTS, self.chunk_rows, len(NUMERIC_COLUMNS))),
+                "type": (np.int8, (SLOTS, self.chunk_rows)),
+            })
+            output_shm, output_layout, outputs = create_arrays({
+                "fraud_prob": (np.float64, (SLOTS, self.chunk_rows)),
+                "calibrated_prob": (np.float64, (SLOTS, self.chunk_rows)),
+                "is_flagged": (np.bool_, (SLOTS, self.chunk_rows)),
+            })
+            self._blocks += [input_shm, output_shm]
+            self._inputs.append(inputs)
+            self._outputs.append(outputs)
+            conn, child = context.Pipe()
+            process = context.Process(target=_worker, daemon=True, args=(
+                child, (model_shm.name, model_layout), (input_shm.name, input_layout),
+                (output_shm.name, output_layout)))
+            process.start()
+            child.close()
+            self._conns.append(conn)
+            self._processes.append(process)
+        ready = [self._receive(w) for w in range(self.workers)]
+        self.pids = [pid for _, pid, _ in ready]
+        self.calibrated = all(calibrated for _, _, calibrated in ready)
+
+    def _receive(self, worker):
+        try:
+            message = self._conns[worker].recv()
+        except EOFError:
+            raise RuntimeError(f"Scoring worker {worker} exited") from None
+        if message[0] == "error":
+            raise RuntimeError(f"Scoring worker {worker}: {message[1]}")
+        return message
+
+    def _submit(self, chunk, slot):
+        if len(chunk) > self.chunk_rows:
+            raise ValueError(f"Chunk of {len(chunk):,} rows exceeds chunk_rows={self.chunk_rows:,}")
+        codes = type_codes(chunk["type"])
+        valid = codes >= 0
+        shards = np.where(valid, shard_ids(chunk["nameOrig"], self.workers), -1)
+        numeric = chunk[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+        parts = []
+        for worker in range(self.workers):
+            rows = np.flatnonzero(shards == worker)
+            if len(rows):
+                inputs = self._inputs[worker]
+                np.take(numeric, rows, axis=0, out=inputs["numeric"][slot, :len(rows)])
+                np.take(codes, rows, out=inputs["type"][slot, :len(rows)])
+                self._conns[worker].send((slot, len(rows)))
+            parts.append(rows)
+        return chunk, slot, valid, parts
+
+    def _collect(self, job):
+        chunk, slot, valid, parts = job
+        fraud_prob = np.full(len(chunk), np.nan)
+        calibrated = np.full(len(chunk), np.nan)
+        flagged = np.zeros(len(chunk), dtype=bool)
+        errors = []
+        for worker, rows in enumerate(parts):
+            if not len(rows):
+                continue
+            try:
+                self.worker_seconds[worker] += self._receive(worker)[1]
+            except RuntimeError as e:
+                errors.append(str(e))
+                continue
+            outputs = self._outputs[worker]
+            fraud_prob[rows] = outputs["fraud_prob"][slot, :len(rows)]
+            flagged[rows] = outputs["is_flagged"][slot, :len(rows)]
+            if self.calibrated:
+                calibrated[rows] = outputs["calibrated_prob"][slot, :len(rows)]
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        scored = chunk.copy()
+        scored["fraud_prob"] = fraud_prob
+        if self.calibrated:
+            scored["calibrated_prob"] = calibrated
+        scored["is_flagged"] = flagged
+        return scored[valid], int((~valid).sum())
+
+    def score_chunks(self, chunks):
+        """Yield ``(scored, skipped)`` for each chunk; rows with an unknown type are dropped and counted."""
+        pending = []
+        for i, chunk in enumerate(chunks):
+            pending.append(self._submit(chunk, i % SLOTS))
+            if len(pending) == SLOTS:
+                yield self._collect(pending.pop(0))
+        while pending:
+            yield self._collect(pending.pop(0))
+
+    def score(self, frame):
+        """Score a frame with ``type``, the numeric columns and ``nameOrig``; rows keep their order."""
+        chunks = (frame.iloc[start:start + self.chunk_rows] for start in range(0, len(frame), self.chunk_rows))
+        parts = [scored for scored, _ in self.score_chunks(chunks)]
+        return pd.concat(parts) if parts else frame.iloc[:0]
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for conn in self._conns:
+            conn.close()
+        self._inputs = self._outputs = []
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._conns, self._processes, self._blocks = [], [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    from numpy_trees import TREES_PATH
+    from stream_score import open_sink, read_chunks, skipped_summary, validated_chunks
+
+    parser = argparse.ArgumentParser(description="Score a transactions file across worker processes")
+    parser.add_argument("input", help="Transactions CSV, Parquet or Arrow file in the dataset schema")
+    parser.add_argument("output", help="Scored CSV or Parquet path ('-' for CSV on stdout)")
+    parser.add_argument("--model", default=TREES_PATH, help="Flattened trees (.npz) or a pickled pipeline")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per chunk")
+    parser.add_argument("--flagged-only", action="store_true", help="Only write rows flagged as high risk")
+    args = parser.parse_args()
+
+    sink = open_sink(args.output)
+    rows = flagged = skipped = 0
+    errors = {}
+    try:
+        with ShardedScorer(args.model, args.workers, args.chunk_size) as scorer:
+            print(f"{scorer.workers} workers sharing a {scorer.model_bytes / 1024:.0f} KB model", file=sys.stderr)
+            start = time.perf_counter()
+            chunks = validated_chunks(read_chunks(args.input, args.chunk_size), np.float64, counts=errors)
+            for scored, dropped in scorer.score_chunks(chunks):
+                flags = scored["is_flagged"].to_numpy()
+                sink.write(scored[flags] if args.flagged_only else scored)
+                rows += len(scored)
+                flagged += int(flags.sum())
+                skipped += dropped
+            elapsed = time.perf_counter() - start
+    finally:
+        sink.close()
+    print(f"{rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)", file=sys.stderr)
+    print(f"{flagged:,} flagged, {skipped_summary(skipped + sum(errors.values()), errors)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Scriptable, parallel replacement for the notebook's training loop.
+
+Fits the notebook's candidate pipelines (Logistic Regression, Random Forest,
+XGBoost, LightGBM on the same ColumnTransformer) in separate worker
+processes. Each model gets an explicit thread budget, applied both to its
+own ``n_jobs`` and to the BLAS/OpenMP pools via threadpoolctl, so that
+parallel fits do not oversubscribe the machine. Every metric comes from one
+``predict_proba`` pass over the test split per model.
+
+Each run writes a versioned artifact directory:
+
+    artifacts/<version>/
+        <model>.pkl          fitted pipelines
+        report.json          metrics, timings, thread budgets, data fingerprint
+
+    python train.py --data "Fraud_Analysis_Dataset(in).csv" --workers 4
+    python train.py --data transactions.parquet --threads XGBoost=8,LightGBM=8 --deploy
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import (accuracy_score, classification_report, confusion_matrix, f1_score,
+                             precision_score, recall_score, roc_auc_score)
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from threadpoolctl import threadpool_limits
+
+from columnar import load_transactions
+from schema import DATASET_PATH, FEATURE_COLUMNS, MODEL_PATH, NUMERIC_COLUMNS
+
+
+ARTIFACTS_DIR = 'artifacts'
+DEPLOYED_MODEL = 'XGBoost'
+MODEL_NAMES = ['Logistic Regression', 'Random Forest', 'XGBoost', 'LightGBM']
+
+
+def slug(name):
+    return name.lower().replace(' ', '_')
+
+
+def make_preprocessor():
+    return ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), NUMERIC_COLUMNS),
+            ('cat', OneHotEncoder(drop="first"), ["type"])
+        ],
+        remainder='drop'
+    )
+
+
+def make_classifier(name, ratio, threads, params=None):
+    """The notebook's model settings, with ``threads`` as the parallelism budget.
+
+    ``params`` overrides individual estimator arguments, e.g. tuned values
+    from ``tune.py``.
+    """
+    params = params or {}
+    if name == 'Logistic Regression':
+        return LogisticRegression(**{'max_iter': 1000, **params})
+    if name == 'Random Forest':
+        return RandomForestClassifier(**{'n_estimators': 100, 'class_weight': 'balanced', 'random_state': 42,
+                                         'n_jobs': threads, **params})
+    if name == 'XGBoost':
+        from xgboost import XGBClassifier
+        return XGBClassifier(**{'scale_pos_weight': ratio, 'eval_metric': 'logloss', 'random_state': 42,
+                                'n_jobs': threads, **params})
+    if name == 'LightGBM':
+        from lightgbm import LGBMClassifier
+        return LGBMClassifier(**{'is_unbalance': True, 'random_state': 42, 'n_jobs': threads, 'verbose': -1,
+                                 **params})
+    raise ValueError(f"Unknown model {name!r}")
+
+
+def make_pipeline(name, ratio, threads=1, params=None):
+    return Pipeline(steps=[('preprocessor', make_preprocessor()),
+                           ('classifier', make_classifier(name, ratio, threads, params))])
+
+
+def evaluate(y_test, y_prob, threshold=0.5):
+    """All reported metrics from a single vector of fraud probabilities."""
+    y_pred = (y_prob > threshold).astype(int)
+    return {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'auc': roc_auc_score(y_test, y_prob),
+        'precision': precision_score(y_test, y_pred, zero_division=0),
+        'recall': recall_score(y_test, y_pred, zero_division=0),
+        'f1': f1_score(y_test, y_pred, zero_division=0),
+        'confusion_matrix': confusion_matrix(y_test, y_pred).tolist(),
+        'classification_report': classification_report(y_test, y_pred, zero_division=0),
+    }
+
+
+_DATA = {}
+
+
+def _init_worker(X_train, X_test, y_train, y_test):
+    _DATA.update(X_train=X_train, X_test=X_test, y_train=y_train, y_test=y_test)
+
+
+def _fit_one(name, threads, out_dir, params=None):
+    X_train, X_test, y_train, y_test = (_DATA[k] for k in ('X_train', 'X_test', 'y_train', 'y_test'))
+    ratio = float((y_train == 0).sum() / (y_train == 1).sum())
+    with threadpool_limits(limits=threads):
+        pipeline = make_pipeline(name, ratio, threads, params)
+        start = time.perf_counter()
+        pipeline.fit(X_train, y_train)
+        fit_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        y_prob = pipeline.predict_proba(X_test)[:, 1]
+        predict_s = time.perf_counter() - start
+
+    path = os.path.join(out_dir, f"{slug(name)}.pkl")
+    joblib.dump(pipeline, path)
+    return {'model': name, 'threads': threads, 'params': params or {}, 'fit_seconds': fit_s,
+            'predict_seconds': predict_s, 'path': path, 'metrics': evaluate(y_test, y_prob)}
+
+
+def thread_budgets(names, workers, overrides=None):
+    """Threads per model: an even share of the cores per worker, unless overridden."""
+    default = max(1, (os.cpu_count() or 1) // max(1, min(workers, len(names))))
+    budgets = {name: default for name in names}
+    budgets.update(overrides or {})
+    return budgets
+
+
+def data_fingerprint(path):
+    stat = os.stat(path)
+    digest = hashlib.sha256(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    return digest[:12]
+
+
+def deploy(path, target=MODEL_PATH):
+    """Copy ``path`` over ``target`` atomically, so apps reloading ``target`` never read a partial pickle."""
+    fd, tmp = tempfile.mkstemp(prefix=".deploy-", dir=os.path.dirname(os.path.abspath(target)))
+    os.close(fd)
+    try:
+        shutil.copyfile(path, tmp)
+        shutil.copymode(path, tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def train(data_path=DATASET_PATH, models=MODEL_NAMES, workers=None, threads=None, out_root=ARTIFACTS_DIR,
+          test_size=0.2, random_state=42, params=None):
+    """Fit ``models`` in parallel and write a versioned artifact directory. Returns the report dict.
+
+    ``params`` maps model names to estimator overrides (see ``load_params``).
+    """
+    params = params or {}
+    wall_start = time.perf_counter()
+    df = load_transactions(data_path, columns=FEATURE_COLUMNS + ['isFraud'])
+    X = df[FEATURE_COLUMNS]
+    y = df['isFraud'].to_numpy(dtype=np.int8)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+    load_s = time.perf_counter() - wall_start
+
+    version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{data_fingerprint(data_path)}"
+    out_dir = os.path.join(out_root, version)
+    os.makedirs(out_dir, exist_ok=True)
+
+    workers = workers or min(len(models), os.cpu_count() or 1)
+    budgets = thread_budgets(models, workers, threads)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X_train, X_test, y_train, y_test)) as pool:
+        futures = [pool.submit(_fit_one, name, budgets[name], out_dir, params.get(name))
+                   for name in models]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['model']] = result
+
+    report = {
+        'version': version,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'data': {'path': data_path, 'fingerprint': data_fingerprint(data_path), 'rows': len(df),
+                 'train_rows': len(X_train), 'test_rows': len(X_test), 'fraud_rate': float(y.mean())},
+        'workers': workers,
+        'load_seconds': load_s,
+        'wall_seconds': time.perf_counter() - wall_start,
+        'models': {name: results[name] for name in models},
+    }
+    with open(os.path.join(out_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def print_report(report):
+    print(f"Version {report['version']}: {report['data']['rows']:,} rows, {report['workers']} workers, "
+          f"{report['wall_seconds']:.1f}s wall (load {report['load_seconds']:.1f}s)")
+    print(f"{'model':<20} {'threads':>7} {'fit s':>8} {'pred s':>8} {'accuracy':>9} {'AUC':>7} "
+          f"{'recall':>7} {'precision':>9}")
+    for name, r in report['models'].items():
+        m = r['metrics']
+        print(f"{name:<20} {r['threads']:>7} {r['fit_seconds']:>8.2f} {r['predict_seconds']:>8.3f} "
+              f"{m['accuracy']:>9.4f} {m['auc']:>7.4f} {m['recall']:>7.4f} {m['precision']:>9.4f}")
+
+
+def load_params(path):
+    """Read ``{model name: estimator params}`` from a JSON file such as ``tune.py``'s best.json."""
+    with open(path) as f:
+        params = json.load(f).get('params', {})
+    unknown = [name for name in params if name not in MODEL_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown model in {path}: {', '.join(unknown)}")
+    return params
+
+
+def parse_threads(value):
+    overrides = {}
+    for item in filter(None, value.split(',')):
+        name, _, count = item.rpartition('=')
+        if name not in MODEL_NAMES:
+            raise argparse.ArgumentTypeError(f"Unknown model {name!r}; choose from {', '.join(MODEL_NAMES)}")
+        overrides[name] = int(count)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the candidate fraud models in parallel")
+    parser.add_argument("--data", default=DATASET_PATH, help="Transactions CSV, Parquet or Arrow file")
+    parser.add_argument("--models", nargs="+", choices=MODEL_NAMES, default=MODEL_NAMES, metavar="MODEL")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: one per model, capped at cores)")
+    parser.add_argument("--threads", type=parse_threads, default=None,
+                        help="Per-model thread budgets, e.g. 'XGBoost=8,LightGBM=8'")
+    parser.add_argument("--out", default=ARTIFACTS_DIR, help="Root directory for versioned artifacts")
+    parser.add_argument("--params", default=None, help="JSON file of tuned estimator params (tune.py's best.json)")
+    parser.add_argument("--deploy", action="store_true",
+                        help=f"Copy the {DEPLOYED_MODEL} pipeline to {MODEL_PATH} (running apps reload it)")
+    args = parser.parse_args()
+
+    params = load_params(args.params) if args.params else None
+    report = train(args.data, args.models, args.workers, args.threads, args.out, params=params)
+    print_report(report)
+    print(f"Artifacts in {os.path.join(args.out, report['version'])}")
+    if args.deploy:
+        if DEPLOYED_MODEL not in report['models']:
+            parser.error(f"--deploy needs {DEPLOYED_MODEL} among --models")
+        deploy(report['models'][DEPLOYED_MODEL]['path'])
+        print(f"Deployed {DEPLOYED_MODEL} to {MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()
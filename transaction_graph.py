@@ -0,0 +1,321 @@
+"""Money-flow graph over ``nameOrig -> nameDest``.
+
+Every transaction is a directed edge from the sender to the receiver,
+stored column-wise (source, destination, step, type, amount) in growable
+NumPy arrays; accounts are mapped to dense int32 ids. Adjacency is kept in
+compressed sparse row (CSR) form in both directions: ``indptr`` holds one
+offset per account and ``edges`` the edge ids grouped by account, about
+12 bytes per edge and 8 per account each way.
+
+Appends never rebuild the CSR. New edges go to a small delta adjacency that
+queries read alongside the main one, and are merged into it once the delta
+grows past a fraction of the graph, so a stream of appends costs amortized
+O(1) per edge.
+
+Queries work on whole frontiers at once:
+
+    neighborhood(accounts, k)   accounts within k hops, with their distance
+    transfer_cashout_chains(N)  TRANSFER a -> b followed by CASH_OUT b -> c
+                                within N steps -- the dataset's fraud pattern
+
+    python transaction_graph.py --hops 2 --max-steps 1
+"""
+import argparse
+import time
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from schema import DATASET_PATH, TRANSACTION_TYPES
+
+
+EDGE_COLUMNS = ["step", "type", "amount", "nameOrig", "nameDest"]
+TYPE_CODES = {name: code for code, name in enumerate(TRANSACTION_TYPES)}
+COMPACT_RATIO = 0.25
+COMPACT_MIN_EDGES = 65_536
+
+
+def _edge_ids(values, n_edges):
+    return values.astype(np.int64 if n_edges > 2**31 - 1 else np.int32, copy=False)
+
+
+class _Adjacency:
+    """CSR grouping of edge ids by one endpoint."""
+
+    def __init__(self, edges, keys, n_accounts):
+        self.edges = edges
+        self.indptr = np.zeros(n_accounts + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=n_accounts), out=self.indptr[1:])
+
+    @classmethod
+    def build(cls, keys, n_accounts, edge_offset=0):
+        """Adjacency of edges ``edge_offset ..`` whose grouping endpoints are ``keys``."""
+        order = np.argsort(keys, kind="stable")
+        return cls(_edge_ids(order + edge_offset, edge_offset + len(keys)), keys, n_accounts)
+
+    def merge(self, other, keys, n_accounts):
+        """One adjacency holding the edges of both; ``keys`` covers every edge id."""
+        combined = np.concatenate([self.edges, other.edges])
+        # Both halves are already grouped by key, so the stable sort only merges two runs.
+        edges = combined[np.argsort(keys[combined], kind="stable")]
+        return _Adjacency(_edge_ids(edges, len(keys)), keys, n_accounts)
+
+    @property
+    def nbytes(self):
+        return self.edges.nbytes + self.indptr.nbytes
+
+    def gather(self, nodes):
+        """Edge ids of ``nodes`` and, for each, the position in ``nodes`` it belongs to."""
+        # Accounts first seen after this adjacency was built have no edges in it.
+        known = np.flatnonzero(nodes < len(self.indptr) - 1)
+        nodes = nodes[known]
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        owner = np.repeat(np.arange(len(nodes)), counts)
+        # Position of each gathered edge inside its node's run, added to the run's start.
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return self.edges[starts[owner] + within].astype(np.int64), known[owner]
+
+
+class TransactionGraph:
+    def __init__(self, capacity=1024, compact_ratio=COMPACT_RATIO, compact_min_edges=COMPACT_MIN_EDGES):
+        self.compact_ratio = compact_ratio
+        self.compact_min_edges = compact_min_edges
+        self._ids = {}
+        self._names = []
+        self.n_edges = 0
+        self._src = np.empty(capacity, dtype=np.int32)
+        self._dst = np.empty(capacity, dtype=np.int32)
+        self._step = np.empty(capacity, dtype=np.int32)
+        self._type = np.empty(capacity, dtype=np.int8)
+        self._amount = np.empty(capacity, dtype=np.float64)
+        self._out = self._in = None
+        self._merged_edges = 0
+        self._delta = None
+        self.compactions = 0
+
+    @classmethod
+    def from_frame(cls, frame, **kwargs):
+        graph = cls(capacity=max(len(frame), 1), **kwargs)
+        graph.append_frame(frame)
+        return graph
+
+    def __len__(self):
+        return len(self._names)
+
+    @property
+    def n_accounts(self):
+        return len(self._names)
+
+    @property
+    def nbytes(self):
+        """Bytes held in edge columns and adjacency arrays (the name dictionary not included)."""
+        columns = (self._src, self._dst, self._step, self._type, self._amount)
+        adjacency = [a for a in (self._out, self._in) + (self._delta or ()) if a is not None]
+        return sum(c.nbytes for c in columns) + sum(a.nbytes for a in adjacency)
+
+    def account_ids(self, names, add=False):
+        """Dense ids of ``names``; unknown names get -1, or new ids when ``add`` is true."""
+        codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+        unique_ids = np.fromiter(map(self._ids.get, uniques, repeat(-1)), dtype=np.int64, count=len(uniques))
+        if add:
+            missing = np.flatnonzero(unique_ids < 0)
+            if len(missing):
+                new = uniques[missing].tolist()
+                unique_ids[missing] = np.arange(len(self._names), len(self._names) + len(new))
+                self._ids.update(zip(new, unique_ids[missing].tolist()))
+                self._names.extend(new)
+        return unique_ids[codes] if len(codes) else np.empty(0, dtype=np.int64)
+
+    def account_names(self, ids):
+        names = self._names
+        return np.array([names[i] for i in np.asarray(ids).tolist()], dtype=object)
+
+    def _reserve(self, n):
+        needed = self.n_edges + n
+        if needed <= len(self._src):
+            return
+        capacity = max(needed, 2 * len(self._src))
+        for name in ("_src", "_dst", "_step", "_type", "_amount"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.n_edges] = old[:self.n_edges]
+            setattr(self, name, new)
+
+    def append_frame(self, frame):
+        """Add one edge per transaction; ``frame`` needs ``EDGE_COLUMNS``."""
+        self.append(frame["step"].to_numpy(), frame["type"].to_numpy(), frame["amount"].to_numpy(),
+                    frame["nameOrig"].to_numpy(), frame["nameDest"].to_numpy())
+
+    def append(self, steps, types, amounts, senders, receivers):
+        """Add edges from parallel arrays of steps, type names, amounts and account names."""
+        n = len(steps)
+        if n == 0:
+            return
+        codes = pd.Series(types).map(TYPE_CODES)
+        if codes.isna().any():
+            raise ValueError(f"Unknown transaction type: {pd.Series(types)[codes.isna()].iloc[0]!r}")
+        src = self.account_ids(senders, add=True)
+        dst = self.account_ids(receivers, add=True)
+        self._reserve(n)
+        end = self.n_edges + n
+        self._src[self.n_edges:end] = src
+        self._dst[self.n_edges:end] = dst
+        self._step[self.n_edges:end] = steps
+        self._type[self.n_edges:end] = codes.to_numpy(dtype=np.int8)
+        self._amount[self.n_edges:end] = amounts
+        self.n_edges = end
+        self._delta = None
+        if end - self._merged_edges > max(self.compact_min_edges, self.compact_ratio * self._merged_edges):
+            self.compact()
+
+    def compact(self):
+        """Merge every edge into the main CSR adjacency."""
+        n = self.n_edges
+        if self._out is None:
+            self._out = _Adjacency.build(self._src[:n], self.n_accounts)
+            self._in = _Adjacency.build(self._dst[:n], self.n_accounts)
+        elif n > self._merged_edges:
+            delta_out, delta_in = self._build_delta()
+            self._out = self._out.merge(delta_out, self._src[:n], self.n_accounts)
+            self._in = self._in.merge(delta_in, self._dst[:n], self.n_accounts)
+        self._merged_edges = n
+        self._delta = None
+        self.compactions += 1
+
+    def _adjacencies(self, direction):
+        """(main, delta) adjacency pairs for ``direction`` -- "out", "in" or "both"."""
+        if direction not in ("out", "in", "both"):
+            raise ValueError(f"direction must be 'out', 'in' or 'both', not {direction!r}")
+        if self._out is None:
+            self.compact()
+        if self._delta is None and self.n_edges > self._merged_edges:
+            self._delta = self._build_delta()
+        out = [self._out] + ([self._delta[0]] if self._delta else [])
+        into = [self._in] + ([self._delta[1]] if self._delta else [])
+        return {"out": (out, []), "in": ([], into), "both": (out, into)}[direction]
+
+    def _build_delta(self):
+        if self._delta is not None:
+            return self._delta
+        start, end = self._merged_edges, self.n_edges
+        return (_Adjacency.build(self._src[start:end], self.n_accounts, start),
+                _Adjacency.build(self._dst[start:end], self.n_accounts, start))
+
+    def _edges_of(self, nodes, direction):
+        """``(edge ids, owner positions, neighbour ids)`` of every edge touching ``nodes``."""
+        outgoing, incoming = self._adjacencies(direction)
+        edges, owners, neighbours = [], [], []
+        for adjacency in outgoing:
+            e, o = adjacency.gather(nodes)
+            edges.append(e)
+            owners.append(o)
+            neighbours.append(self._dst[e])
+        for adjacency in incoming:
+            e, o = adjacency.gather(nodes)
+            edges.append(e)
+            owners.append(o)
+            neighbours.append(self._src[e])
+        return np.concatenate(edges), np.concatenate(owners), np.concatenate(neighbours).astype(np.int64)
+
+    def neighborhood(self, accounts, k=2, direction="both", min_step=None, max_step=None):
+        """Accounts within ``k`` hops of ``accounts`` as a frame of ``account, hops``.
+
+        Only edges with ``min_step <= step <= max_step`` are followed; the
+        seed accounts themselves are included at 0 hops.
+        """
+        seeds = self.account_ids(accounts)
+        seeds = np.unique(seeds[seeds >= 0])
+        hops = np.full(self.n_accounts, -1, dtype=np.int16)
+        hops[seeds] = 0
+        frontier = seeds
+        for hop in range(1, k + 1):
+            if len(frontier) == 0:
+                break
+            edges, _, neighbours = self._edges_of(frontier, direction)
+            if min_step is not None or max_step is not None:
+                steps = self._step[edges]
+                keep = np.ones(len(edges), dtype=bool)
+                if min_step is not None:
+                    keep &= steps >= min_step
+                if max_step is not None:
+                    keep &= steps <= max_step
+                neighbours = neighbours[keep]
+            neighbours = np.unique(neighbours)
+            frontier = neighbours[hops[neighbours] < 0]
+            hops[frontier] = hop
+        found = np.flatnonzero(hops >= 0)
+        return pd.DataFrame({"account": self.account_names(found), "hops": hops[found]}).sort_values(
+            ["hops", "account"], ignore_index=True)
+
+    def transfer_cashout_chains(self, max_steps=1, accounts=None):
+        """TRANSFER a -> b followed by a CASH_OUT from b within ``max_steps`` steps.
+
+        ``accounts`` limits the search to transfers sent by those accounts.
+        Returns one row per (transfer, cash-out) pair.
+        """
+        n = self.n_edges
+        transfer = np.flatnonzero(self._type[:n] == TYPE_CODES["TRANSFER"])
+        if accounts is not None:
+            senders = self.account_ids(accounts)
+            transfer = transfer[np.isin(self._src[transfer], senders[senders >= 0])]
+        # Cash-outs leaving each transfer's receiver.
+        out_edges, owners, _ = self._edges_of(self._dst[transfer].astype(np.int64), "out")
+        first = transfer[owners]
+        gap = self._step[out_edges] - self._step[first]
+        match = (self._type[out_edges] == TYPE_CODES["CASH_OUT"]) & (gap >= 0) & (gap <= max_steps)
+        first, second = first[match], out_edges[match]
+        return pd.DataFrame({
+            "origin": self.account_names(self._src[first]),
+            "mule": self.account_names(self._dst[first]),
+            "cash_out_dest": self.account_names(self._dst[second]),
+            "transfer_step": self._step[first],
+            "cash_out_step": self._step[second],
+            "transfer_amount": self._amount[first],
+            "cash_out_amount": self._amount[second],
+            "transfer_edge": first,
+            "cash_out_edge": second,
+        })
+
+    def stats(self):
+        return {"accounts": self.n_accounts, "edges": self.n_edges, "merged_edges": self._merged_edges,
+                "compactions": self.compactions, "nbytes": self.nbytes}
+
+
+def main():
+    from columnar import load_transactions
+
+    parser = argparse.ArgumentParser(description="Build the transaction graph and look for fraud chains")
+    parser.add_argument("--data", default=DATASET_PATH, help="Transactions CSV, Parquet or Arrow file")
+    parser.add_argument("--max-steps", type=int, default=1, help="Longest TRANSFER -> CASH_OUT gap in steps")
+    parser.add_argument("--hops", type=int, default=2, help="Neighbourhood radius around fraudulent senders")
+    args = parser.parse_args()
+
+    df = load_transactions(args.data, columns=EDGE_COLUMNS + ["isFraud"])
+    start = time.perf_counter()
+    graph = TransactionGraph.from_frame(df)
+    build_s = time.perf_counter() - start
+    stats = graph.stats()
+    print(f"{stats['edges']:,} edges, {stats['accounts']:,} accounts, {stats['nbytes'] / 1e6:.1f} MB "
+          f"in {build_s:.2f}s")
+
+    start = time.perf_counter()
+    chains = graph.transfer_cashout_chains(args.max_steps)
+    print(f"{len(chains):,} TRANSFER -> CASH_OUT chains within {args.max_steps} step(s) "
+          f"({time.perf_counter() - start:.3f}s)")
+    if len(chains):
+        print(chains.head(10).to_string(index=False))
+
+    fraud_senders = df.loc[df["isFraud"] == 1, "nameOrig"].unique()
+    start = time.perf_counter()
+    near = graph.neighborhood(fraud_senders, args.hops)
+    print(f"{len(near):,} accounts within {args.hops} hop(s) of {len(fraud_senders):,} fraudulent senders "
+          f"({time.perf_counter() - start:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""Parallel hyperparameter search for the XGBoost and LightGBM models.
+
+Random configurations are evaluated with successive halving: every trial
+is fitted with a small tree budget, the best ``1/eta`` are refitted with
+``eta`` times more trees, and so on up to ``--max-trees``. Each fit also
+stops early on the validation AUC, and a trial that stopped before its
+budget is carried to the next rung without refitting.
+
+The objective rewards AUC and penalises inference cost, measured as the
+summed depth of the trees actually used (the decision-path length per
+row), relative to the deployed model's 100 trees of depth 6:
+
+    objective = validation AUC - cost_weight * sum(tree depths) / 600
+
+The ColumnTransformer is fitted once and its output is cached as ``.npy``
+files in the study directory, which the worker processes memory-map.
+Every finished trial is appended to ``trials.jsonl``; running the same
+command again resumes the search and skips trials that are already there.
+
+    python tune.py --trials 32 --workers 4
+    python tune.py --models XGBoost --cost-weight 0.005 --study shallow
+    python train.py --params tuning/default/best.json --deploy
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+from sklearn.model_selection import train_test_split
+from threadpoolctl import threadpool_limits
+
+from columnar import load_transactions
+from schema import DATASET_PATH, FEATURE_COLUMNS
+from train import data_fingerprint, evaluate, make_classifier, make_preprocessor
+
+TUNING_DIR = 'tuning'
+SEARCH_MODELS = ['XGBoost', 'LightGBM']
+# Inference cost of the deployed XGBClassifier defaults (100 trees, depth 6).
+REFERENCE_COST = 100 * 6
+EARLY_STOPPING_ROUNDS = 20
+CACHE_ARRAYS = ['X_fit', 'y_fit', 'X_valid', 'y_valid', 'X_test', 'y_test']
+
+
+def sample_params(name, rng):
+    """Draw one configuration for model ``name``."""
+    learning_rate = float(np.exp(rng.uniform(np.log(0.03), np.log(0.3))))
+    subsample = float(rng.uniform(0.6, 1.0))
+    colsample = float(rng.uniform(0.6, 1.0))
+    depth = int(rng.integers(2, 9))
+    if name == 'XGBoost':
+        return {'max_depth': depth, 'learning_rate': learning_rate, 'subsample': subsample,
+                'colsample_bytree': colsample, 'min_child_weight': int(rng.choice([1, 2, 4, 8])),
+                'reg_lambda': float(np.exp(rng.uniform(np.log(0.1), np.log(10.0))))}
+    if name == 'LightGBM':
+        return {'max_depth': depth, 'num_leaves': int(rng.integers(4, 2 ** depth + 1)),
+                'learning_rate': learning_rate, 'subsample': subsample, 'subsample_freq': 1,
+                'colsample_bytree': colsample, 'min_child_samples': int(rng.choice([5, 10, 20, 40]))}
+    raise ValueError(f"Unknown model {name!r}")
+
+
+def make_trials(models, n_trials, seed):
+    """Deterministic trial list, alternating between ``models``."""
+    rng = np.random.default_rng(seed)
+    return [{'trial': i, 'model': models[i % len(models)], 'params': sample_params(models[i % len(models)], rng)}
+            for i in range(n_trials)]
+
+
+def tree_depths(clf, trees):
+    """Depth of each of the first ``trees`` trees of a fitted XGBoost or LightGBM classifier."""
+    if hasattr(clf, 'get_booster'):
+        # Text dump: one tab of indentation per level.
+        dumps = clf.get_booster().get_dump()[:trees]
+        return [max(len(line) - len(line.lstrip('\t')) for line in dump.splitlines()) for dump in dumps]
+
+    def depth(node):
+        if 'leaf_index' in node or 'left_child' not in node:
+            return 0
+        return 1 + max(depth(node['left_child']), depth(node['right_child']))
+    return [depth(tree['tree_structure']) for tree in clf.booster_.dump_model()['tree_info'][:trees]]
+
+
+def inference_cost(clf, trees):
+    return sum(tree_depths(clf, trees)) / REFERENCE_COST
+
+
+def objective(auc, cost, cost_weight):
+    return auc - cost_weight * cost
+
+
+def rung_budgets(min_trees, max_trees, eta):
+    budgets = [min_trees]
+    while budgets[-1] * eta <= max_trees:
+        budgets.append(budgets[-1] * eta)
+    return budgets
+
+
+def prepare_features(data_path, cache_dir, test_size=0.2, random_state=42):
+    """Split like ``train.py``, fit the preprocessor once and cache its output.
+
+    The training split is further divided into fit and validation parts;
+    the test split is only used to report the final model. Returns
+    ``cache_dir``; an existing cache is reused as is.
+    """
+    if all(os.path.exists(os.path.join(cache_dir, f"{name}.npy")) for name in CACHE_ARRAYS):
+        return cache_dir
+    df = load_transactions(data_path, columns=FEATURE_COLUMNS + ['isFraud'])
+    X = df[FEATURE_COLUMNS]
+    y = df['isFraud'].to_numpy(dtype=np.int8)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+    X_fit, X_valid, y_fit, y_valid = train_test_split(X_train, y_train, test_size=test_size,
+                                                      random_state=random_state, stratify=y_train)
+
+    preprocessor = make_preprocessor().fit(X_fit)
+    arrays = {'X_fit': preprocessor.transform(X_fit), 'y_fit': y_fit,
+              'X_valid': preprocessor.transform(X_valid), 'y_valid': y_valid,
+              'X_test': preprocessor.transform(X_test), 'y_test': y_test}
+    os.makedirs(cache_dir, exist_ok=True)
+    for name, values in arrays.items():
+        dtype = np.float32 if name.startswith('X') else np.int8
+        np.save(os.path.join(cache_dir, f"{name}.npy"), np.ascontiguousarray(values, dtype=dtype))
+    joblib.dump(preprocessor, os.path.join(cache_dir, 'preprocessor.pkl'))
+    return cache_dir
+
+
+_DATA = {}
+
+
+def _init_worker(cache_dir):
+    for name in CACHE_ARRAYS:
+        _DATA[name] = np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode='r')
+
+
+def _fit(name, params, n_trees, threads, early_stopping=True):
+    """Fit on the fit split; returns ``(classifier, trees used)``."""
+    y_fit = _DATA['y_fit']
+    ratio = float((y_fit == 0).sum() / (y_fit == 1).sum())
+    settings = dict(params, n_estimators=n_trees)
+    fit_kwargs = {}
+    if early_stopping and name == 'XGBoost':
+        settings.update(eval_metric='auc', early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+        fit_kwargs = {'eval_set': [(_DATA['X_valid'], _DATA['y_valid'])], 'verbose': False}
+    elif early_stopping and name == 'LightGBM':
+        import lightgbm
+        settings.update(metric='auc')
+        fit_kwargs = {'eval_set': [(_DATA['X_valid'], _DATA['y_valid'])],
+                      'callbacks': [lightgbm.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)]}
+
+    clf = make_classifier(name, ratio, threads, settings)
+    clf.fit(_DATA['X_fit'], y_fit, **fit_kwargs)
+    if not early_stopping:
+        return clf, n_trees
+    best = clf.best_iteration + 1 if name == 'XGBoost' else clf.best_iteration_
+    return clf, int(best or n_trees)
+
+
+def _run_trial(trial, rung, n_trees, threads, cost_weight):
+    with threadpool_limits(limits=threads):
+        start = time.perf_counter()
+        clf, trees = _fit(trial['model'], trial['params'], n_trees, threads)
+        fit_s = time.perf_counter() - start
+        auc = evaluate(_DATA['y_valid'], clf.predict_proba(_DATA['X_valid'])[:, 1])['auc']
+    cost = inference_cost(clf, trees)
+    return {'trial': trial['trial'], 'model': trial['model'], 'rung': rung, 'budget': n_trees,
+            'trees': trees, 'stopped': trees + EARLY_STOPPING_ROUNDS <= n_trees, 'auc': auc, 'cost': cost,
+            'objective': objective(auc, cost, cost_weight), 'fit_seconds': fit_s, 'params': trial['params']}
+
+
+def load_trials(path):
+    """Finished trials keyed by ``(trial, rung)``.
+
+    A torn last line left by an interrupted run is cut off so that new
+    records start on a fresh line.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) != len(data):
+            f.truncate(len(complete))
+    for line in complete.decode().splitlines():
+        record = json.loads(line)
+        done[(record['trial'], record['rung'])] = record
+    return done
+
+
+def open_study(study_dir, settings):
+    """Create ``study_dir`` or check that it was started with the same settings."""
+    path = os.path.join(study_dir, 'study.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        changed = sorted(k for k in settings if saved.get(k) != settings[k])
+        if changed:
+            raise ValueError(f"{study_dir} was started with different settings ({', '.join(changed)}); "
+                             f"use another --study or delete it")
+        return
+    os.makedirs(study_dir, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(settings, f, indent=2)
+
+
+def search(data_path=DATASET_PATH, models=SEARCH_MODELS, n_trials=24, workers=None, threads=1,
+           min_trees=50, max_trees=450, eta=3, cost_weight=0.001, seed=42, study_dir=None, progress=None):
+    """Run (or resume) a successive-halving search. Returns the list of trial records."""
+    study_dir = study_dir or os.path.join(TUNING_DIR, 'default')
+    settings = {'data': os.path.abspath(data_path), 'fingerprint': data_fingerprint(data_path),
+                'models': list(models), 'trials': n_trials, 'min_trees': min_trees, 'max_trees': max_trees,
+                'eta': eta, 'cost_weight': cost_weight, 'seed': seed}
+    open_study(study_dir, settings)
+    cache_dir = prepare_features(data_path, os.path.join(study_dir, 'features'))
+    trials_path = os.path.join(study_dir, 'trials.jsonl')
+    done = load_trials(trials_path)
+    trials = make_trials(list(models), n_trials, seed)
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+
+    survivors = trials
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir,)) as pool, \
+            open(trials_path, 'a') as log:
+        for rung, budget in enumerate(rung_budgets(min_trees, max_trees, eta)):
+            pending = []
+            for trial in survivors:
+                key = (trial['trial'], rung)
+                previous = done.get((trial['trial'], rung - 1))
+                if key in done:
+                    continue
+                if previous is not None and previous['stopped']:
+                    # Early stopping already ended this trial below the old budget.
+                    done[key] = dict(previous, rung=rung, budget=budget, fit_seconds=0.0)
+                    log.write(json.dumps(done[key]) + '\n')
+                else:
+                    pending.append(pool.submit(_run_trial, trial, rung, budget, threads, cost_weight))
+            for future in as_completed(pending):
+                record = future.result()
+                done[(record['trial'], rung)] = record
+                log.write(json.dumps(record) + '\n')
+                log.flush()
+            if progress:
+                progress(rung, budget, [done[(t['trial'], rung)] for t in survivors])
+
+            ranked = sorted(survivors, key=lambda t: done[(t['trial'], rung)]['objective'], reverse=True)
+            survivors = ranked[:max(1, math.ceil(len(survivors) / eta))]
+    return list(done.values())
+
+
+def finalize(study_dir, records, threads=1):
+    """Refit the best trial per model and the default settings, and score both on the test split.
+
+    Writes ``best.json`` in the ``{'params': {model: params}}`` shape that
+    ``train.py --params`` reads. Returns the summary dict.
+    """
+    _init_worker(os.path.join(study_dir, 'features'))
+    summary = {'params': {}, 'models': {}}
+    with threadpool_limits(limits=threads):
+        for name in sorted({r['model'] for r in records}):
+            best = max((r for r in records if r['model'] == name), key=lambda r: r['objective'])
+            params = dict(best['params'], n_estimators=best['trees'])
+            rows = {}
+            for label, candidate in [('default', {}), ('tuned', params)]:
+                clf, trees = _fit(name, candidate, candidate.get('n_estimators', 100), threads, early_stopping=False)
+                depths = tree_depths(clf, trees)
+                metrics = evaluate(_DATA['y_test'], clf.predict_proba(_DATA['X_test'])[:, 1])
+                rows[label] = {'trees': trees, 'max_depth': max(depths), 'cost': sum(depths) / REFERENCE_COST,
+                               'test_auc': metrics['auc'], 'test_recall': metrics['recall'],
+                               'test_precision': metrics['precision']}
+            summary['params'][name] = params
+            summary['models'][name] = dict(rows, trial=best['trial'], validation_auc=best['auc'],
+                                           objective=best['objective'])
+    with open(os.path.join(study_dir, 'best.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def print_rung(rung, budget, records):
+    best = max(records, key=lambda r: r['objective'])
+    print(f"rung {rung}: {len(records):>3} trials at {budget:>4} trees, best #{best['trial']} {best['model']} "
+          f"AUC {best['auc']:.4f} trees {best['trees']} cost {best['cost']:.2f} "
+          f"objective {best['objective']:.4f}")
+
+
+def print_summary(summary):
+    print(f"{'model':<10} {'':<8} {'trees':>6} {'depth':>6} {'cost':>6} {'test AUC':>9} {'recall':>7} {'precision':>9}")
+    for name, rows in summary['models'].items():
+        for label in ('default', 'tuned'):
+            r = rows[label]
+            print(f"{name:<10} {label:<8} {r['trees']:>6} {r['max_depth']:>6} {r['cost']:>6.2f} "
+                  f"{r['test_auc']:>9.4f} {r['test_recall']:>7.4f} {r['test_precision']:>9.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive-halving hyperparameter search for XGBoost/LightGBM")
+    parser.add_argument("--data", default=DATASET_PATH, help="Transactions CSV, Parquet or Arrow file")
+    parser.add_argument("--models", nargs="+", choices=SEARCH_MODELS, default=SEARCH_MODELS, metavar="MODEL")
+    parser.add_argument("--trials", type=int, default=24, help="Configurations sampled at the first rung")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: cores / --threads)")
+    parser.add_argument("--threads", type=int, default=1, help="Threads per trial")
+    parser.add_argument("--min-trees", type=int, default=50, help="Tree budget at the first rung")
+    parser.add_argument("--max-trees", type=int, default=450, help="Largest tree budget")
+    parser.add_argument("--eta", type=int, default=3, help="Keep 1/eta of the trials per rung, with eta x the trees")
+    parser.add_argument("--cost-weight", type=float, default=0.001,
+                        help="AUC given up per 100 trees of depth 6 (the deployed model's cost)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--study", default="default", help=f"Study name; results live in {TUNING_DIR}/<study>/")
+    args = parser.parse_args()
+
+    study_dir = os.path.join(TUNING_DIR, args.study)
+    try:
+        records = search(args.data, args.models, args.trials, args.workers, args.threads, args.min_trees,
+                         args.max_trees, args.eta, args.cost_weight, args.seed, study_dir, progress=print_rung)
+    except ValueError as e:
+        parser.error(str(e))
+    print_summary(finalize(study_dir, records, args.threads))
+    print(f"Best params in {os.path.join(study_dir, 'best.json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Cheaper variants of the deployed model and an accuracy-vs-cost report.
+
+Builds variants of the XGBoost pipeline in ``xgboost_fraud_model.pkl`` and
+measures each on the held-out split of the dataset (the same 80/20 split
+as ``train.py``):
+
+    deployed        the pickled sklearn pipeline, as the app runs it
+    compiled        the same booster behind ``CompiledPredictor`` (no pandas/sklearn)
+    trees-N         the first N boosting rounds only (tree truncation)
+    depth-D         XGBoost retrained with max_depth D
+    numpy-f32       flattened trees with float32 thresholds and leaves (``numpy_trees.py``)
+    student-linear  ridge regression fitted to the deployed model's margins
+    student-gbdt    a small depth-3 GBDT fitted to the deployed model's margins
+
+For each variant it reports AUC, recall at a fixed false-positive rate,
+single-row p50 latency, batch cost per row and serialized size, and marks
+the Pareto-optimal ones. ``--min-recall`` picks the lowest-latency variant
+that meets a recall floor; ``--save`` writes every variant as a ``.pkl``
+that ``scoring.load_model`` (and so the model registry) can load.
+
+    python variants.py
+    python variants.py --fpr 0.005 --min-recall 0.95 --save variants
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import joblib
+import numpy as np
+from sklearn.linear_model import Ridge
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from columnar import load_transactions
+from compiled import CompiledPredictor, StudentPredictor
+from numpy_trees import NumpyTreeEnsemble, flatten_booster
+from schema import DATASET_PATH, FEATURE_COLUMNS, MODEL_PATH, NUMERIC_COLUMNS
+from train import make_classifier
+
+
+TRUNCATE_TREES = [10, 25, 50]
+SHALLOW_DEPTHS = [2, 3, 4]
+MARGIN_CLIP = 15.0
+
+
+def recall_at_fpr(y_true, y_prob, fpr):
+    """Share of fraud caught at the threshold that flags ``fpr`` of legitimate rows."""
+    negatives = np.sort(y_prob[y_true == 0])
+    threshold = negatives[min(len(negatives) - 1, int(np.ceil(len(negatives) * (1.0 - fpr))) - 1)]
+    return float(np.mean(y_prob[y_true == 1] > threshold)), float(threshold)
+
+
+def _time_calls(fn, min_seconds=0.2, min_repeat=5):
+    times = []
+    deadline = time.perf_counter() + min_seconds
+    while len(times) < min_repeat or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def build_variants(pipeline, X_train, y_train, threads=1):
+    """Name -> predictor for every variant; each has ``predict_proba(frame)``."""
+    teacher = CompiledPredictor.from_pipeline(pipeline)
+    layout = (teacher.mean, teacher.scale, teacher.categories, teacher.drop_idx)
+    variants = {'deployed': pipeline, 'compiled': teacher}
+
+    rounds = teacher.booster.num_boosted_rounds()
+    for n in TRUNCATE_TREES:
+        if n < rounds:
+            variants[f'trees-{n}'] = CompiledPredictor(teacher.booster[:n], *layout)
+
+    X = teacher.transform(teacher.encode_types(X_train['type'].to_numpy()),
+                          X_train[NUMERIC_COLUMNS].to_numpy(dtype=np.float64))
+    ratio = float((y_train == 0).sum() / (y_train == 1).sum())
+    for depth in SHALLOW_DEPTHS:
+        clf = make_classifier('XGBoost', ratio, threads, {'max_depth': depth})
+        clf.fit(X, y_train)
+        variants[f'depth-{depth}'] = CompiledPredictor(clf.get_booster(), *layout)
+
+    arrays = flatten_booster(teacher.booster)
+    arrays.update(mean=teacher.mean, scale=teacher.scale, categories=teacher.categories.astype(str),
+                  onehot_offsets=teacher.onehot_offsets.astype(np.int64))
+    variants['numpy-f32'] = NumpyTreeEnsemble(arrays)
+
+    # Students learn the teacher's clipped log-odds, which carry more signal than 0/1 labels.
+    margin = np.clip(teacher.booster.inplace_predict(X, predict_type='margin'), -MARGIN_CLIP, MARGIN_CLIP)
+    variants['student-linear'] = StudentPredictor(Ridge(alpha=1.0).fit(X, margin), *layout)
+    from xgboost import XGBRegressor
+    gbdt = XGBRegressor(n_estimators=40, max_depth=3, learning_rate=0.3, random_state=42, n_jobs=threads)
+    variants['student-gbdt'] = StudentPredictor(gbdt.fit(X, margin), *layout)
+    return variants
+
+
+def _predict_fn(model, X_test):
+    """``fn(rows) -> probabilities`` on pre-extracted arrays where the model allows it.
+
+    The pandas column extraction costs the same for every variant and would
+    hide the differences between them, so only the deployed pipeline is
+    timed on DataFrames.
+    """
+    if not hasattr(model, 'predict_arrays'):
+        return lambda rows: model.predict_proba(X_test.iloc[rows])[:, 1]
+    types = X_test['type'].to_numpy()
+    numeric = X_test[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+    return lambda rows: model.predict_arrays(types[rows], numeric[rows])
+
+
+def measure(model, X_test, y_test, fpr):
+    predict = _predict_fn(model, X_test)
+    all_rows = slice(None)
+    y_prob = np.asarray(predict(all_rows), dtype=np.float64)
+    recall, threshold = recall_at_fpr(y_test, y_prob, fpr)
+    single = _time_calls(lambda: predict(slice(0, 1)))
+    batch = _time_calls(lambda: predict(all_rows), min_repeat=3)
+    return {
+        'auc': float(roc_auc_score(y_test, y_prob)),
+        'recall': recall,
+        'threshold': threshold,
+        'single_row_us': float(np.percentile(single, 50) * 1e6),
+        'batch_ns_per_row': float(np.median(batch) / len(X_test) * 1e9),
+        'size_bytes': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+    }
+
+
+def pareto_front(results):
+    """Names of the variants no other variant beats on AUC, recall, latency and size at once."""
+    def dominates(a, b):
+        no_worse = (a['auc'] >= b['auc'] and a['recall'] >= b['recall']
+                    and a['single_row_us'] <= b['single_row_us'] and a['size_bytes'] <= b['size_bytes'])
+        better = (a['auc'] > b['auc'] or a['recall'] > b['recall']
+                  or a['single_row_us'] < b['single_row_us'] or a['size_bytes'] < b['size_bytes'])
+        return no_worse and better
+    return [name for name, r in results.items()
+            if not any(dominates(other, r) for o, other in results.items() if o != name)]
+
+
+def fastest_meeting(results, min_recall):
+    eligible = [name for name, r in results.items() if r['recall'] >= min_recall]
+    return min(eligible, key=lambda name: results[name]['single_row_us']) if eligible else None
+
+
+def run(model_path=MODEL_PATH, data_path=DATASET_PATH, fpr=0.01, threads=1, test_size=0.2, random_state=42,
+        save_dir=None):
+    df = load_transactions(data_path, columns=FEATURE_COLUMNS + ['isFraud'])
+    X_train, X_test, y_train, y_test = train_test_split(df[FEATURE_COLUMNS], df['isFraud'].to_numpy(dtype=np.int8),
+                                                        test_size=test_size, random_state=random_state)
+    X_test = X_test.reset_index(drop=True)
+    variants = build_variants(joblib.load(model_path), X_train, y_train, threads)
+    results = {name: measure(model, X_test, y_test, fpr) for name, model in variants.items()}
+    front = set(pareto_front(results))
+    for name, r in results.items():
+        r['pareto'] = name in front
+    if save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+        for name, model in variants.items():
+            joblib.dump(model, os.path.join(save_dir, f"{name}.pkl"))
+        with open(os.path.join(save_dir, 'report.json'), 'w') as f:
+            json.dump({'model': model_path, 'data': data_path, 'fpr': fpr, 'test_rows': len(X_test),
+                       'variants': results}, f, indent=2)
+    return results
+
+
+def print_table(results, fpr):
+    print(f"{'variant':<16} {'AUC':>7} {f'recall@{fpr:g}':>12} {'p50 us':>8} {'ns/row':>8} {'size KB':>9}  pareto")
+    for name, r in sorted(results.items(), key=lambda item: item[1]['single_row_us']):
+        print(f"{name:<16} {r['auc']:>7.4f} {r['recall']:>12.4f} {r['single_row_us']:>8.1f} "
+              f"{r['batch_ns_per_row']:>8.0f} {r['size_bytes'] / 1024:>9.1f}  {'*' if r['pareto'] else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build cheaper model variants and compare accuracy against cost")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=DATASET_PATH, help="Transactions CSV, Parquet or Arrow file")
+    parser.add_argument("--fpr", type=float, default=0.01, help="False-positive rate at which recall is measured")
+    parser.add_argument("--min-recall", type=float, default=None,
+                        help="Report the fastest variant with at least this recall")
+    parser.add_argument("--threads", type=int, default=1, help="Threads for retraining and distillation")
+    parser.add_argument("--save", default=None, metavar="DIR", help="Write every variant and report.json to DIR")
+    args = parser.parse_args()
+
+    results = run(args.model, args.data, args.fpr, args.threads, save_dir=args.save)
+    print_table(results, args.fpr)
+    if args.min_recall is not None:
+        best = fastest_meeting(results, args.min_recall)
+        if best is None:
+            print(f"No variant reaches recall {args.min_recall:g} at FPR {args.fpr:g}")
+        else:
+            print(f"Fastest with recall >= {args.min_recall:g}: {best} "
+                  f"({results[best]['single_row_us']:.1f} us, AUC {results[best]['auc']:.4f})")
+    if args.save:
+        print(f"Variants in {args.save}")
+
+
+if __name__ == "__main__":
+    main()